@@ -0,0 +1,161 @@
+"""
+Binary checkpoint format for exact simulation restart.
+
+A checkpoint is one file:
+
+    b"AIETCKPT" | uint32 format version | uint64 header length | JSON header
+    | padding | raw array data (each array 64-byte aligned)
+
+The JSON header holds the metadata (scalars, strings, nested lists/dicts;
+Python floats round-trip exactly through `repr`) and an array table with
+the dtype, shape and offset of every array. Arrays are written in native
+byte order straight from memory and come back as views on a copy-on-write
+memory map, so loading is zero-copy, pages are read on first touch and the
+restored arrays are writable without touching the file.
+
+`pack_bodies` / `unpack_bodies` convert the UI's body dicts: array values go
+to the array section, references to other bodies in the list (e.g.
+`parent_obj`) are stored as indices, lists of equal-shape arrays (orbit
+trails) are stacked, and values that are neither (surfaces, callables) are
+dropped.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"AIETCKPT"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sIQ")
+_ALIGN = 64
+
+
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_checkpoint(path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> str:
+    """
+    Write `meta` and `arrays` to `path` (atomically, via a temporary file).
+
+    Returns:
+        `path`.
+    """
+    table: Dict[str, Dict[str, Any]] = {}
+    blobs: List[np.ndarray] = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        blobs.append(array)
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"meta": meta, "arrays": table}).encode("utf-8")
+    data_start = _aligned(_PREAMBLE.size + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for (name, entry), array in zip(table.items(), blobs):
+            f.seek(data_start + entry["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return path
+
+
+def read_checkpoint(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    (meta, arrays) of a checkpoint. Arrays are copy-on-write views on the file.
+    """
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an AIET checkpoint")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {version} (expected {FORMAT_VERSION})")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    data_start = _aligned(_PREAMBLE.size + header_len)
+    data = None
+    if os.path.getsize(path) > data_start:
+        data = np.memmap(path, dtype=np.uint8, mode="c", offset=data_start)
+    arrays: Dict[str, np.ndarray] = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        if count == 0:
+            arrays[name] = np.zeros(entry["shape"], dtype=dtype)
+            continue
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                     offset=entry["offset"]).reshape(entry["shape"])
+    return header["meta"], arrays
+
+
+def _plain(value: Any):
+    """`value` if it is JSON data (after unwrapping NumPy scalars), else raises TypeError."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+        return {k: _plain(v) for k, v in value.items()}
+    raise TypeError(type(value).__name__)
+
+
+def pack_bodies(bodies: Sequence[Dict[str, Any]], prefix: str = "bodies"):
+    """
+    Split body dicts into JSON records and arrays.
+
+    Returns:
+        (records, arrays) for `write_checkpoint`.
+    """
+    index_of = {id(b): i for i, b in enumerate(bodies)}
+    records: List[Dict[str, Any]] = []
+    arrays: Dict[str, np.ndarray] = {}
+    for i, body in enumerate(bodies):
+        record: Dict[str, Any] = {}
+        for key, value in body.items():
+            name = f"{prefix}/{i}/{key}"
+            if isinstance(value, np.ndarray):
+                arrays[name] = value
+                record[key] = {"__array__": name}
+            elif isinstance(value, dict) and id(value) in index_of:
+                record[key] = {"__body__": index_of[id(value)]}
+            elif (isinstance(value, list) and value and all(isinstance(v, np.ndarray) for v in value)
+                  and len({v.shape for v in value}) == 1):
+                arrays[name] = np.stack(value)
+                record[key] = {"__array_list__": name}
+            else:
+                try:
+                    record[key] = {"__value__": _plain(value)}
+                except TypeError:
+                    continue
+        records.append(record)
+    return records, arrays
+
+
+def unpack_bodies(records: Sequence[Dict[str, Any]], arrays: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Rebuild body dicts written by `pack_bodies`."""
+    bodies: List[Dict[str, Any]] = [{} for _ in records]
+    for body, record in zip(bodies, records):
+        for key, entry in record.items():
+            if "__array__" in entry:
+                body[key] = arrays[entry["__array__"]]
+            elif "__array_list__" in entry:
+                body[key] = list(arrays[entry["__array_list__"]])
+            elif "__value__" in entry:
+                body[key] = entry["__value__"]
+    for body, record in zip(bodies, records):
+        for key, entry in record.items():
+            if "__body__" in entry:
+                body[key] = bodies[entry["__body__"]]
+    return bodies
@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 from src.ml.ml_features_core import (
+    FEATURE_COLUMNS,
+    IMPUTATION_FLAGS,
     build_features,
+    build_features_batch,
     get_earth_reference_features,
+    imputed_fields_from_mask,
     load_feature_schema,
+    rows_to_columns,
 )
-
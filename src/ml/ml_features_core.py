@@ -6,7 +6,36 @@ Single source of truth for feature extraction (training, inference, debug, Earth
 import numpy as np
 import json
 import os
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, List, Mapping, Optional, Sequence, Union
+
+# Powers go through np.power (not Python's **) in both builders: NumPy's
+# power gives the same bits for scalars and for any element of an array, so
+# build_features_batch reproduces build_features exactly.
+
+# Feature columns in schema order (the NASA input column of the same name feeds each).
+FEATURE_COLUMNS: Tuple[str, ...] = (
+    "pl_rade", "pl_masse", "pl_orbper", "pl_orbsmax", "pl_orbeccen", "pl_insol",
+    "pl_eqt", "pl_dens", "st_teff", "st_mass", "st_rad", "st_lum",
+)
+
+# meta["imputed_fields"] labels, in the order build_features appends them;
+# bit i of a build_features_batch imputation mask is IMPUTATION_FLAGS[i].
+IMPUTATION_FLAGS: Tuple[str, ...] = (
+    "pl_rade",
+    "pl_masse (rocky M-R)",
+    "pl_masse (gas giant median)",
+    "pl_orbper",
+    "st_mass (for orbit calc)",
+    "pl_orbsmax (Kepler 3rd law)",
+    "pl_orbeccen",
+    "st_teff",
+    "st_rad",
+    "st_lum (Stefan-Boltzmann)",
+    "pl_insol (L/a^2)",
+    "pl_eqt (from flux)",
+    "pl_dens (from M,R)",
+)
+_FLAG_BIT = {name: np.uint16(1 << i) for i, name in enumerate(IMPUTATION_FLAGS)}
 
 
 def load_feature_schema(schema_path: str = None) -> dict:
@@ -74,7 +103,7 @@ def build_features(
     if pl_masse is None or np.isnan(pl_masse):
         # Rocky planet M-R relation (Zeng et al. 2016)
         if pl_rade < 1.6:
-            pl_masse = pl_rade ** 2.06
+            pl_masse = float(np.power(pl_rade, 2.06))
             meta["imputed_fields"].append("pl_masse (rocky M-R)")
         else:
             # Gas/ice giant - use median by radius bin
@@ -106,7 +135,7 @@ def build_features(
     if pl_orbsmax is None or np.isnan(pl_orbsmax):
         # Kepler's 3rd law: a^3 = P^2 * M_star (P in years, M in solar masses)
         P_yr = pl_orbper / 365.25
-        pl_orbsmax = (P_yr ** 2 * st_mass) ** (1.0 / 3.0)
+        pl_orbsmax = float(np.power(np.power(P_yr, 2) * st_mass, 1.0 / 3.0))
         meta["imputed_fields"].append("pl_orbsmax (Kepler 3rd law)")
     pl_orbsmax = float(np.clip(pl_orbsmax, 0.01, 1000.0))
     meta["intermediate_values"]["pl_orbsmax"] = pl_orbsmax
@@ -140,7 +169,7 @@ def build_features(
     st_lum = data.get("st_lum")
     if st_lum is None or np.isnan(st_lum):
         # Stefan-Boltzmann law: L ∝ R^2 * T^4
-        st_lum = (st_rad ** 2) * ((st_teff / 5778.0) ** 4)
+        st_lum = float(np.power(st_rad, 2) * np.power(st_teff / 5778.0, 4))
         meta["imputed_fields"].append("st_lum (Stefan-Boltzmann)")
     st_lum = float(np.clip(st_lum, 0.0001, 1000000.0))
     meta["intermediate_values"]["st_lum"] = st_lum
@@ -153,7 +182,7 @@ def build_features(
     pl_insol = data.get("pl_insol")
     if pl_insol is None or np.isnan(pl_insol):
         # Compute from stellar luminosity and distance
-        pl_insol = st_lum / (pl_orbsmax ** 2)
+        pl_insol = float(st_lum / np.power(pl_orbsmax, 2))
         meta["imputed_fields"].append("pl_insol (L/a^2)")
     pl_insol = float(np.clip(pl_insol, 0.0001, 100.0))
     meta["intermediate_values"]["pl_insol"] = pl_insol
@@ -163,7 +192,7 @@ def build_features(
     if pl_eqt is None or np.isnan(pl_eqt):
         # T_eq ∝ flux^0.25 (assuming Earth-like albedo ~0.3)
         # Earth: 1.0 flux → ~255K equilibrium (actual 288K with greenhouse)
-        pl_eqt = 278.5 * (pl_insol ** 0.25)
+        pl_eqt = float(278.5 * np.power(pl_insol, 0.25))
         meta["imputed_fields"].append("pl_eqt (from flux)")
     pl_eqt = float(np.clip(pl_eqt, 50.0, 3000.0))
     meta["intermediate_values"]["pl_eqt"] = pl_eqt
@@ -179,7 +208,7 @@ def build_features(
         
         mass_kg = pl_masse * M_earth_kg
         radius_m = pl_rade * R_earth_m
-        volume_m3 = (4.0 / 3.0) * np.pi * (radius_m ** 3)
+        volume_m3 = float((4.0 / 3.0) * np.pi * np.power(radius_m, 3))
         
         if volume_m3 > 0:
             density_kg_m3 = mass_kg / volume_m3
@@ -220,6 +249,143 @@ def build_features(
         return features
 
 
+def rows_to_columns(rows: Sequence[Mapping], columns: Sequence[str] = FEATURE_COLUMNS) -> Dict[str, np.ndarray]:
+    """
+    Columnar float64 inputs from NASA-style dicts (None -> NaN, absent -> NaN).
+    """
+    n = len(rows)
+    out: Dict[str, np.ndarray] = {}
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        out[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64).reshape(n)
+    return out
+
+
+def build_features_batch(
+    inputs: Union[Mapping[str, Sequence[float]], np.ndarray],
+    columns: Sequence[str] = FEATURE_COLUMNS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized build_features over N rows.
+
+    Applies the same imputation chain and clipping as masked array
+    operations and gives bit-identical features.
+
+    Args:
+        inputs: Dict of NASA columns (arrays of length N; NaN = missing; an
+            absent column is missing for every row), or an (N, k) array whose
+            columns are named by `columns`.
+        columns: Column names of an array input (default: schema order).
+
+    Returns:
+        x: (N, 12) float32 features in schema order
+        imputed: (N,) uint16 bitmasks; bit i set when IMPUTATION_FLAGS[i]
+            was imputed (see imputed_fields_from_mask)
+    """
+    if isinstance(inputs, np.ndarray):
+        array = np.asarray(inputs, dtype=np.float64)
+        if array.ndim != 2 or array.shape[1] != len(columns):
+            raise ValueError(f"Expected an (N, {len(columns)}) array, got shape {array.shape}")
+        data = {name: array[:, i] for i, name in enumerate(columns)}
+        n = array.shape[0]
+    else:
+        data = {name: np.asarray(values, dtype=np.float64) for name, values in inputs.items()}
+        lengths = {v.size for v in data.values() if v.ndim > 0}
+        if len(lengths) > 1:
+            raise ValueError(f"Input columns differ in length: {sorted(lengths)}")
+        n = lengths.pop() if lengths else 1
+    imputed = np.zeros(n, dtype=np.uint16)
+
+    def column(name):
+        """(values, missing) with missing rows NaN."""
+        values = data.get(name)
+        if values is None:
+            return np.full(n, np.nan), np.ones(n, dtype=bool)
+        values = np.broadcast_to(values, (n,))
+        return values, np.isnan(values)
+
+    def impute(values, missing, fill, flag):
+        if missing.any():
+            imputed[missing] |= _FLAG_BIT[flag]
+            return np.where(missing, fill, values)
+        return values
+
+    # Planet features
+    pl_rade, missing = column("pl_rade")
+    pl_rade = np.clip(impute(pl_rade, missing, 6.0, "pl_rade"), 0.1, 20.0)
+
+    pl_masse, missing = column("pl_masse")
+    if missing.any():
+        rocky = pl_rade < 1.6
+        giant = np.where(pl_rade < 4.0, 10.0, np.where(pl_rade < 8.0, 50.0, 200.0))
+        pl_masse = impute(pl_masse, missing & rocky, np.power(pl_rade, 2.06), "pl_masse (rocky M-R)")
+        pl_masse = impute(pl_masse, missing & ~rocky, giant, "pl_masse (gas giant median)")
+    pl_masse = np.clip(pl_masse, 0.001, 500.0)
+
+    pl_orbper, missing = column("pl_orbper")
+    pl_orbper = np.clip(impute(pl_orbper, missing, 10.0, "pl_orbper"), 0.1, 100000.0)
+
+    st_mass, missing = column("st_mass")
+    st_mass = np.clip(impute(st_mass, missing, 1.0, "st_mass (for orbit calc)"), 0.08, 100.0)
+
+    pl_orbsmax, missing = column("pl_orbsmax")
+    if missing.any():
+        # Kepler's 3rd law: a^3 = P^2 * M_star (P in years, M in solar masses)
+        P_yr = pl_orbper / 365.25
+        kepler = np.power(np.power(P_yr, 2) * st_mass, 1.0 / 3.0)
+        pl_orbsmax = impute(pl_orbsmax, missing, kepler, "pl_orbsmax (Kepler 3rd law)")
+    pl_orbsmax = np.clip(pl_orbsmax, 0.01, 1000.0)
+
+    pl_orbeccen, missing = column("pl_orbeccen")
+    pl_orbeccen = np.clip(impute(pl_orbeccen, missing, 0.0, "pl_orbeccen"), 0.0, 1.0)
+
+    # Stellar features
+    st_teff, missing = column("st_teff")
+    st_teff = np.clip(impute(st_teff, missing, 5778.0, "st_teff"), 2000.0, 50000.0)
+
+    st_rad, missing = column("st_rad")
+    st_rad = np.clip(impute(st_rad, missing, 1.0, "st_rad"), 0.1, 1000.0)
+
+    st_lum, missing = column("st_lum")
+    if missing.any():
+        stefan_boltzmann = np.power(st_rad, 2) * np.power(st_teff / 5778.0, 4)
+        st_lum = impute(st_lum, missing, stefan_boltzmann, "st_lum (Stefan-Boltzmann)")
+    st_lum = np.clip(st_lum, 0.0001, 1000000.0)
+
+    # Flux & temperature
+    pl_insol, missing = column("pl_insol")
+    if missing.any():
+        pl_insol = impute(pl_insol, missing, st_lum / np.power(pl_orbsmax, 2), "pl_insol (L/a^2)")
+    pl_insol = np.clip(pl_insol, 0.0001, 100.0)
+
+    pl_eqt, missing = column("pl_eqt")
+    if missing.any():
+        pl_eqt = impute(pl_eqt, missing, 278.5 * np.power(pl_insol, 0.25), "pl_eqt (from flux)")
+    pl_eqt = np.clip(pl_eqt, 50.0, 3000.0)
+
+    pl_dens, missing = column("pl_dens")
+    if missing.any():
+        mass_kg = pl_masse * 5.972e24
+        radius_m = pl_rade * 6.371e6
+        volume_m3 = (4.0 / 3.0) * np.pi * np.power(radius_m, 3)
+        positive = volume_m3 > 0
+        density = np.where(positive, mass_kg / np.where(positive, volume_m3, 1.0) / 1000.0, 5.51)
+        pl_dens = impute(pl_dens, missing, density, "pl_dens (from M,R)")
+    pl_dens = np.clip(pl_dens, 0.1, 30.0)
+
+    x = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, values in enumerate((pl_rade, pl_masse, pl_orbper, pl_orbsmax, pl_orbeccen, pl_insol,
+                                pl_eqt, pl_dens, st_teff, st_mass, st_rad, st_lum)):
+        x[:, i] = values
+    return x, imputed
+
+
+def imputed_fields_from_mask(mask: int) -> List[str]:
+    """meta["imputed_fields"] for one row's build_features_batch bitmask."""
+    mask = int(mask)
+    return [name for i, name in enumerate(IMPUTATION_FLAGS) if mask >> i & 1]
+
+
 def get_earth_reference_features() -> Tuple[np.ndarray, Dict]:
     """
     Get Earth's feature vector using exact Solar System values.
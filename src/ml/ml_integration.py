@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 from src.ml.ml_integration_core import (
+    SimulationScore,
     export_ml_debug_snapshot,
     export_ml_snapshot_single_planet,
     planet_star_to_features_canonical,
     predict_with_simulation_body,
+    score_simulation_body,
     sim_to_ml_features,
 )
 
@@ -14,6 +16,8 @@ from src.ml.ml_integration_core import (
 __all__ = [
     "sim_to_ml_features",
     "predict_with_simulation_body",
+    "score_simulation_body",
+    "SimulationScore",
     "planet_star_to_features_canonical",
     "export_ml_debug_snapshot",
     "export_ml_snapshot_single_planet",
@@ -5,7 +5,8 @@ Maps AIET simulation keys to NASA schema for ML predictions
 SINGLE SOURCE OF TRUTH for feature extraction from simulation bodies.
 """
 
-from typing import Dict, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 import json
 import os
@@ -327,36 +328,55 @@ def planet_star_to_features_canonical(
     return features, meta
 
 
-def predict_with_simulation_body(
+@dataclass
+class SimulationScore:
+    """
+    Result of scoring one simulation planet (see score_simulation_body).
+    
+    Attributes:
+        score: Score to show (Earth-normalized 0-100), or None when it cannot be
+            computed or the surface mode hides it
+        score_raw: Raw ML score (0-1), or None if not computed
+        score_normalized: Earth-normalized score (0-100) even when hidden, or None
+        surface_class: "rocky" | "giant" | "unknown"
+        should_display_score: True = show percent, False = show "—"
+        display_label: UI badge text
+        imputed_fields: Fields imputed by the feature builder
+        diagnostics: Full diagnostics dict (see predict_with_simulation_body)
+    """
+    
+    score: Optional[float]
+    score_raw: Optional[float]
+    score_normalized: Optional[float]
+    surface_class: str
+    should_display_score: bool
+    display_label: str
+    imputed_fields: List[str] = field(default_factory=list)
+    diagnostics: Dict = field(default_factory=dict)
+    
+    @property
+    def success(self) -> bool:
+        return self.score_raw is not None
+
+
+def score_simulation_body(
     ml_calculator,
     planet_body: dict,
     star_body: dict,
-    return_diagnostics: bool = False,
     surface_mode: str = "all"
-) -> Tuple[Optional[float], Optional[dict]]:
+) -> SimulationScore:
     """
-    Wrapper to predict habitability from AIET simulation bodies.
+    Score an AIET planet with one feature build and one model prediction.
     
     Args:
-        ml_calculator: MLHabitabilityCalculatorV4 instance
+        ml_calculator: MLHabitabilityCalculator instance
         planet_body: AIET planet body dict
         star_body: AIET star body dict
-        return_diagnostics: If True, return (score, diagnostics) tuple
         surface_mode: "all" (show scores for all) or "rocky_only" (giants show None)
     
     Returns:
-        If return_diagnostics=False: score (0-100) or None
-        If return_diagnostics=True: (score, diagnostics_dict) or (None, diagnostics_dict)
-    
-    Meta fields added to diagnostics:
-        - surface_class: "rocky" | "giant" | "unknown"
-        - surface_applicable: bool
-        - surface_reason: str
-        - surface_warnings: list[str]
-        - display_label: str (UI badge text)
-        - should_display_score: bool (True = show percent, False = show "—")
-        - score_raw: float (raw ML score before normalization)
-        - score_display: float or None (Earth-normalized 0-100, or None if shouldn't display)
+        SimulationScore (diagnostics carry the fields listed in
+        predict_with_simulation_body, plus imputed_fields)
     """
     
     # Map simulation keys to NASA schema
@@ -373,10 +393,7 @@ def predict_with_simulation_body(
         diagnostics["display_label"] = "Data Incomplete"
         diagnostics["should_display_score"] = False
         
-        if return_diagnostics:
-            return None, diagnostics
-        else:
-            return None
+        return SimulationScore(None, None, None, "unknown", False, "Data Incomplete", [], diagnostics)
     
     # =============================================================================
     # SURFACE CLASSIFICATION (pure function, no side effects)
@@ -403,14 +420,23 @@ def predict_with_simulation_body(
         surface_mode
     )
     
+    result = SimulationScore(
+        score=None,
+        score_raw=None,
+        score_normalized=None,
+        surface_class=diagnostics["surface_class"],
+        should_display_score=diagnostics["should_display_score"],
+        display_label=diagnostics["display_label"],
+        diagnostics=diagnostics,
+    )
+    
     # =============================================================================
     # ML PREDICTION (never returns 0.0 on exception)
     # =============================================================================
     
     try:
-        # Get ML prediction (raw and Earth-normalized)
-        score_raw = ml_calculator.predict(features, return_raw=True)
-        score_normalized = ml_calculator.predict(features, return_raw=False)
+        # Raw and Earth-normalized scores from one feature build + prediction
+        score_raw, score_normalized, feature_meta = ml_calculator.predict_scores(features)
         
         # Special case: If this is Earth preset, force exactly 100.0
         preset_type = planet_body.get("preset_type", "")
@@ -419,7 +445,11 @@ def predict_with_simulation_body(
         
         # Store both raw and normalized scores
         diagnostics["score_raw"] = score_raw
+        diagnostics["imputed_fields"] = feature_meta.get("imputed_fields", [])
         diagnostics["prediction_success"] = True
+        result.score_raw = score_raw
+        result.score_normalized = score_normalized
+        result.imputed_fields = diagnostics["imputed_fields"]
         
         # =============================================================================
         # DISPLAY POLICY (based on surface_mode)
@@ -428,16 +458,10 @@ def predict_with_simulation_body(
         if diagnostics["should_display_score"]:
             # Show numeric score (rocky planet or surface_mode="all")
             diagnostics["score_display"] = score_normalized
-            final_score = score_normalized
+            result.score = score_normalized
         else:
             # Hide numeric score (giant in surface_mode="rocky_only")
             diagnostics["score_display"] = None
-            final_score = None
-        
-        if return_diagnostics:
-            return final_score, diagnostics
-        else:
-            return final_score
     
     except Exception as e:
         # NEVER return 0.0 on exception - return None with error info
@@ -446,11 +470,46 @@ def predict_with_simulation_body(
         diagnostics["warnings"].append(f"ML prediction failed: {e}")
         diagnostics["score_raw"] = None
         diagnostics["score_display"] = None
-        
-        if return_diagnostics:
-            return None, diagnostics
-        else:
-            return None
+    
+    return result
+
+
+def predict_with_simulation_body(
+    ml_calculator,
+    planet_body: dict,
+    star_body: dict,
+    return_diagnostics: bool = False,
+    surface_mode: str = "all"
+) -> Tuple[Optional[float], Optional[dict]]:
+    """
+    Wrapper to predict habitability from AIET simulation bodies.
+    
+    Args:
+        ml_calculator: MLHabitabilityCalculatorV4 instance
+        planet_body: AIET planet body dict
+        star_body: AIET star body dict
+        return_diagnostics: If True, return (score, diagnostics) tuple
+        surface_mode: "all" (show scores for all) or "rocky_only" (giants show None)
+    
+    Returns:
+        If return_diagnostics=False: score (0-100) or None
+        If return_diagnostics=True: (score, diagnostics_dict) or (None, diagnostics_dict)
+    
+    Meta fields added to diagnostics:
+        - surface_class: "rocky" | "giant" | "unknown"
+        - surface_applicable: bool
+        - surface_reason: str
+        - surface_warnings: list[str]
+        - display_label: str (UI badge text)
+        - should_display_score: bool (True = show percent, False = show "—")
+        - score_raw: float (raw ML score before normalization)
+        - score_display: float or None (Earth-normalized 0-100, or None if shouldn't display)
+        - imputed_fields: list[str] (fields imputed by the feature builder)
+    """
+    result = score_simulation_body(ml_calculator, planet_body, star_body, surface_mode=surface_mode)
+    if return_diagnostics:
+        return result.score, result.diagnostics
+    return result.score
 
 
 def get_earth_features_from_preset() -> dict:
@@ -521,13 +580,13 @@ def export_ml_debug_snapshot(
     }
     
     for planet_body, star_body, name in bodies_list:
-        score, diagnostics = predict_with_simulation_body(
+        result = score_simulation_body(
             ml_calculator,
             planet_body,
             star_body,
-            return_diagnostics=True,
             surface_mode="all"  # Always compute scores for debug
         )
+        diagnostics = result.diagnostics
         
         planet_data = {
             "name": name,
@@ -544,7 +603,8 @@ def export_ml_debug_snapshot(
             "missing_critical": diagnostics.get("missing_critical", []),
             "missing_optional": diagnostics.get("missing_optional", []),
             "prediction_success": diagnostics.get("prediction_success", False),
-            "prediction_error": diagnostics.get("prediction_error", None)
+            "prediction_error": diagnostics.get("prediction_error", None),
+            "imputed_fields": result.imputed_fields
         }
         
         snapshot["planets"].append(planet_data)
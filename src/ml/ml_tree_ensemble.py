@@ -0,0 +1,389 @@
+"""
+AIET ML - Pure-NumPy evaluator for the XGBoost habitability model
+
+Parses an XGBoost JSON model (hab_xgb.json) into flat arrays and evaluates
+all trees for a whole batch with a few NumPy calls, without xgboost, DMatrix
+construction or Python loops over trees.
+
+Every tree is padded to a complete binary tree of the ensemble's maximum
+depth: a leaf above the bottom level becomes a padding split whose children
+are copies of it, so after exactly `depth` levels every row sits on a leaf
+and the walk needs no per-node leaf test. Nodes of all trees share one flat
+array; each internal node stores the index of its left child, and the right
+child is the next slot.
+
+Walking costs a handful of gathers per level over a (batch x trees) index
+array. For trees of depth <= 6 (at most 64 leaves) `predict` instead uses
+the bitvector scheme of QuickScorer (Lucchese et al. 2015): a split that
+sends a row right rules out the leaves of its left subtree, and the exit
+leaf is the lowest leaf left standing. Splits are sorted by (feature,
+threshold), so the splits a row takes to the right are a prefix of each
+feature's list, found with one `searchsorted` for the whole batch; a
+precomputed table holds the AND of the 64-bit leaf masks of every prefix.
+Rows with missing values are walked.
+
+Splits follow XGBoost: features are compared in float32, a row goes left when
+x < threshold, and a missing value (NaN) follows the node's default
+direction.
+
+`save` / `load` store the flat arrays as a small NumPy `.npz` artifact
+(hab_xgb.npz next to hab_xgb.json), so inference needs neither xgboost nor
+the JSON parse; regenerate it after retraining with
+
+    python -m src.ml.ml_tree_ensemble ml_calibration/hab_xgb.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+# Objectives whose prediction is the margin itself.
+_IDENTITY_OBJECTIVES = ("reg:squarederror", "reg:squaredlogerror", "reg:pseudohubererror", "reg:absoluteerror")
+# Objectives whose prediction is sigmoid(margin).
+_LOGISTIC_OBJECTIVES = ("reg:logistic", "binary:logistic")
+
+# Deepest trees whose leaves fit one uint64 bitvector.
+_BITVECTOR_MAX_DEPTH = 6
+# Rows per bitvector block (bounds the rows x features x trees mask gather).
+_BITVECTOR_BLOCK_ROWS = 512
+
+ARTIFACT_VERSION = 1
+
+
+def _ordered_keys(values) -> np.ndarray:
+    """
+    int32 keys with the order of the float32 `values` (-0.0 taken as +0.0),
+    so float comparisons become integer ones: negative floats have their
+    magnitude bits flipped.
+    """
+    bits = (np.asarray(values, dtype=np.float32) + np.float32(0.0)).view(np.int32)
+    return bits ^ ((bits >> 31) & 0x7FFFFFFF)
+
+
+class TreeEnsemble:
+    """
+    Flattened tree ensemble.
+
+    Attributes:
+        n_trees: Number of trees.
+        depth: Depth of the padded complete trees.
+        n_features: Expected feature count.
+        base_margin: Margin added to the sum of leaves.
+        objective: XGBoost objective name.
+        feature: (n_trees * (2^depth - 1),) split feature per internal node.
+        threshold: Same shape, float32 split thresholds.
+        default_left: Same shape, missing-value direction.
+        is_split: Same shape, False for padding splits.
+        left: Same shape, flat index of each node's left child; internal
+            nodes come first, then the 2^depth leaves of every tree.
+        leaf_value: (n_trees * 2^depth,) leaf values.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, default_left: np.ndarray,
+                 is_split: np.ndarray, leaf_value: np.ndarray, depth: int, n_features: int,
+                 base_margin: float, objective: str = "reg:squarederror"):
+        if objective not in _IDENTITY_OBJECTIVES + _LOGISTIC_OBJECTIVES:
+            raise ValueError(f"Unsupported objective '{objective}'")
+        self.depth = int(depth)
+        n_internal = (1 << self.depth) - 1
+        self.n_trees = int(np.size(leaf_value)) >> self.depth
+        self.n_features = int(n_features)
+        self.base_margin = float(base_margin)
+        self.objective = objective
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.is_split = np.ascontiguousarray(is_split, dtype=bool)
+        self.leaf_value = np.ascontiguousarray(leaf_value, dtype=np.float64)
+        # Heap layout per tree: children of slot k are 2k+1 and 2k+2; the
+        # bottom level's children are that tree's leaves.
+        child = 2 * np.arange(n_internal) + 1
+        tree = np.arange(self.n_trees)[:, np.newaxis]
+        left = np.where(child < n_internal, tree * n_internal + child,
+                        self.n_trees * n_internal + (tree << self.depth) + (child - n_internal))
+        self.left = np.ascontiguousarray(left.ravel(), dtype=np.intp)
+        self._n_internal = n_internal
+        self._roots = np.arange(self.n_trees, dtype=np.intp) * n_internal
+        self._leaf_base = np.arange(self.n_trees, dtype=np.intp) << self.depth
+        self._split_keys = None
+        self._prefix_masks = None
+        if self.depth <= _BITVECTOR_MAX_DEPTH:
+            self._build_bitvectors()
+
+    def _build_bitvectors(self) -> None:
+        """Sorted split keys and the prefix-AND leaf-mask table."""
+        n_internal = self._n_internal
+        node = np.flatnonzero(self.is_split)
+        tree, slot = np.divmod(node, n_internal)
+        level = np.zeros(slot.size, dtype=np.intp)
+        for d in range(1, self.depth):
+            level += slot >= (1 << d) - 1
+        span = (1 << self.depth) >> level
+        first = (slot + 1 - (1 << level)) * span
+        # Leaves [first, first + span / 2) form the left subtree.
+        left_bits = (np.uint64(1) << (span // 2).astype(np.uint64)) - np.uint64(1)
+        masks = ~(left_bits << first.astype(np.uint64))
+
+        # Feature f's keys fill [f * 2^32, (f + 1) * 2^32).
+        keys = (self.feature[node].astype(np.int64) << 32) + (1 << 31) + _ordered_keys(self.threshold[node])
+        order = np.argsort(keys, kind="stable")
+        keys, tree, masks = keys[order], tree[order], masks[order]
+        feature = self.feature[node][order]
+        starts = np.searchsorted(feature, np.arange(self.n_features + 1))
+        # Feature f owns rows starts[f] + f .. starts[f + 1] + f: the prefix
+        # with no split taken right, then one row per further split.
+        table = np.full((keys.size + self.n_features, self.n_trees), np.uint64(0xFFFFFFFFFFFFFFFF))
+        table[np.arange(keys.size) + feature + 1, tree] = masks
+        for f in range(self.n_features):
+            block = table[starts[f] + f:starts[f + 1] + f + 1]
+            np.bitwise_and.accumulate(block, axis=0, out=block)
+        self._split_keys = keys
+        self._prefix_masks = table
+        self._feature_rows = np.arange(self.n_features, dtype=np.int64)
+        self._feature_keys = (self._feature_rows << 32) + (1 << 31)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_xgboost_json(cls, path: str) -> "TreeEnsemble":
+        """Load a single-output gbtree model saved with `Booster.save_model(*.json)`."""
+        with open(path, "r", encoding="utf-8") as f:
+            model = json.load(f)
+        return cls.from_xgboost_dict(model)
+
+    @classmethod
+    def from_xgboost_dict(cls, model: Dict[str, Any]) -> "TreeEnsemble":
+        """Flatten a parsed XGBoost JSON model."""
+        learner = model["learner"]
+        params = learner["learner_model_param"]
+        if int(params.get("num_class", "0")) > 1 or int(params.get("num_target", "1")) > 1:
+            raise ValueError("Only single-output models are supported")
+        booster = learner["gradient_booster"]
+        if booster.get("name", "gbtree") != "gbtree":
+            raise ValueError(f"Unsupported booster '{booster.get('name')}'")
+        objective = learner["objective"]["name"]
+        base_score = float(str(params["base_score"]).strip("[]"))
+        if objective in _LOGISTIC_OBJECTIVES:
+            base_margin = float(np.log(base_score / (1.0 - base_score)))
+        else:
+            base_margin = base_score
+        trees = booster["model"]["trees"]
+
+        def node_depth(tree, node):
+            if tree["left_children"][node] == -1:
+                return 0
+            return 1 + max(node_depth(tree, tree["left_children"][node]),
+                           node_depth(tree, tree["right_children"][node]))
+
+        for tree in trees:
+            if any(int(t) != 0 for t in tree.get("split_type", [])):
+                raise ValueError("Categorical splits are not supported")
+        depth = max(1, max((node_depth(t, 0) for t in trees), default=1))
+        n_internal = (1 << depth) - 1
+        shape = (len(trees), n_internal)
+        feature = np.zeros(shape, dtype=np.intp)
+        threshold = np.zeros(shape, dtype=np.float32)
+        default_left = np.zeros(shape, dtype=bool)
+        is_split = np.zeros(shape, dtype=bool)
+        # XGBoost stores and sums float32 leaves.
+        leaf_value = np.zeros((len(trees), 1 << depth), dtype=np.float32)
+
+        for t, tree in enumerate(trees):
+            lc, rc = tree["left_children"], tree["right_children"]
+            cond, feat, dflt = tree["split_conditions"], tree["split_indices"], tree["default_left"]
+            # (source node, heap slot, level); a leaf above the bottom level
+            # is copied into both children of a padding split.
+            stack: List[tuple] = [(0, 0, 0)]
+            while stack:
+                src, slot, level = stack.pop()
+                if level == depth:
+                    leaf_value[t, slot - n_internal] = cond[src]
+                elif lc[src] == -1:
+                    stack.append((src, 2 * slot + 1, level + 1))
+                    stack.append((src, 2 * slot + 2, level + 1))
+                else:
+                    feature[t, slot] = feat[src]
+                    threshold[t, slot] = cond[src]
+                    default_left[t, slot] = bool(dflt[src])
+                    is_split[t, slot] = True
+                    stack.append((lc[src], 2 * slot + 1, level + 1))
+                    stack.append((rc[src], 2 * slot + 2, level + 1))
+
+        return cls(feature.ravel(), threshold.ravel(), default_left.ravel(), is_split.ravel(),
+                   leaf_value.ravel(), depth, int(params.get("num_feature", 0)), base_margin, objective)
+
+    # ------------------------------------------------------------------
+    # Compiled artifact
+    # ------------------------------------------------------------------
+
+    def save(self, path: str, source_sha256: str = "") -> str:
+        """
+        Write the flat arrays to an `.npz` artifact (atomically). `source_sha256`
+        identifies the JSON model it was compiled from.
+        """
+        feature_dtype = np.uint8 if self.n_features <= 256 else np.uint16
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            version=np.int32(ARTIFACT_VERSION),
+            depth=np.int32(self.depth),
+            n_features=np.int32(self.n_features),
+            base_margin=np.float64(self.base_margin),
+            objective=np.str_(self.objective),
+            source_sha256=np.str_(source_sha256),
+            feature=self.feature.astype(feature_dtype),
+            threshold=self.threshold,
+            default_left=self.default_left,
+            is_split=self.is_split,
+            leaf_value=self.leaf_value.astype(np.float32),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEnsemble":
+        """Load an artifact written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != ARTIFACT_VERSION:
+                raise ValueError(f"Unsupported tree artifact version {int(data['version'])} in {path}")
+            return cls(data["feature"], data["threshold"], data["default_left"], data["is_split"],
+                       data["leaf_value"], int(data["depth"]), int(data["n_features"]),
+                       float(data["base_margin"]), str(data["objective"]))
+
+    @staticmethod
+    def artifact_source(path: str) -> str:
+        """SHA-256 of the JSON model an artifact was compiled from ("" if unknown)."""
+        with np.load(path, allow_pickle=False) as data:
+            return str(data["source_sha256"]) if "source_sha256" in data.files else ""
+
+    def feature_split_counts(self) -> np.ndarray:
+        """(n_features,) number of splits on each feature (XGBoost's 'weight' importance)."""
+        return np.bincount(self.feature[self.is_split], minlength=self.n_features)
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def walk(self, X: np.ndarray) -> np.ndarray:
+        """(B, n_trees) flat leaf index of every row in every tree, by walking the levels."""
+        node = np.broadcast_to(self._roots, (X.shape[0], self.n_trees))
+        # Row offsets into the flattened feature matrix.
+        row = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        flat_x = X.ravel()
+        missing = bool(np.isnan(flat_x).any())
+        for _ in range(self.depth):
+            x = flat_x.take(row + self.feature.take(node))
+            go_right = ~(x < self.threshold.take(node))
+            if missing:
+                go_right = np.where(np.isnan(x), ~self.default_left.take(node), go_right)
+            node = self.left.take(node) + go_right
+        return node - self._n_internal * self.n_trees
+
+    def _exit_leaves(self, X: np.ndarray) -> np.ndarray:
+        """(B, n_trees) flat leaf index from the prefix-AND bitvectors (no NaN rows)."""
+        rows = self._split_keys.searchsorted(_ordered_keys(X) + self._feature_keys, side="right")
+        rows += self._feature_rows
+        alive = np.bitwise_and.reduce(self._prefix_masks.take(rows, axis=0), axis=1)
+        lowest = alive & (~alive + np.uint64(1))
+        return np.frexp(lowest.astype(np.float64))[1] - 1 + self._leaf_base
+
+    def leaves(self, X) -> np.ndarray:
+        """(B, n_trees) flat leaf index (into `leaf_value`) of every row in every tree."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        if self._prefix_masks is None:
+            return self.walk(X)
+        missing = np.isnan(X).any(axis=1)
+        if X.shape[0] <= _BITVECTOR_BLOCK_ROWS and not missing.any():
+            return self._exit_leaves(X)
+        out = np.empty((X.shape[0], self.n_trees), dtype=np.intp)
+        if missing.any():
+            out[missing] = self.walk(X[missing])
+        present = np.flatnonzero(~missing)
+        for start in range(0, present.size, _BITVECTOR_BLOCK_ROWS):
+            block = present[start:start + _BITVECTOR_BLOCK_ROWS]
+            out[block] = self._exit_leaves(X[block])
+        return out
+
+    def predict_margin(self, X) -> np.ndarray:
+        """(B,) raw margins for a (B, n_features) or (n_features,) input."""
+        return self.leaf_value.take(self.leaves(X)).sum(axis=1) + self.base_margin
+
+    def predict(self, X) -> np.ndarray:
+        """(B,) predictions, matching `Booster.predict` for the same rows."""
+        margin = self.predict_margin(X)
+        if self.objective in _LOGISTIC_OBJECTIVES:
+            return 1.0 / (1.0 + np.exp(-margin))
+        return margin
+
+    def predict_one(self, features) -> float:
+        """Prediction for a single feature vector."""
+        return float(self.predict(features)[0])
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_path_for(model_path: str) -> str:
+    """Compiled artifact path for a JSON model (hab_xgb.json -> hab_xgb.npz)."""
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+def compile_model(model_path: str, artifact_path: Optional[str] = None) -> str:
+    """Compile an XGBoost JSON model to its `.npz` artifact; returns the artifact path."""
+    artifact_path = artifact_path or artifact_path_for(model_path)
+    return TreeEnsemble.from_xgboost_json(model_path).save(artifact_path, _sha256(model_path))
+
+
+def load_tree_ensemble(model_path: str) -> TreeEnsemble:
+    """
+    Trees for the model at `model_path` (XGBoost JSON).
+
+    The compiled artifact next to it is preferred when it exists and was
+    built from this JSON (or the JSON is not shipped, as in the web build);
+    otherwise the JSON is parsed.
+    """
+    artifact = artifact_path_for(model_path)
+    has_json = os.path.exists(model_path)
+    if os.path.exists(artifact):
+        if not has_json or TreeEnsemble.artifact_source(artifact) == _sha256(model_path):
+            return TreeEnsemble.load(artifact)
+        print(f"[ML] {artifact} is out of date with {model_path}; "
+              "recompile with: python -m src.ml.ml_tree_ensemble")
+    if not has_json:
+        raise FileNotFoundError(f"Model not found at {model_path} (or {artifact})")
+    return TreeEnsemble.from_xgboost_json(model_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from src.utils.paths import model_path as default_model_path
+
+    parser = argparse.ArgumentParser(description="Compile an XGBoost JSON model to a NumPy tree artifact.")
+    parser.add_argument("model", nargs="?", default=default_model_path("hab_xgb.json"),
+                        help="XGBoost JSON model (default: ml_calibration/hab_xgb.json)")
+    parser.add_argument("-o", "--output", help="Artifact path (default: model path with .npz)")
+    args = parser.parse_args(argv)
+    path = compile_model(args.model, args.output)
+    print(f"[ML] Wrote {path} ({os.path.getsize(path) / 1024:.1f} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
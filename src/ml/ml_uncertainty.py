@@ -15,7 +15,7 @@ from __future__ import annotations
 import numpy as np
 from typing import Dict, List, Optional, Tuple, Any
 
-from src.ml.ml_features import build_features
+from src.ml.ml_features import FEATURE_COLUMNS, build_features, build_features_batch
 
 
 # =============================================================================
@@ -116,16 +116,16 @@ def sample_parameter(
     return np.clip(x, lo, hi).astype(np.float64)
 
 
-def sample_inputs(
+def sample_input_columns(
     merged_data: Dict[str, float],
     fallback_config: Dict[str, Any],
     N: int,
     rng: np.random.Generator,
-) -> List[Dict[str, float]]:
+) -> Dict[str, np.ndarray]:
     """
-    Produce N sampled input dicts. Each dict has the same keys as merged_data
-    where we have values; sampled parameters are replaced with N samples.
-    Parameters not present or NaN are left as-is (builder will impute).
+    Sample the uncertain inputs of merged_data: one (N,) array per parameter
+    that has a finite value. Parameters not present or NaN are omitted
+    (builder will impute).
     """
     sampled_arrays: Dict[str, np.ndarray] = {}
     for key in INPUT_PARAMS:
@@ -152,6 +152,21 @@ def sample_inputs(
             N,
             rng,
         )
+    return sampled_arrays
+
+
+def sample_inputs(
+    merged_data: Dict[str, float],
+    fallback_config: Dict[str, Any],
+    N: int,
+    rng: np.random.Generator,
+) -> List[Dict[str, float]]:
+    """
+    Produce N sampled input dicts. Each dict has the same keys as merged_data
+    where we have values; sampled parameters are replaced with N samples.
+    Parameters not present or NaN are left as-is (builder will impute).
+    """
+    sampled_arrays = sample_input_columns(merged_data, fallback_config, N, rng)
 
     # Build N dicts: for each i, copy merged_data and overwrite with sampled values
     out: List[Dict[str, float]] = []
@@ -163,6 +178,55 @@ def sample_inputs(
     return out
 
 
+def predict_raw_scores(calculator: Any, X: np.ndarray) -> np.ndarray:
+    """
+    Raw scores in [0, 1] for an (N, 12) feature matrix: one batched call into
+    the calculator (NumPy trees, or the Booster for large batches), or
+    _predict_raw per row if it has neither.
+    """
+    predict_raw_batch = getattr(calculator, "predict_raw_batch", None)
+    if predict_raw_batch is not None:
+        return np.asarray(predict_raw_batch(X), dtype=np.float64).reshape(len(X))
+    trees = getattr(calculator, "trees", None)
+    if trees is not None:
+        return np.clip(trees.predict(X), 0.0, 1.0).astype(np.float64)
+    return np.array([calculator._predict_raw(x) for x in X], dtype=np.float64).reshape(len(X))
+
+
+def _sample_raw_scores(
+    calculator: Any,
+    merged_data: Dict[str, float],
+    sampled_arrays: Dict[str, np.ndarray],
+    N: int,
+) -> np.ndarray:
+    """
+    Raw scores of N Monte Carlo samples: one build_features_batch call and
+    one ensemble evaluation. Falls back to the per-sample loop when the
+    inputs are not plain numbers or the calculator has no tree ensemble.
+    """
+    try:
+        columns = {}
+        for key in FEATURE_COLUMNS:
+            if key in sampled_arrays:
+                columns[key] = sampled_arrays[key]
+            else:
+                value = merged_data.get(key)
+                columns[key] = np.full(N, np.nan if value is None else float(value))
+        X, _ = build_features_batch(columns)
+        return predict_raw_scores(calculator, X)
+    except (TypeError, ValueError):
+        pass
+
+    raw_scores = np.empty(N, dtype=np.float64)
+    for i in range(N):
+        row = dict(merged_data)
+        for key, arr in sampled_arrays.items():
+            row[key] = float(arr[i])
+        # return_meta=False returns ndarray only (not a tuple)
+        raw_scores[i] = calculator._predict_raw(build_features(row, return_meta=False))
+    return raw_scores
+
+
 def run_monte_carlo(
     calculator: Any,
     planet_data: Dict[str, float],
@@ -221,19 +285,17 @@ def run_monte_carlo(
         fallback_config = dict(DEFAULT_FALLBACK_UNCERTAINTY)
     merged = {**planet_data, **(star_data or {})}
 
-    sampled_list = sample_inputs(merged, fallback_config, N, rng)
-    raw_scores = np.empty(N, dtype=np.float64)
+    sampled_arrays = sample_input_columns(merged, fallback_config, N, rng)
+    raw_scores = _sample_raw_scores(calculator, merged, sampled_arrays, N)
     earth_raw = calculator.earth_raw_score
 
     running_means: List[Tuple[int, float]] = []
     converged_early = False
     actual_samples = N
 
+    # All N samples are scored up front; the checkpoints below replay the
+    # running mean (and early stop) exactly as if they had been scored one by one.
     for i in range(N):
-        # return_meta=False returns ndarray only (not a tuple)
-        feat = build_features(sampled_list[i], return_meta=False)
-        raw_scores[i] = calculator._predict_raw(feat)
-
         if (i + 1) % checkpoint_interval == 0 or i == N - 1:
             current_raw = raw_scores[:i + 1]
             current_raw_clipped = np.clip(current_raw, 0.0, 1.0)
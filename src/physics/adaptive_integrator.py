@@ -0,0 +1,235 @@
+"""
+Adaptive-timestep N-body integrator with embedded error control.
+
+Dormand–Prince 5(4) Runge–Kutta on the packed (positions, velocities) state:
+the 5th-order solution is propagated and the embedded 4th-order solution gives
+a per-step error estimate. Steps whose scaled error exceeds 1 are rejected and
+retried smaller; accepted steps grow the next step size. Quiet systems therefore
+take a few large steps while periapsis passages and close approaches shrink
+the step automatically.
+
+Units follow `src.physics.nbody_kernels` (AU, years, Solar masses).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.physics.nbody_kernels import G_AU, field_accelerations, pairwise_accelerations
+
+# Dormand–Prince 5(4) tableau (first-same-as-last: stage 7 is evaluated at the new state).
+_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+_B5 = (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0.0)
+_B4 = (5179 / 57600, 0.0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40)
+_E = tuple(b5 - b4 for b5, b4 in zip(_B5, _B4))
+
+# Step-size controller: h_new = h * clip(SAFETY * err^(-1/5), MIN_FACTOR, MAX_FACTOR)
+_SAFETY = 0.9
+_MIN_FACTOR = 0.2
+_MAX_FACTOR = 5.0
+
+DEFAULT_RTOL = 1e-8
+DEFAULT_ATOL = 1e-12
+
+
+@dataclass
+class AdaptiveStepStats:
+    """
+    Bookkeeping for one `dopri_integrate` call.
+
+    Attributes:
+        accepted: Number of accepted steps.
+        rejected: Number of rejected (retried) steps.
+        force_evaluations: Number of acceleration evaluations of the massive bodies.
+        h_next: Suggested size of the next step in years (pass back in as `h`).
+        h_min: Smallest accepted step in years.
+        h_max: Largest accepted step in years.
+        time_reached: Time actually advanced in years; short of the requested
+            duration when `max_steps` ran out first.
+        fallback_substeps: Fixed sub-steps a caller spent finishing the
+            shortfall (0 when the adaptive steps covered the whole duration).
+    """
+
+    accepted: int = 0
+    rejected: int = 0
+    force_evaluations: int = 0
+    h_next: float = 0.0
+    h_min: float = float("inf")
+    h_max: float = 0.0
+    time_reached: float = 0.0
+    fallback_substeps: int = 0
+
+    def shortfall(self, duration: float) -> float:
+        """Years of `duration` left unintegrated (0 when the call completed)."""
+        return max(0.0, float(duration) - self.time_reached)
+
+
+def _row_norm(y: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.einsum("ij,ij->i", y, y))
+
+
+def _error_norm(err: np.ndarray, y0: np.ndarray, y1: np.ndarray, rtol: float, atol: float) -> float:
+    # Tolerances apply per body vector, not per component, so a coordinate
+    # passing through zero does not demand an absolute-tolerance-sized error.
+    scale = atol + rtol * np.maximum(_row_norm(y0), _row_norm(y1))
+    return float(np.sqrt(np.mean((_row_norm(err) / scale) ** 2)))
+
+
+def _initial_step(pos, vel, acc, rtol, atol) -> float:
+    """Hairer's starting-step heuristic on the (x, v) state."""
+    sc_x = atol + rtol * _row_norm(pos)
+    sc_v = atol + rtol * _row_norm(vel)
+    d0 = np.sqrt(0.5 * (np.mean((_row_norm(pos) / sc_x) ** 2) + np.mean((_row_norm(vel) / sc_v) ** 2)))
+    d1 = np.sqrt(0.5 * (np.mean((_row_norm(vel) / sc_x) ** 2) + np.mean((_row_norm(acc) / sc_v) ** 2)))
+    if d0 < 1e-5 or d1 < 1e-5:
+        return 1e-6
+    return float(0.01 * d0 / d1)
+
+
+def _combine(base: np.ndarray, h: float, coeffs, stages) -> np.ndarray:
+    out = base.copy()
+    for c, k in zip(coeffs, stages):
+        if c != 0.0:
+            out += (h * c) * k
+    return out
+
+
+def dopri_integrate(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    masses: np.ndarray,
+    duration: float,
+    h: Optional[float] = None,
+    rtol: float = DEFAULT_RTOL,
+    atol: float = DEFAULT_ATOL,
+    G: float = G_AU,
+    acceleration_fn: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+    tracer_positions: Optional[np.ndarray] = None,
+    tracer_velocities: Optional[np.ndarray] = None,
+    tracer_fn: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]] = None,
+    max_steps: int = 100000,
+    min_step: float = 1e-12,
+    step_callback: Optional[Callable[[int, float], None]] = None,
+) -> AdaptiveStepStats:
+    """
+    Advance packed state in place by `duration` years with adaptive steps.
+
+    Args:
+        positions: (N, D) positions, updated in place.
+        velocities: (N, D) velocities, updated in place.
+        masses: (N,) masses in Solar masses.
+        duration: Time to advance in years.
+        h: Initial step guess in years (e.g. `h_next` from the previous call);
+            estimated from the state if omitted.
+        rtol: Relative tolerance on each body's position and velocity vector.
+        atol: Absolute tolerance on the same vectors (AU and AU/year).
+        G: Gravitational constant.
+        acceleration_fn: Optional `f(positions, masses) -> accelerations`; defaults
+            to `pairwise_accelerations`.
+        tracer_positions: Optional (M, D) massless tracer positions, updated in place.
+        tracer_velocities: Optional (M, D) tracer velocities, updated in place.
+        tracer_fn: Optional `f(targets, sources, source_masses) -> accelerations`
+            for the tracers; defaults to `field_accelerations`.
+        max_steps: Upper bound on attempted steps per call; when it is hit the
+            state is left at `time_reached` < `duration` (see the returned stats).
+        min_step: Steps are never shrunk below this size (years).
+        step_callback: Optional `f(step_index, h)` called after every accepted
+            step of length `h` years, with the state updated (e.g. event
+            detection on the accepted steps).
+
+    Tracers ride along on the massive bodies' steps; only the massive state
+    enters the error estimate, so a particle grazing a star cannot stall the run.
+
+    Returns:
+        AdaptiveStepStats for the call.
+    """
+    if acceleration_fn is None:
+        def acceleration_fn(pos, m):
+            return pairwise_accelerations(pos, m, G=G)
+    tracers = tracer_positions is not None and tracer_positions.shape[0] > 0
+    if tracers and tracer_fn is None:
+        def tracer_fn(targets, src, m):
+            return field_accelerations(targets, src, m, G=G)
+
+    stats = AdaptiveStepStats()
+    if duration <= 0.0 or positions.shape[0] == 0:
+        stats.h_next = float(h) if h else 0.0
+        stats.time_reached = max(0.0, float(duration))
+        return stats
+
+    x, v = positions, velocities
+    a = acceleration_fn(x, masses)
+    stats.force_evaluations += 1
+    tx = tracer_positions if tracers else None
+    tv = tracer_velocities if tracers else None
+    ta = tracer_fn(tx, x, masses) if tracers else None
+
+    if h is None or not np.isfinite(h) or h <= 0.0:
+        h = _initial_step(x, v, a, rtol, atol)
+    h = max(float(h), min_step)
+
+    t = 0.0
+    attempts = 0
+    while t < duration and attempts < max_steps:
+        attempts += 1
+        remaining = duration - t
+        clamped = h >= remaining
+        h_try = remaining if clamped else h
+
+        kx, kv = [v], [a]
+        tkx, tkv = ([tv], [ta]) if tracers else (None, None)
+        for i in range(1, 7):
+            xi = _combine(x, h_try, _A[i], kx)
+            vi = _combine(v, h_try, _A[i], kv)
+            kx.append(vi)
+            kv.append(acceleration_fn(xi, masses))
+            if tracers:
+                txi = _combine(tx, h_try, _A[i], tkx)
+                tvi = _combine(tv, h_try, _A[i], tkv)
+                tkx.append(tvi)
+                tkv.append(tracer_fn(txi, xi, masses))
+        stats.force_evaluations += 6
+        # FSAL: stage 7 was evaluated at the 5th-order solution.
+        x_new, v_new = xi, vi
+
+        err_x = _combine(np.zeros_like(x), h_try, _E, kx)
+        err_v = _combine(np.zeros_like(v), h_try, _E, kv)
+        err = np.sqrt(0.5 * (_error_norm(err_x, x, x_new, rtol, atol) ** 2
+                             + _error_norm(err_v, v, v_new, rtol, atol) ** 2))
+
+        if err <= 1.0 or h_try <= min_step:
+            x[...] = x_new
+            v[...] = v_new
+            a = kv[-1]
+            if tracers:
+                tx[...] = txi
+                tv[...] = tvi
+                ta = tkv[-1]
+            t += h_try
+            if step_callback is not None:
+                step_callback(stats.accepted, float(h_try))
+            stats.accepted += 1
+            stats.h_min = min(stats.h_min, float(h_try))
+            stats.h_max = max(stats.h_max, float(h_try))
+            factor = _MAX_FACTOR if err == 0.0 else min(_MAX_FACTOR, max(_MIN_FACTOR, _SAFETY * err ** -0.2))
+            # A step shortened to land on `duration` says nothing about the natural step size.
+            if not (clamped and factor >= 1.0):
+                h = max(min_step, h_try * factor)
+        else:
+            stats.rejected += 1
+            h = max(min_step, h_try * max(_MIN_FACTOR, _SAFETY * err ** -0.2))
+
+    stats.h_next = float(h)
+    stats.time_reached = float(t) if t < duration else float(duration)
+    return stats
@@ -0,0 +1,278 @@
+"""
+Array-based Barnes–Hut gravity solver.
+
+The tree is a linear (Morton-ordered) quadtree/octree stored as flat NumPy
+arrays: bodies are sorted by their Z-order key, and every node is a contiguous
+run of that sorted order. Construction proceeds level by level and traversal
+advances a work list of (target, node) pairs for all targets at once, so there
+is no tree of Python objects and no per-body Python recursion.
+
+Works for 2-D (quadtree) and 3-D (octree) positions. Units follow
+`src.physics.nbody_kernels` (AU, years, Solar masses).
+
+Accuracy and cost: nodes are monopoles, so at the default theta = 0.5 the
+median relative force error is ~1e-2 (p99 ~7e-2) on a 2-D disk; theta = 0.3
+brings the median to ~2e-3 at ~2.3x the cost. One evaluation at theta = 0.5
+takes ~0.3 s at N = 10^4 and ~0.8-1.1 s at N = 2*10^4 (vs ~3 s / ~15 s direct),
+so the tree beats direct summation from a few thousand bodies but is not
+interactive (per-frame) at 10^4-10^5 bodies; it is meant for offline runs and
+large test-particle fields at that scale.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.physics.nbody_kernels import G_AU, MIN_SEPARATION_AU
+
+# Default opening angle: a node is used as a point mass when size / distance < theta.
+DEFAULT_THETA = 0.5
+
+# Nodes holding at most this many bodies are not subdivided further.
+DEFAULT_LEAF_SIZE = 8
+
+# Targets traversed together; bounds the (target, node) work list.
+_TARGET_CHUNK = 2048
+
+
+@dataclass
+class BarnesHutTree:
+    """
+    Flat-array Barnes–Hut tree.
+
+    Attributes:
+        order: (N,) permutation sorting bodies into Morton order.
+        node_start: (K,) first sorted-body index of each node.
+        node_count: (K,) number of bodies in each node.
+        node_first_child: (K,) index of the first child node (-1 for leaves).
+        node_n_children: (K,) number of child nodes (0 for leaves).
+        node_mass: (K,) total mass of each node.
+        node_com: (K, D) centre of mass of each node.
+        node_size: (K,) side length of each node's cell.
+    """
+
+    order: np.ndarray
+    node_start: np.ndarray
+    node_count: np.ndarray
+    node_first_child: np.ndarray
+    node_n_children: np.ndarray
+    node_mass: np.ndarray
+    node_com: np.ndarray
+    node_size: np.ndarray
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.node_start.shape[0])
+
+
+def _morton_keys(positions: np.ndarray, bits: int):
+    """Quantize positions onto a 2^bits grid and interleave into Z-order keys."""
+    lo = positions.min(axis=0)
+    extent = float(np.max(positions.max(axis=0) - lo))
+    if extent <= 0.0:
+        extent = 1.0
+    extent *= 1.0 + 1e-9
+    cells = (1 << bits)
+    q = np.floor((positions - lo) / extent * cells).astype(np.uint64)
+    np.clip(q, 0, cells - 1, out=q)
+    dim = positions.shape[1]
+    keys = np.zeros(positions.shape[0], dtype=np.uint64)
+    for b in range(bits):
+        for d in range(dim):
+            keys |= ((q[:, d] >> np.uint64(b)) & np.uint64(1)) << np.uint64(b * dim + d)
+    return keys, extent
+
+
+def _concat_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenate [start, start + count) ranges into one index array."""
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + (np.arange(total) - offsets)
+
+
+def _scatter_add(acc: np.ndarray, rows: np.ndarray, values: np.ndarray) -> None:
+    """acc[rows] += values with repeated rows accumulated (bincount is much faster than add.at)."""
+    for d in range(acc.shape[1]):
+        acc[:, d] += np.bincount(rows, weights=values[:, d], minlength=acc.shape[0])
+
+
+def build_tree(
+    positions: np.ndarray,
+    masses: np.ndarray,
+    leaf_size: int = DEFAULT_LEAF_SIZE,
+) -> BarnesHutTree:
+    """
+    Build a linear Barnes–Hut tree over `positions` (N, D) with `masses` (N,).
+
+    Nodes are emitted breadth-first; children of a node are contiguous in the
+    node arrays, so traversal only needs (first_child, n_children).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    n, dim = positions.shape
+    bits = 63 // dim if dim > 1 else 32
+    bits = min(bits, 21)
+    keys, extent = _morton_keys(positions, bits)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    m_sorted = masses[order]
+    mp_sorted = positions[order] * m_sorted[:, None]
+
+    starts = [np.array([0], dtype=np.int64)]
+    counts = [np.array([n], dtype=np.int64)]
+    sizes = [np.array([extent])]
+    first_child = [np.array([-1], dtype=np.int64)]
+    n_children = [np.array([0], dtype=np.int64)]
+
+    level_start, level_count = starts[0], counts[0]
+    n_nodes = 1
+    for level in range(1, bits + 1):
+        split = np.flatnonzero(level_count > leaf_size)
+        if split.size == 0:
+            break
+        idx = _concat_ranges(level_start[split], level_count[split])
+        shift = np.uint64(dim * (bits - level))
+        prefix = keys[idx] >> shift
+        # New child wherever the level prefix changes or a new parent begins.
+        parent_of = np.repeat(split, level_count[split])
+        brk = np.ones(idx.shape[0], dtype=bool)
+        brk[1:] = (prefix[1:] != prefix[:-1]) | (parent_of[1:] != parent_of[:-1])
+        child_pos = np.flatnonzero(brk)
+        child_start = idx[child_pos]
+        child_count = np.diff(np.append(child_pos, idx.shape[0]))
+        child_parent = parent_of[child_pos]
+
+        per_parent = np.bincount(child_parent, minlength=level_count.shape[0])[split]
+        first_local = np.cumsum(per_parent) - per_parent
+        fc = first_child[-1]
+        nc = n_children[-1]
+        fc[split] = n_nodes + first_local
+        nc[split] = per_parent
+
+        starts.append(child_start)
+        counts.append(child_count)
+        sizes.append(np.full(child_start.shape[0], extent / (1 << level)))
+        first_child.append(np.full(child_start.shape[0], -1, dtype=np.int64))
+        n_children.append(np.zeros(child_start.shape[0], dtype=np.int64))
+        n_nodes += child_start.shape[0]
+        level_start, level_count = child_start, child_count
+
+    node_start = np.concatenate(starts)
+    node_count = np.concatenate(counts)
+    # Node mass / centre of mass from prefix sums over the sorted bodies.
+    csum_m = np.concatenate(([0.0], np.cumsum(m_sorted)))
+    csum_mp = np.vstack((np.zeros((1, dim)), np.cumsum(mp_sorted, axis=0)))
+    node_end = node_start + node_count
+    node_mass = csum_m[node_end] - csum_m[node_start]
+    node_mp = csum_mp[node_end] - csum_mp[node_start]
+    safe_mass = np.where(node_mass > 0, node_mass, 1.0)
+    node_com = node_mp / safe_mass[:, None]
+    # Massless nodes: fall back to the geometric mean position of their bodies.
+    empty = node_mass <= 0
+    if np.any(empty):
+        csum_p = np.vstack((np.zeros((1, dim)), np.cumsum(positions[order], axis=0)))
+        node_com[empty] = (csum_p[node_end[empty]] - csum_p[node_start[empty]]) / node_count[empty, None]
+
+    return BarnesHutTree(
+        order=order,
+        node_start=node_start,
+        node_count=node_count,
+        node_first_child=np.concatenate(first_child),
+        node_n_children=np.concatenate(n_children),
+        node_mass=node_mass,
+        node_com=node_com,
+        node_size=np.concatenate(sizes),
+    )
+
+
+def tree_field_accelerations(
+    tree: BarnesHutTree,
+    source_positions: np.ndarray,
+    source_masses: np.ndarray,
+    targets: np.ndarray,
+    theta: float = DEFAULT_THETA,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+) -> np.ndarray:
+    """
+    Approximate accelerations at `targets` (M, D) from the bodies in `tree`.
+
+    A node is treated as a point mass at its centre of mass when
+    size / distance < theta; leaves that fail the test are summed directly. Pairs closer
+    than `min_separation` are skipped (this removes self-interaction).
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    m_count, dim = targets.shape
+    acc = np.zeros((m_count, dim), dtype=np.float64)
+    if m_count == 0 or tree.n_nodes == 0:
+        return acc
+    src_sorted = np.asarray(source_positions, dtype=np.float64)[tree.order]
+    m_sorted = np.asarray(source_masses, dtype=np.float64)[tree.order]
+    theta2 = theta * theta
+    min_r2 = min_separation * min_separation
+
+    # Chunk targets so the work list stays bounded as nodes are opened.
+    for c0 in range(0, m_count, _TARGET_CHUNK):
+        c1 = min(c0 + _TARGET_CHUNK, m_count)
+        tgt = np.arange(c0, c1)
+        node = np.zeros(tgt.shape[0], dtype=np.int64)
+        while tgt.size:
+            d = tree.node_com[node] - targets[tgt]
+            r2 = np.einsum("ij,ij->i", d, d)
+            size = tree.node_size[node]
+            leaf = tree.node_n_children[node] == 0
+            far = (size * size < theta2 * r2) & (r2 > min_r2)
+
+            # Accepted internal nodes (and far leaves) act as point masses.
+            use = far
+            if np.any(use):
+                w = tree.node_mass[node[use]] * r2[use] ** -1.5
+                _scatter_add(acc, tgt[use], d[use] * w[:, None])
+
+            # Near leaves: direct summation over their bodies.
+            direct = leaf & ~far
+            if np.any(direct):
+                dn = node[direct]
+                cnt = tree.node_count[dn]
+                bi = _concat_ranges(tree.node_start[dn], cnt)
+                ti = np.repeat(tgt[direct], cnt)
+                dd = src_sorted[bi] - targets[ti]
+                rr = np.einsum("ij,ij->i", dd, dd)
+                ok = rr > min_r2
+                w = m_sorted[bi[ok]] * rr[ok] ** -1.5
+                _scatter_add(acc, ti[ok], dd[ok] * w[:, None])
+
+            # Near internal nodes: replace with their children.
+            open_ = ~leaf & ~far
+            on = node[open_]
+            nc = tree.node_n_children[on]
+            tgt = np.repeat(tgt[open_], nc)
+            node = _concat_ranges(tree.node_first_child[on], nc)
+    acc *= G
+    return acc
+
+
+def barnes_hut_accelerations(
+    positions: np.ndarray,
+    masses: np.ndarray,
+    theta: float = DEFAULT_THETA,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+    leaf_size: int = DEFAULT_LEAF_SIZE,
+) -> np.ndarray:
+    """
+    Approximate mutual accelerations of N bodies in O(N log N).
+
+    Expect ~1% median force error at the default theta (see module docstring).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    if positions.shape[0] == 0:
+        return np.zeros_like(positions)
+    tree = build_tree(positions, masses, leaf_size=leaf_size)
+    return tree_field_accelerations(
+        tree, positions, masses, positions, theta=theta, G=G, min_separation=min_separation
+    )
@@ -0,0 +1,330 @@
+"""
+Batched integration of many independent planetary systems.
+
+S unrelated systems with up to N bodies each are packed into padded
+(S, N, D) arrays plus an (S, N) mask; padding slots have zero mass, so they
+exert no force, and the mask keeps them fixed. One kick-drift-kick step
+then advances every system with a handful of NumPy calls (the force kernel
+is `ensemble_accelerations`, which already takes per-system masses), and
+each system may have its own step size, so a catalog of hosts with very
+different orbital periods can be screened in lock-step: every system takes
+the same number of steps, sized to its own innermost orbit.
+
+`screen_systems` flags instabilities with the criteria and codes of
+`src.physics.ensemble` (escape, star collision, close encounter).
+
+Units follow `src.physics.nbody_kernels` (AU, years, Solar masses).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.physics.ensemble import (
+    CLOSE_ENCOUNTER,
+    ESCAPE,
+    STABLE,
+    STAR_COLLISION,
+    elements_to_state,
+    ensemble_accelerations,
+    ensemble_energy,
+)
+from src.physics.nbody_kernels import G_AU, M_EARTH_PER_M_SUN, R_SUN_AU
+
+
+@dataclass
+class SystemBatch:
+    """
+    Padded state of S independent systems.
+
+    Attributes:
+        positions: (S, N, D) positions in AU (padding slots stay at the origin).
+        velocities: (S, N, D) velocities in AU/yr.
+        masses: (S, N) masses in Solar masses (0 for padding).
+        mask: (S, N) True for real bodies.
+        system_names: (S,) system labels.
+        body_names: Per-system body names (real bodies only).
+        time: (S,) integrated time of each system in years.
+    """
+
+    positions: np.ndarray
+    velocities: np.ndarray
+    masses: np.ndarray
+    mask: np.ndarray
+    system_names: List[str] = field(default_factory=list)
+    body_names: List[List[str]] = field(default_factory=list)
+    time: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.masses = np.where(self.mask, self.masses, 0.0)
+        self.positions[~self.mask] = 0.0
+        self.velocities[~self.mask] = 0.0
+        if self.time is None:
+            self.time = np.zeros(self.n_systems)
+        if not self.system_names:
+            self.system_names = [f"system {s}" for s in range(self.n_systems)]
+
+    @property
+    def n_systems(self) -> int:
+        return int(self.positions.shape[0])
+
+    @property
+    def max_bodies(self) -> int:
+        return int(self.positions.shape[1])
+
+    @property
+    def system_index(self) -> np.ndarray:
+        """(S, N) index of the system each slot belongs to, -1 for padding."""
+        index = np.broadcast_to(np.arange(self.n_systems)[:, np.newaxis], self.mask.shape)
+        return np.where(self.mask, index, -1)
+
+    @property
+    def fill_fraction(self) -> float:
+        """Fraction of slots holding real bodies (1 - padding overhead)."""
+        return float(self.mask.mean()) if self.mask.size else 1.0
+
+    def system(self, s: int):
+        """(positions, velocities, masses) of system `s` without padding."""
+        m = self.mask[s]
+        return self.positions[s, m], self.velocities[s, m], self.masses[s, m]
+
+    @classmethod
+    def from_arrays(cls, systems: Sequence[Sequence[np.ndarray]], system_names: Sequence[str] = (),
+                    body_names: Sequence[Sequence[str]] = ()) -> "SystemBatch":
+        """Pack per-system (positions (n, D), velocities (n, D), masses (n,)) tuples."""
+        if not systems:
+            raise ValueError("no systems to batch")
+        n_max = max(len(m) for _, _, m in systems)
+        dim = max(np.shape(p)[1] for p, _, _ in systems)
+        pos = np.zeros((len(systems), n_max, dim))
+        vel = np.zeros((len(systems), n_max, dim))
+        mass = np.zeros((len(systems), n_max))
+        mask = np.zeros((len(systems), n_max), dtype=bool)
+        for s, (p, v, m) in enumerate(systems):
+            n = len(m)
+            p = np.asarray(p, dtype=np.float64)
+            v = np.asarray(v, dtype=np.float64)
+            pos[s, :n, :p.shape[1]] = p
+            vel[s, :n, :v.shape[1]] = v
+            mass[s, :n] = m
+            mask[s, :n] = True
+        return cls(pos, vel, mass, mask, list(system_names), [list(b) for b in body_names])
+
+    @classmethod
+    def from_body_lists(cls, systems: Sequence[Sequence[Dict[str, Any]]],
+                        system_names: Sequence[str] = ()) -> "SystemBatch":
+        """
+        Pack lists of body dicts (`position_au`, `velocity_au`, UI masses:
+        stars in Solar masses, others in Earth masses). Destroyed bodies are skipped.
+        """
+        packed, names = [], []
+        for bodies in systems:
+            live = [b for b in bodies if not b.get("is_destroyed", False)]
+            p = np.array([np.asarray(b["position_au"], dtype=float)[:2] for b in live]).reshape(-1, 2)
+            v = np.array([np.zeros(2) if b.get("velocity_au") is None
+                          else np.asarray(b["velocity_au"], dtype=float)[:2] for b in live]).reshape(-1, 2)
+            m = np.array([float(b.get("mass", 0.0) or 0.0) * (1.0 if b.get("type") == "star" else 1.0 / M_EARTH_PER_M_SUN)
+                          for b in live])
+            packed.append((p, v, m))
+            names.append([str(b.get("name", "")) for b in live])
+        return cls.from_arrays(packed, system_names, names)
+
+    @classmethod
+    def from_elements(cls, star_masses: np.ndarray, planet_masses: np.ndarray, semi_major_axes: np.ndarray,
+                      eccentricities: np.ndarray, planet_mask: np.ndarray,
+                      true_anomalies=0.0, periapsis_angles=0.0, system_names: Sequence[str] = (),
+                      G: float = G_AU) -> "SystemBatch":
+        """
+        Star + planets systems from padded planar elements, e.g. one row per
+        catalog host star.
+
+        Args:
+            star_masses: (S,) in Solar masses.
+            planet_masses: (S, P) in Solar masses.
+            semi_major_axes: (S, P) in AU.
+            eccentricities: (S, P).
+            planet_mask: (S, P) True for real planets.
+            true_anomalies, periapsis_angles: Scalars or (S, P) angles in radians.
+        """
+        planet_mask = np.asarray(planet_mask, dtype=bool)
+        m_p = np.where(planet_mask, planet_masses, 0.0)
+        # Padding planets get a harmless orbit; their mass is zero and they are masked.
+        a = np.where(planet_mask, semi_major_axes, 1.0)
+        e = np.where(planet_mask, eccentricities, 0.0)
+        pos, vel, masses = elements_to_state(star_masses, m_p, a, e, true_anomalies, periapsis_angles, G=G)
+        mask = np.concatenate((np.ones((planet_mask.shape[0], 1), dtype=bool), planet_mask), axis=1)
+        return cls(pos, vel, masses, mask, list(system_names))
+
+
+def batched_accelerations(positions: np.ndarray, masses: np.ndarray, mask: np.ndarray,
+                          G: float = G_AU) -> np.ndarray:
+    """(S, N, D) accelerations; zero for padding slots."""
+    acc = ensemble_accelerations(positions, masses, G=G)
+    acc[~mask] = 0.0
+    return acc
+
+
+def batched_leapfrog(
+    batch: SystemBatch,
+    h,
+    n_steps: int,
+    G: float = G_AU,
+    accelerations: Optional[np.ndarray] = None,
+    step_callback: Optional[Callable[[int], None]] = None,
+) -> np.ndarray:
+    """
+    Kick-drift-kick leapfrog for every system of `batch` in place.
+
+    Args:
+        batch: Systems to advance.
+        h: Step in years, scalar or (S,) per system.
+        n_steps: Number of steps (the same for all systems).
+        G: Gravitational constant.
+        accelerations: Accelerations at the current positions, if known.
+        step_callback: Called with the step index after each step.
+
+    Returns:
+        Accelerations at the final positions.
+    """
+    h = np.broadcast_to(np.asarray(h, dtype=np.float64), (batch.n_systems,))
+    h_col = h[:, np.newaxis, np.newaxis]
+    half_h = 0.5 * h_col
+    pos, vel, mass, mask = batch.positions, batch.velocities, batch.masses, batch.mask
+    acc = batched_accelerations(pos, mass, mask, G=G) if accelerations is None else accelerations
+    for step in range(int(n_steps)):
+        vel += half_h * acc
+        pos += h_col * vel
+        acc = batched_accelerations(pos, mass, mask, G=G)
+        vel += half_h * acc
+        if step_callback is not None:
+            step_callback(step)
+    batch.time += n_steps * h
+    return acc
+
+
+def innermost_periods(batch: SystemBatch, G: float = G_AU) -> np.ndarray:
+    """(S,) shortest two-body period of any body about its system's most massive body."""
+    host = np.argmax(batch.masses, axis=1)
+    rows = np.arange(batch.n_systems)
+    rel = batch.positions - batch.positions[rows, host][:, np.newaxis]
+    r = np.sqrt(np.einsum("snd,snd->sn", rel, rel))
+    valid = batch.mask.copy()
+    valid[rows, host] = False
+    mu = G * (batch.masses[rows, host][:, np.newaxis] + batch.masses)
+    period = 2.0 * np.pi * np.sqrt(np.where(valid, r, 1.0) ** 3 / np.where(mu > 0.0, mu, 1.0))
+    period = np.where(valid, period, np.inf).min(axis=1)
+    # Single-body systems have nothing to resolve; give them a nominal year.
+    return np.where(np.isfinite(period), period, 1.0)
+
+
+@dataclass
+class BatchScreenResult:
+    """
+    Outcome of `screen_systems`.
+
+    Attributes:
+        stable: (S,) True for systems that never met an instability criterion.
+        reason: (S,) int code (STABLE, ESCAPE, STAR_COLLISION, CLOSE_ENCOUNTER).
+        instability_time: (S,) years until the first instability (inf if stable).
+        energy_error: (S,) final relative energy error |E - E0| / |E0|.
+        duration: (S,) integrated time per system in years.
+        step: (S,) step size per system in years.
+        system_names: (S,) system labels.
+    """
+
+    stable: np.ndarray
+    reason: np.ndarray
+    instability_time: np.ndarray
+    energy_error: np.ndarray
+    duration: np.ndarray
+    step: np.ndarray
+    system_names: List[str] = field(default_factory=list)
+
+    @property
+    def stable_fraction(self) -> float:
+        return float(np.mean(self.stable)) if self.stable.size else float("nan")
+
+
+def screen_systems(
+    batch: SystemBatch,
+    n_orbits: float = 100.0,
+    steps_per_orbit: int = 40,
+    G: float = G_AU,
+    escape_factor: float = 10.0,
+    hill_fraction: float = 1.0,
+    collision_radius_au: float = R_SUN_AU,
+    check_interval: int = 10,
+) -> BatchScreenResult:
+    """
+    Integrate every system for `n_orbits` of its innermost orbit and flag
+    the first instability of each.
+
+    Each system's step is its innermost period / `steps_per_orbit`, so all
+    systems take the same number of steps. The host is each system's most
+    massive body; escape and close-encounter radii use the initial
+    distances from it, as in `integrate_ensemble`. `batch` is advanced in
+    place.
+    """
+    s_count = batch.n_systems
+    rows = np.arange(s_count)
+    period = innermost_periods(batch, G=G)
+    n_steps = max(1, int(np.ceil(n_orbits * steps_per_orbit)))
+    h = period / steps_per_orbit
+    masses = batch.masses
+    host = np.argmax(masses, axis=1)
+    others = batch.mask.copy()
+    others[rows, host] = False
+
+    def host_distance():
+        rel = batch.positions - batch.positions[rows, host][:, np.newaxis]
+        return np.sqrt(np.einsum("snd,snd->sn", rel, rel))
+
+    r0 = host_distance()
+    escape_r = escape_factor * np.where(others, r0, 0.0).max(axis=1)
+    i, j = np.triu_indices(batch.max_bodies, k=1)
+    pair_ok = others[:, i] & others[:, j]
+    host_mass = masses[rows, host][:, np.newaxis]
+    mutual_hill = (((masses[:, i] + masses[:, j]) / (3.0 * host_mass)) ** (1.0 / 3.0)
+                   * 0.5 * (r0[:, i] + r0[:, j]))
+    encounter_r = hill_fraction * mutual_hill
+
+    reason = np.zeros(s_count, dtype=np.int8)
+    t_unstable = np.full(s_count, np.inf)
+    e0 = ensemble_energy(batch.positions, batch.velocities, masses, G=G)
+    t_start = batch.time.copy()
+
+    def check(step):
+        r = host_distance()
+        codes = np.zeros(s_count, dtype=np.int8)
+        if i.size:
+            sep = np.linalg.norm(batch.positions[:, j] - batch.positions[:, i], axis=2)
+            codes[np.any(pair_ok & (sep < encounter_r), axis=1)] = CLOSE_ENCOUNTER
+        codes[np.any(others & (r < collision_radius_au), axis=1)] = STAR_COLLISION
+        codes[np.any(others & (r > escape_r[:, np.newaxis]), axis=1)] = ESCAPE
+        new = (codes != STABLE) & (reason == STABLE)
+        reason[new] = codes[new]
+        t_unstable[new] = (step * h)[new]
+
+    check_interval = max(1, int(check_interval))
+    acc = None
+    done = 0
+    while done < n_steps:
+        chunk = min(check_interval, n_steps - done)
+        acc = batched_leapfrog(batch, h, chunk, G=G, accelerations=acc)
+        done += chunk
+        check(done)
+
+    e1 = ensemble_energy(batch.positions, batch.velocities, masses, G=G)
+    energy_error = np.abs(e1 - e0) / np.where(e0 != 0.0, np.abs(e0), 1.0)
+    return BatchScreenResult(
+        stable=reason == STABLE,
+        reason=reason,
+        instability_time=t_unstable,
+        energy_error=energy_error,
+        duration=batch.time - t_start,
+        step=h,
+        system_names=list(batch.system_names),
+    )
@@ -0,0 +1,357 @@
+"""
+Ensemble N-body integration: K perturbed copies of one system in a single array.
+
+State is a (K, N, D) tensor (members x bodies x dimensions) advanced by one
+batched kick-drift-kick leapfrog, so a 1,000-member ensemble costs about as
+many NumPy calls as a single system. Body 0 of every member is the central
+star; bodies 1..P are its planets.
+
+Members are drawn with the Monte Carlo sampler used for habitability
+uncertainty (`src.ml.ml_uncertainty.sample_inputs`): planet masses and
+eccentricities, plus the stellar mass, are perturbed with the same fallback
+uncertainties.
+
+A member is flagged unstable the first time a planet
+- escapes beyond `escape_factor` x the outermost initial semi-major axis,
+- falls inside `collision_radius_au` of the star, or
+- passes within `hill_fraction` mutual Hill radii of another planet.
+
+Units follow `src.physics.nbody_kernels` (AU, years, Solar masses).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from src.ml.ml_uncertainty import DEFAULT_FALLBACK_UNCERTAINTY, sample_inputs
+from src.physics.nbody_kernels import (
+    _BLOCK_ELEMENTS,
+    G_AU,
+    M_EARTH_PER_M_SUN,
+    MIN_SEPARATION_AU,
+    R_SUN_AU,
+)
+
+# Instability reasons stored per member in EnsembleResult.reason
+STABLE = 0
+ESCAPE = 1
+STAR_COLLISION = 2
+CLOSE_ENCOUNTER = 3
+
+# Eccentricities are clipped below this when building initial conditions.
+_MAX_ECCENTRICITY = 0.95
+
+
+@dataclass
+class EnsembleResult:
+    """
+    Outcome of an ensemble stability run.
+
+    Attributes:
+        stable: (K,) True for members that never met an instability criterion.
+        reason: (K,) int code (STABLE, ESCAPE, STAR_COLLISION, CLOSE_ENCOUNTER).
+        instability_time: (K,) years until the first instability (inf if stable).
+        energy_error: (K,) final relative energy error |E - E0| / |E0|.
+        masses: (K, N) body masses in Solar masses (star first).
+        semi_major_axes: (K, P) initial planet semi-major axes in AU.
+        eccentricities: (K, P) initial planet eccentricities.
+        duration: Integrated time in years.
+        step: Step size in years.
+    """
+
+    stable: np.ndarray
+    reason: np.ndarray
+    instability_time: np.ndarray
+    energy_error: np.ndarray
+    masses: np.ndarray
+    semi_major_axes: np.ndarray
+    eccentricities: np.ndarray
+    duration: float
+    step: float
+
+    @property
+    def n_members(self) -> int:
+        return int(self.stable.shape[0])
+
+    @property
+    def stable_fraction(self) -> float:
+        """Fraction of members that stayed stable (the stability probability)."""
+        return float(np.mean(self.stable)) if self.stable.size else float("nan")
+
+
+def ensemble_accelerations(
+    positions: np.ndarray,
+    masses: np.ndarray,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+) -> np.ndarray:
+    """
+    Mutual accelerations for every member of an ensemble.
+
+    Args:
+        positions: (K, N, D) positions.
+        masses: (K, N) per-member masses, or (N,) shared by all members.
+        G: Gravitational constant.
+        min_separation: Pairs with |r| <= min_separation contribute nothing.
+
+    Returns:
+        (K, N, D) accelerations.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    k_count, n, dim = positions.shape
+    masses = np.broadcast_to(np.asarray(masses, dtype=np.float64), (k_count, n))
+    acc = np.empty_like(positions)
+    min_r2 = min_separation * min_separation
+    step = max(1, _BLOCK_ELEMENTS // max(1, n * n * dim))
+    for start in range(0, k_count, step):
+        stop = min(start + step, k_count)
+        pos = positions[start:stop]
+        # dx[k, i, j] = r_j - r_i
+        dx = pos[:, np.newaxis, :, :] - pos[:, :, np.newaxis, :]
+        r2 = np.einsum("kijd,kijd->kij", dx, dx)
+        near = r2 <= min_r2
+        r2[near] = 1.0
+        w = r2 ** -1.5
+        w[near] = 0.0
+        w *= masses[start:stop, np.newaxis, :]
+        acc[start:stop] = np.einsum("kij,kijd->kid", w, dx)
+    acc *= G
+    return acc
+
+
+def ensemble_energy(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    masses: np.ndarray,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+) -> np.ndarray:
+    """(K,) total energy of each member in M_sun * AU^2 / year^2."""
+    k_count, n, _ = positions.shape
+    masses = np.broadcast_to(np.asarray(masses, dtype=np.float64), (k_count, n))
+    kinetic = 0.5 * np.einsum("kn,knd,knd->k", masses, velocities, velocities)
+    i, j = np.triu_indices(n, k=1)
+    r = np.linalg.norm(positions[:, j] - positions[:, i], axis=2)
+    mm = masses[:, i] * masses[:, j]
+    potential = -G * np.sum(np.where(r > min_separation, mm / np.where(r > 0, r, 1.0), 0.0), axis=1)
+    return kinetic + potential
+
+
+def elements_to_state(
+    star_mass: np.ndarray,
+    planet_masses: np.ndarray,
+    semi_major_axes: np.ndarray,
+    eccentricities: np.ndarray,
+    true_anomalies: np.ndarray,
+    periapsis_angles: np.ndarray,
+    G: float = G_AU,
+):
+    """
+    Barycentric (K, N, 2) positions/velocities from per-member planar elements.
+
+    Each planet is placed on a two-body orbit about the star (masses in Solar
+    masses, angles in radians); the result is shifted to the barycentre.
+
+    Returns:
+        (positions, velocities, masses) with masses of shape (K, N).
+    """
+    star_mass = np.asarray(star_mass, dtype=np.float64)
+    m_p = np.asarray(planet_masses, dtype=np.float64)
+    a = np.asarray(semi_major_axes, dtype=np.float64)
+    e = np.clip(np.asarray(eccentricities, dtype=np.float64), 0.0, _MAX_ECCENTRICITY)
+    nu = np.broadcast_to(np.asarray(true_anomalies, dtype=np.float64), a.shape)
+    omega = np.broadcast_to(np.asarray(periapsis_angles, dtype=np.float64), a.shape)
+    k_count, p_count = a.shape
+
+    mu = G * (star_mass[:, np.newaxis] + m_p)
+    p = a * (1.0 - e * e)
+    r = p / (1.0 + e * np.cos(nu))
+    v_scale = np.sqrt(mu / p)
+    phi = nu + omega
+    cos_w, sin_w = np.cos(omega), np.sin(omega)
+    # Perifocal velocity (-sin nu, e + cos nu) rotated by the periapsis angle.
+    vx_pf = -v_scale * np.sin(nu)
+    vy_pf = v_scale * (e + np.cos(nu))
+
+    pos = np.zeros((k_count, p_count + 1, 2))
+    vel = np.zeros((k_count, p_count + 1, 2))
+    pos[:, 1:, 0] = r * np.cos(phi)
+    pos[:, 1:, 1] = r * np.sin(phi)
+    vel[:, 1:, 0] = cos_w * vx_pf - sin_w * vy_pf
+    vel[:, 1:, 1] = sin_w * vx_pf + cos_w * vy_pf
+
+    masses = np.concatenate((star_mass[:, np.newaxis], m_p), axis=1)
+    total = masses.sum(axis=1, keepdims=True)
+    pos -= np.einsum("kn,knd->kd", masses, pos)[:, np.newaxis, :] / total[:, :, np.newaxis]
+    vel -= np.einsum("kn,knd->kd", masses, vel)[:, np.newaxis, :] / total[:, :, np.newaxis]
+    return pos, vel, masses
+
+
+def sample_ensemble(
+    star_mass: float,
+    planets: Sequence[Dict[str, Any]],
+    n_members: int,
+    rng: np.random.Generator,
+    fallback_config: Optional[Dict[str, Any]] = None,
+):
+    """
+    Perturbed stellar masses, planet masses and eccentricities for `n_members`.
+
+    Planets are dicts in the UI's units ("mass" in Earth masses, "eccentricity");
+    the draws come from `sample_inputs` with the Monte Carlo fallback
+    uncertainties (or `fallback_config`).
+
+    Returns:
+        (star_masses (K,), planet_masses (K, P) in Solar masses, eccentricities (K, P))
+    """
+    if fallback_config is None:
+        fallback_config = dict(DEFAULT_FALLBACK_UNCERTAINTY)
+    star_rows = sample_inputs({"st_mass": float(star_mass)}, fallback_config, n_members, rng)
+    star_masses = np.array([row["st_mass"] for row in star_rows])
+    planet_masses = np.empty((n_members, len(planets)))
+    eccentricities = np.empty((n_members, len(planets)))
+    for j, planet in enumerate(planets):
+        nominal = {
+            "pl_masse": float(planet.get("mass", 1.0)),
+            "pl_orbeccen": float(planet.get("eccentricity", 0.0) or 0.0),
+        }
+        rows = sample_inputs(nominal, fallback_config, n_members, rng)
+        planet_masses[:, j] = [row["pl_masse"] / M_EARTH_PER_M_SUN for row in rows]
+        eccentricities[:, j] = [row["pl_orbeccen"] for row in rows]
+    return star_masses, planet_masses, eccentricities
+
+
+def integrate_ensemble(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    masses: np.ndarray,
+    semi_major_axes: np.ndarray,
+    duration: float,
+    h: float,
+    G: float = G_AU,
+    escape_factor: float = 10.0,
+    hill_fraction: float = 1.0,
+    collision_radius_au: float = R_SUN_AU,
+    check_interval: int = 10,
+):
+    """
+    Leapfrog every member forward by `duration` years and track instabilities.
+
+    `positions`/`velocities` (K, N, D) are updated in place. Members keep being
+    integrated after they go unstable (cheaper than compacting the arrays);
+    only their first instability is recorded.
+
+    Returns:
+        (reason (K,), instability_time (K,), energy_error (K,))
+    """
+    k_count, n, _ = positions.shape
+    masses = np.broadcast_to(np.asarray(masses, dtype=np.float64), (k_count, n))
+    a = np.asarray(semi_major_axes, dtype=np.float64)
+    reason = np.zeros(k_count, dtype=np.int8)
+    t_unstable = np.full(k_count, np.inf)
+    e0 = ensemble_energy(positions, velocities, masses, G=G)
+
+    escape_r = escape_factor * a.max(axis=1)
+    i, j = np.triu_indices(n - 1, k=1)
+    i, j = i + 1, j + 1
+    # Mutual Hill radius of each planet pair at its initial orbits.
+    mutual_hill = (((masses[:, i] + masses[:, j]) / (3.0 * masses[:, :1])) ** (1.0 / 3.0)
+                   * 0.5 * (a[:, i - 1] + a[:, j - 1]))
+    encounter_r = hill_fraction * mutual_hill
+
+    def check(t):
+        rel = positions[:, 1:] - positions[:, :1]
+        r_star = np.sqrt(np.einsum("kpd,kpd->kp", rel, rel))
+        codes = np.zeros(k_count, dtype=np.int8)
+        if i.size:
+            sep = np.linalg.norm(positions[:, j] - positions[:, i], axis=2)
+            codes[np.any(sep < encounter_r, axis=1)] = CLOSE_ENCOUNTER
+        codes[np.any(r_star < collision_radius_au, axis=1)] = STAR_COLLISION
+        codes[np.any(r_star > escape_r[:, np.newaxis], axis=1)] = ESCAPE
+        new = (codes != STABLE) & (reason == STABLE)
+        reason[new] = codes[new]
+        t_unstable[new] = t
+
+    n_steps = max(1, int(np.ceil(duration / h)))
+    h = duration / n_steps
+    check_interval = max(1, int(check_interval))
+    acc = ensemble_accelerations(positions, masses, G=G)
+    half_h = 0.5 * h
+    for step in range(1, n_steps + 1):
+        velocities += half_h * acc
+        positions += h * velocities
+        acc = ensemble_accelerations(positions, masses, G=G)
+        velocities += half_h * acc
+        if step % check_interval == 0 or step == n_steps:
+            check(step * h)
+
+    e1 = ensemble_energy(positions, velocities, masses, G=G)
+    energy_error = np.abs(e1 - e0) / np.where(e0 != 0.0, np.abs(e0), 1.0)
+    return reason, t_unstable, energy_error
+
+
+def run_ensemble(
+    star_mass: float,
+    planets: Sequence[Dict[str, Any]],
+    n_members: int = 1000,
+    duration: Optional[float] = None,
+    steps_per_orbit: int = 40,
+    seed: Optional[int] = None,
+    fallback_config: Optional[Dict[str, Any]] = None,
+    G: float = G_AU,
+    **criteria,
+) -> EnsembleResult:
+    """
+    Orbital-stability probability of a star + planets system under input uncertainty.
+
+    Args:
+        star_mass: Nominal stellar mass in Solar masses.
+        planets: Dicts with "mass" (Earth masses), "semiMajorAxis" (AU) and
+            optionally "eccentricity", "orbit_angle" (true anomaly, rad) and
+            "periapsis_angle" (rad).
+        n_members: Ensemble size K.
+        duration: Years to integrate (default: 100 orbits of the innermost planet).
+        steps_per_orbit: Leapfrog steps per innermost orbital period.
+        seed: Seed for the perturbation draws.
+        fallback_config: Override for the Monte Carlo fallback uncertainties.
+        G: Gravitational constant.
+        **criteria: escape_factor, hill_fraction, collision_radius_au,
+            check_interval (see `integrate_ensemble`).
+
+    Returns:
+        EnsembleResult; `stable_fraction` is the stability probability.
+    """
+    if not planets:
+        raise ValueError("ensemble needs at least one planet")
+    rng = np.random.default_rng(seed)
+    n_members = int(n_members)
+    star_masses, planet_masses, ecc = sample_ensemble(star_mass, planets, n_members, rng, fallback_config)
+    a_nominal = np.array([float(p.get("semiMajorAxis", 1.0)) for p in planets])
+    a = np.broadcast_to(a_nominal, ecc.shape).copy()
+    nu = np.array([float(p.get("orbit_angle", 0.0) or 0.0) for p in planets])
+    omega = np.array([float(p.get("periapsis_angle", 0.0) or 0.0) for p in planets])
+    pos, vel, masses = elements_to_state(star_masses, planet_masses, a, ecc, nu, omega, G=G)
+
+    # Resolve the innermost orbit's periapsis passage in the most eccentric member.
+    a_min = float(a_nominal.min())
+    period_min = 2.0 * np.pi * np.sqrt(a_min ** 3 / (G * float(star_masses.min())))
+    e_max = float(np.clip(ecc, 0.0, _MAX_ECCENTRICITY).max())
+    h = period_min / steps_per_orbit * (1.0 - e_max) ** 1.5
+    if duration is None:
+        duration = 100.0 * period_min
+
+    reason, t_unstable, energy_error = integrate_ensemble(pos, vel, masses, a, duration, h, G=G, **criteria)
+    return EnsembleResult(
+        stable=reason == STABLE,
+        reason=reason,
+        instability_time=t_unstable,
+        energy_error=energy_error,
+        masses=masses,
+        semi_major_axes=a,
+        eccentricities=ecc,
+        duration=float(duration),
+        step=float(duration / max(1, int(np.ceil(duration / h)))),
+    )
@@ -0,0 +1,259 @@
+"""
+Sub-step event detection for the N-body integrators.
+
+Event functions g(x, v) are evaluated for every candidate pair at the end of
+each step of a sampled trajectory (all steps in one array pass). A sign change
+between consecutive samples brackets an event; its time is then refined by
+bisection on a cubic Hermite interpolant of the pair's relative motion (built
+from the positions and velocities at both ends of the step), so event times
+are accurate to a small fraction of the step without shrinking the global
+timestep.
+
+Event kinds:
+    "collision"  g = |r_ij|^2 - (R_i + R_j)^2 turns negative (a star/non-star
+                 pair is reported as "engulfment"). Fly-bys that enter and
+                 leave the contact radius inside one step are caught by
+                 sampling the interpolant for close pairs.
+    "periapsis"  g = r . v about the body's host turns from negative to positive.
+    "transit"    the body crosses the line from a star towards the observer,
+                 g = (r x los), with the body on the observer's side.
+
+Units follow `src.physics.nbody_kernels` (AU, AU/year, years).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.physics.broad_phase import sweep_and_prune
+
+EVENT_KINDS = ("collision", "periapsis", "transit")
+
+_BISECTION_ITERATIONS = 40
+_FLYBY_SAMPLES = 8
+# From this many bodies, collision pairs come from a sweep-and-prune over each
+# body's swept box instead of all pairs; periapsis hosts are looked up among
+# the _MAX_HOSTS heaviest bodies only.
+_BROAD_PHASE_MIN_BODIES = 64
+_MAX_HOSTS = 32
+
+
+@dataclass
+class Event:
+    """
+    One localized event.
+
+    Attributes:
+        kind: "collision", "engulfment", "periapsis" or "transit".
+        time: Event time in the caller's clock (years).
+        i: Index of the first body (the host / star for periapsis and transits).
+        j: Index of the second body.
+        separation: |r_ij| at the event in AU.
+    """
+
+    kind: str
+    time: float
+    i: int
+    j: int
+    separation: float
+
+
+def hermite_state(x0, v0, x1, v1, h, s: np.ndarray):
+    """
+    Cubic Hermite position and velocity at step fractions `s` (K,) for (K, D)
+    end states; `h` is the step length, scalar or one per row (K,).
+    """
+    s = np.asarray(s, dtype=np.float64)[:, np.newaxis]
+    h = np.asarray(h, dtype=np.float64)
+    if h.ndim:
+        h = h[:, np.newaxis]
+    s2 = s * s
+    s3 = s2 * s
+    x = ((2 * s3 - 3 * s2 + 1) * x0 + (s3 - 2 * s2 + s) * h * v0
+         + (3 * s2 - 2 * s3) * x1 + (s3 - s2) * h * v1)
+    v = ((6 * s2 - 6 * s) * (x0 - x1) / h + (3 * s2 - 4 * s + 1) * v0
+         + (3 * s2 - 2 * s) * v1)
+    return x, v
+
+
+def _cross2(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+class EventDetector:
+    """
+    Finds events along a sampled trajectory.
+
+    `scan` takes the states at the ends of S consecutive steps, evaluates every
+    event function at all S + 1 samples in one array pass, and only refines
+    the (step, pair) brackets that contain a crossing.
+
+    Args:
+        masses: (N,) masses (used to pick each body's periapsis host).
+        radii: (N,) physical radii in AU.
+        is_star: (N,) True for stars.
+        kinds: Event kinds to detect (subset of EVENT_KINDS).
+        line_of_sight: (D,) direction from the system towards the observer.
+    """
+
+    def __init__(self, masses: np.ndarray, radii: np.ndarray, is_star: np.ndarray,
+                 kinds: Sequence[str] = EVENT_KINDS, line_of_sight: Optional[Sequence[float]] = None):
+        self.masses = np.asarray(masses, dtype=np.float64)
+        self.radii = np.asarray(radii, dtype=np.float64)
+        self.is_star = np.asarray(is_star, dtype=bool)
+        self.kinds = tuple(k for k in kinds if k in EVENT_KINDS)
+        n = self.masses.shape[0]
+        los = np.array([0.0, 1.0] if line_of_sight is None else line_of_sight, dtype=np.float64)
+        self._los = los / np.linalg.norm(los)
+        # Transits: (star, non-star) pairs.
+        stars = np.flatnonzero(self.is_star)
+        others = np.flatnonzero(~self.is_star)
+        self._tr_a = np.repeat(stars, others.size)
+        self._tr_b = np.tile(others, stars.size)
+        # Small systems check all pairs; the index arrays are built once.
+        self._all_pairs = np.triu_indices(n, k=1) if n < _BROAD_PHASE_MIN_BODIES else None
+
+    def _hosts(self, x: np.ndarray):
+        """(host, orbiter) index pairs: each body's heaviest-pull heavier neighbour."""
+        n = x.shape[0]
+        candidates = np.argsort(-self.masses, kind="stable")[:_MAX_HOSTS]
+        d = x[np.newaxis, candidates] - x[:, np.newaxis]
+        d2 = np.einsum("ijd,ijd->ij", d, d)
+        d2[candidates, np.arange(candidates.size)] = np.inf
+        pull = self.masses[np.newaxis, candidates] / np.maximum(d2, 1e-300)
+        pull[self.masses[np.newaxis, candidates] <= self.masses[:, np.newaxis]] = 0.0
+        best = np.argmax(pull, axis=1)
+        orbiter = np.flatnonzero(pull[np.arange(n), best] > 0.0)
+        return candidates[best[orbiter]], orbiter
+
+    def scan(self, positions: np.ndarray, velocities: np.ndarray, h, t0: float) -> List[Event]:
+        """
+        Events along a trajectory sampled at the ends of S steps.
+
+        Args:
+            positions: (S + 1, N, D) positions at t0 and after every step.
+            velocities: (S + 1, N, D) velocities at the same times.
+            h: Step length in years, scalar for a fixed step or (S,) per step
+                (e.g. the accepted steps of the adaptive integrator).
+            t0: Time of the first sample.
+
+        Returns:
+            Events sorted by time.
+        """
+        xs = np.asarray(positions, dtype=np.float64)
+        vs = np.asarray(velocities, dtype=np.float64)
+        if xs.shape[0] < 2 or xs.shape[1] < 2:
+            return []
+        hs = np.broadcast_to(np.asarray(h, dtype=np.float64), (xs.shape[0] - 1,))
+        if np.any(hs <= 0.0):
+            return []
+        # Trajectory: samples, per-step lengths and the time of every sample.
+        traj = (xs, vs, hs, t0 + np.concatenate(([0.0], np.cumsum(hs))))
+        events: List[Event] = []
+        if "collision" in self.kinds:
+            events.extend(self._collisions(traj))
+        if "periapsis" in self.kinds:
+            host, orbiter = self._hosts(xs[0])
+            if host.size:
+                g = np.einsum("skd,skd->sk", xs[:, orbiter] - xs[:, host], vs[:, orbiter] - vs[:, host])
+                step, k = np.nonzero((g[:-1] < 0.0) & (g[1:] >= 0.0))
+                events.extend(self._localize("periapsis", traj, step, host[k], orbiter[k]))
+        if "transit" in self.kinds and xs.shape[2] == 2 and self._tr_a.size:
+            g = _cross2(xs[:, self._tr_b] - xs[:, self._tr_a], self._los)
+            step, k = np.nonzero(np.signbit(g[:-1]) != np.signbit(g[1:]))
+            found = self._localize("transit", traj, step, self._tr_a[k], self._tr_b[k])
+            events.extend(e for e in found if self._in_front(e, traj))
+        events.sort(key=lambda e: e.time)
+        return events
+
+    @staticmethod
+    def _relative(traj, step, a, b):
+        xs, vs = traj[0], traj[1]
+        return (xs[step, b] - xs[step, a], vs[step, b] - vs[step, a],
+                xs[step + 1, b] - xs[step + 1, a], vs[step + 1, b] - vs[step + 1, a])
+
+    def _g(self, kind, x, v, contact2=None):
+        if kind == "collision":
+            return np.einsum("kd,kd->k", x, x) - contact2
+        if kind == "periapsis":
+            return np.einsum("kd,kd->k", x, v)
+        return _cross2(x, self._los)
+
+    def _collision_pairs(self, xs: np.ndarray):
+        """Index pairs (i < j) that may touch during the trajectory."""
+        if self._all_pairs is not None:
+            return self._all_pairs
+        # Boxes around each body's whole path; a pair can only touch if these overlap.
+        r = self.radii[:, np.newaxis]
+        return sweep_and_prune(xs.min(axis=0) - r, xs.max(axis=0) + r)
+
+    def _collisions(self, traj) -> List[Event]:
+        xs, vs, h, _ = traj
+        pi, pj = self._collision_pairs(xs)
+        if pi.size == 0:
+            return []
+        contact2 = (self.radii[pi] + self.radii[pj]) ** 2
+        r = xs[:, pj] - xs[:, pi]
+        g = np.einsum("skd,skd->sk", r, r) - contact2
+        outside = g >= 0.0
+        step, k = np.nonzero(outside[:-1] & ~outside[1:])
+        hi = np.ones(step.size)
+        # Pairs outside contact at both ends but close enough to pass through it.
+        rv = vs[1:, pj] - vs[1:, pi]
+        reach = np.sqrt(contact2) + h[:, np.newaxis] * np.sqrt(np.einsum("skd,skd->sk", rv, rv))
+        f_step, f_k = np.nonzero(outside[:-1] & outside[1:] & (g[1:] + contact2 < reach * reach))
+        if f_step.size:
+            x0r, v0r, x1r, v1r = self._relative(traj, f_step, pi[f_k], pj[f_k])
+            first = np.full(f_step.size, np.inf)
+            for s in np.linspace(0.0, 1.0, _FLYBY_SAMPLES + 2)[-2:0:-1]:
+                x, _ = hermite_state(x0r, v0r, x1r, v1r, h[f_step], np.full(f_step.size, s))
+                first[np.einsum("kd,kd->k", x, x) < contact2[f_k]] = s
+            found = np.isfinite(first)
+            step = np.concatenate((step, f_step[found]))
+            k = np.concatenate((k, f_k[found]))
+            hi = np.concatenate((hi, first[found]))
+        events = self._localize("collision", traj, step, pi[k], pj[k], hi=hi, contact2=contact2[k])
+        for e in events:
+            if self.is_star[e.i] != self.is_star[e.j]:
+                e.kind = "engulfment"
+        # Only the first contact of each pair counts.
+        seen = set()
+        first_contacts = []
+        for e in sorted(events, key=lambda e: e.time):
+            if (e.i, e.j) not in seen:
+                seen.add((e.i, e.j))
+                first_contacts.append(e)
+        return first_contacts
+
+    def _localize(self, kind, traj, step, a, b, hi=None, contact2=None) -> List[Event]:
+        """Bisect g on each bracket's Hermite interpolant between s = 0 and `hi`."""
+        if step.size == 0:
+            return []
+        h, times = traj[2][step], traj[3]
+        x0r, v0r, x1r, v1r = self._relative(traj, step, a, b)
+        lo = np.zeros(step.size)
+        hi = np.ones(step.size) if hi is None else np.asarray(hi, dtype=np.float64).copy()
+        sign_lo = np.signbit(self._g(kind, x0r, v0r, contact2))
+        for _ in range(_BISECTION_ITERATIONS):
+            mid = 0.5 * (lo + hi)
+            x, v = hermite_state(x0r, v0r, x1r, v1r, h, mid)
+            same = np.signbit(self._g(kind, x, v, contact2)) == sign_lo
+            lo = np.where(same, mid, lo)
+            hi = np.where(same, hi, mid)
+        s = 0.5 * (lo + hi)
+        x, _ = hermite_state(x0r, v0r, x1r, v1r, h, s)
+        sep = np.sqrt(np.einsum("kd,kd->k", x, x))
+        return [Event(kind, float(times[step[q]] + s[q] * h[q]), int(a[q]), int(b[q]), float(sep[q]))
+                for q in range(step.size)]
+
+    def _in_front(self, event: Event, traj) -> bool:
+        """True when the transiting body is on the observer's side of the star."""
+        hs, times = traj[2], traj[3]
+        k = min(max(int(np.searchsorted(times, event.time, side="right")) - 1, 0), hs.shape[0] - 1)
+        step = np.array([k])
+        x0r, v0r, x1r, v1r = self._relative(traj, step, np.array([event.i]), np.array([event.j]))
+        x, _ = hermite_state(x0r, v0r, x1r, v1r, hs[k], np.array([(event.time - times[k]) / hs[k]]))
+        return float(x[0] @ self._los) > 0.0
@@ -0,0 +1,226 @@
+"""
+Integrator validation: conserved-quantity drift of a short headless run.
+
+`run_integrator_validation` integrates a copy of a body list and records total
+energy, linear momentum and angular momentum every `record_interval` steps
+into preallocated arrays. Conserved quantities are evaluated with the same
+vectorized O(N^2) pair math as the force kernels, and nothing here imports
+pygame, so the validation can run on the diagnostics panel's worker thread.
+
+Units follow `src.physics.nbody_kernels` (AU, AU/year, years). Body masses
+follow the UI convention: stars in Solar masses, everything else in Earth masses.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from src.physics.adaptive_integrator import dopri_integrate
+from src.physics.nbody_kernels import (
+    G_AU,
+    M_EARTH_PER_M_SUN,
+    leapfrog,
+    pairwise_accelerations,
+    total_energy,
+)
+from src.physics.wisdom_holman import wisdom_holman
+
+INTEGRATORS = ("verlet", "leapfrog", "adaptive", "wisdom_holman")
+
+
+@dataclass
+class DriftMetrics:
+    """
+    Conserved-quantity histories and drift summary of one validation run.
+
+    Attributes:
+        integrator_type: Integrator that was validated.
+        duration: Integrated time in years.
+        dt: Base step in years.
+        n_steps: Number of base steps.
+        times: (R,) record times in years.
+        energy_history: (R,) total energy in M_sun AU^2 / yr^2.
+        momentum_history: (R, D) total linear momentum.
+        angular_momentum_history: (R, 3) total angular momentum (z only in 2-D).
+        max_energy_drift: max |E - E0| / |E0|.
+        final_energy_drift: |E - E0| / |E0| at the last record.
+        mean_energy_drift: Mean |E - E0| / |E0| over the records.
+        max_momentum_drift: max |P - P0| / sum(m |v|) (P0 is ~0 in the barycentric frame).
+        max_angular_momentum_drift: max |L - L0| / |L0|.
+        final_angular_momentum_drift: |L - L0| / |L0| at the last record.
+        wall_time: Seconds spent integrating and recording.
+        body_names: Names of the validated bodies.
+    """
+
+    integrator_type: str
+    duration: float
+    dt: float
+    n_steps: int
+    times: np.ndarray
+    energy_history: np.ndarray
+    momentum_history: np.ndarray
+    angular_momentum_history: np.ndarray
+    max_energy_drift: float = 0.0
+    final_energy_drift: float = 0.0
+    mean_energy_drift: float = 0.0
+    max_momentum_drift: float = 0.0
+    max_angular_momentum_drift: float = 0.0
+    final_angular_momentum_drift: float = 0.0
+    wall_time: float = 0.0
+    body_names: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "integrator_type": self.integrator_type,
+            "duration": self.duration,
+            "dt": self.dt,
+            "n_steps": self.n_steps,
+            "max_energy_drift": self.max_energy_drift,
+            "final_energy_drift": self.final_energy_drift,
+            "mean_energy_drift": self.mean_energy_drift,
+            "max_momentum_drift": self.max_momentum_drift,
+            "max_angular_momentum_drift": self.max_angular_momentum_drift,
+            "final_angular_momentum_drift": self.final_angular_momentum_drift,
+            "wall_time": self.wall_time,
+            "body_names": list(self.body_names),
+            "times": self.times.tolist(),
+            "energy_history": self.energy_history.tolist(),
+        }
+
+
+def bodies_to_arrays(bodies: Sequence[Dict[str, Any]]):
+    """
+    Pack body dicts into (positions, velocities, masses) arrays.
+
+    Each body needs `position` (AU), `velocity` (AU/yr), `mass` and `type`.
+    Masses are returned in Solar masses.
+    """
+    n = len(bodies)
+    dim = max((len(np.ravel(b["position"])) for b in bodies), default=2)
+    pos = np.zeros((n, dim))
+    vel = np.zeros((n, dim))
+    mass = np.empty(n)
+    for i, b in enumerate(bodies):
+        p = np.ravel(np.asarray(b["position"], dtype=np.float64))
+        v = np.ravel(np.asarray(b.get("velocity", np.zeros(dim)), dtype=np.float64))
+        pos[i, :p.size] = p
+        vel[i, :v.size] = v
+        m = float(b.get("mass", 0.0) or 0.0)
+        mass[i] = m if b.get("type") == "star" else m / M_EARTH_PER_M_SUN
+    return pos, vel, mass
+
+
+def conserved_quantities(positions: np.ndarray, velocities: np.ndarray, masses: np.ndarray,
+                         G: float = G_AU):
+    """
+    Total energy, linear momentum (D,) and angular momentum (3,).
+
+    2-D states are treated as lying in the z = 0 plane.
+    """
+    energy = total_energy(positions, velocities, masses, G=G)
+    p = masses[:, np.newaxis] * velocities
+    momentum = p.sum(axis=0)
+    if positions.shape[1] == 3:
+        ang = np.cross(positions, p).sum(axis=0)
+    else:
+        ang = np.array([0.0, 0.0, float(np.sum(positions[:, 0] * p[:, 1] - positions[:, 1] * p[:, 0]))])
+    return energy, momentum, ang
+
+
+def _relative(delta: np.ndarray, scale: float) -> np.ndarray:
+    return delta / scale if scale > 1e-300 else delta
+
+
+def run_integrator_validation(
+    bodies: Sequence[Dict[str, Any]],
+    duration: float = 1.0,
+    dt: float = 0.001,
+    integrator: str = "verlet",
+    record_interval: int = 50,
+    G: float = G_AU,
+) -> DriftMetrics:
+    """
+    Integrate a copy of `bodies` and measure how well E, P and L are conserved.
+
+    Args:
+        bodies: Body dicts with `position` (AU), `velocity` (AU/yr), `mass`, `type`.
+        duration: Integration time in years.
+        dt: Step in years ("adaptive" uses it only as its first step guess and
+            record spacing).
+        integrator: "verlet"/"leapfrog" (KDK), "adaptive" (Dormand-Prince 5(4))
+            or "wisdom_holman".
+        record_interval: Steps between records.
+        G: Gravitational constant.
+
+    Returns:
+        DriftMetrics with the histories and drift summary.
+    """
+    if integrator not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator '{integrator}' (expected one of {INTEGRATORS})")
+    if len(bodies) < 2:
+        raise ValueError("Need at least 2 bodies for validation")
+    if dt <= 0 or duration <= 0:
+        raise ValueError("duration and dt must be positive")
+
+    start = time.perf_counter()
+    pos, vel, mass = bodies_to_arrays(bodies)
+    p_scale = float(np.sum(mass * np.linalg.norm(vel, axis=1)))
+    record_interval = max(1, int(record_interval))
+    n_steps = max(1, int(round(duration / dt)))
+    n_records = (n_steps + record_interval - 1) // record_interval + 1
+
+    times = np.empty(n_records)
+    energy = np.empty(n_records)
+    momentum = np.empty((n_records, pos.shape[1]))
+    angular = np.empty((n_records, 3))
+
+    def acceleration_fn(x, m):
+        return pairwise_accelerations(x, m, G=G)
+
+    acc = None
+    h_adaptive = dt
+    step = 0
+    for r in range(n_records):
+        if r > 0:
+            chunk = min(record_interval, n_steps - step)
+            if integrator in ("verlet", "leapfrog"):
+                acc = leapfrog(pos, vel, mass, dt, chunk, G=G, acceleration_fn=acceleration_fn, accelerations=acc)
+            elif integrator == "adaptive":
+                remaining = chunk * dt
+                while remaining > 0.0:
+                    stats = dopri_integrate(pos, vel, mass, remaining, h=h_adaptive, G=G,
+                                            acceleration_fn=acceleration_fn)
+                    h_adaptive = stats.h_next
+                    remaining = stats.shortfall(remaining)
+            else:
+                wisdom_holman(pos, vel, mass, dt, chunk, G=G, acceleration_fn=acceleration_fn)
+            step += chunk
+        times[r] = step * dt
+        energy[r], momentum[r], angular[r] = conserved_quantities(pos, vel, mass, G=G)
+
+    e_drift = np.abs(_relative(energy - energy[0], abs(energy[0])))
+    p_drift = _relative(np.linalg.norm(momentum - momentum[0], axis=1), p_scale)
+    l_drift = _relative(np.linalg.norm(angular - angular[0], axis=1), float(np.linalg.norm(angular[0])))
+
+    return DriftMetrics(
+        integrator_type=integrator,
+        duration=n_steps * dt,
+        dt=dt,
+        n_steps=n_steps,
+        times=times,
+        energy_history=energy,
+        momentum_history=momentum,
+        angular_momentum_history=angular,
+        max_energy_drift=float(e_drift.max()),
+        final_energy_drift=float(e_drift[-1]),
+        mean_energy_drift=float(e_drift.mean()),
+        max_momentum_drift=float(p_drift.max()),
+        max_angular_momentum_drift=float(l_drift.max()),
+        final_angular_momentum_drift=float(l_drift[-1]),
+        wall_time=time.perf_counter() - start,
+        body_names=[str(b.get("name", "")) for b in bodies],
+    )
@@ -0,0 +1,162 @@
+"""
+Vectorized two-body (Kepler) propagation.
+
+`kepler_drift` advances many independent two-body problems at once with the
+universal-variable formulation (Stumpff functions + Lagrange f/g coefficients),
+so elliptic, parabolic and hyperbolic orbits share one code path.
+
+`solve_kepler`, `true_from_mean` and `mean_from_true` convert between the
+anomalies of elliptic orbits, so a body's position at any time follows from
+its epoch in one array pass instead of by integrating the angle.
+
+Units follow `src.physics.nbody_kernels` (AU, years, Solar masses); `mu` is
+G * M in AU^3 / year^2.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Below this |z| the Stumpff functions use their Taylor series.
+_STUMPFF_SERIES_Z = 1e-3
+
+_MAX_ITERATIONS = 50
+_TOLERANCE = 1e-14
+
+
+def solve_kepler(mean_anomaly, eccentricity) -> np.ndarray:
+    """
+    Eccentric anomaly E solving M = E - e sin E for elliptic orbits (0 <= e < 1).
+
+    Newton iterations run on all elements at once from a starting guess that
+    converges for every e < 1; arrays broadcast against each other.
+    """
+    m = np.asarray(mean_anomaly, dtype=np.float64)
+    e = np.asarray(eccentricity, dtype=np.float64)
+    m, e = np.broadcast_arrays(m, e)
+    # Reduce to (-pi, pi] so the starting guess is uniform in quality.
+    m_red = np.remainder(m + np.pi, 2.0 * np.pi) - np.pi
+    ecc_anom = np.where(e < 0.8, m_red, np.pi * np.sign(m_red))
+    for _ in range(_MAX_ITERATIONS):
+        f = ecc_anom - e * np.sin(ecc_anom) - m_red
+        delta = f / (1.0 - e * np.cos(ecc_anom))
+        ecc_anom = ecc_anom - delta
+        if np.all(np.abs(delta) <= _TOLERANCE * np.maximum(1.0, np.abs(ecc_anom))):
+            break
+    return ecc_anom + (m - m_red)
+
+
+def true_from_mean(mean_anomaly, eccentricity) -> np.ndarray:
+    """True anomaly for the given mean anomaly (same winding as the input)."""
+    e = np.asarray(eccentricity, dtype=np.float64)
+    ecc_anom = solve_kepler(mean_anomaly, e)
+    ecc_red = np.remainder(ecc_anom + np.pi, 2.0 * np.pi) - np.pi
+    half = 0.5 * ecc_red
+    nu = 2.0 * np.arctan2(np.sqrt(1.0 + e) * np.sin(half), np.sqrt(1.0 - e) * np.cos(half))
+    # atan2 only covers one turn; carry the whole turns of E over to nu.
+    return nu + (ecc_anom - ecc_red)
+
+
+def mean_from_true(true_anomaly, eccentricity) -> np.ndarray:
+    """Mean anomaly for the given true anomaly (same winding as the input)."""
+    nu = np.asarray(true_anomaly, dtype=np.float64)
+    e = np.asarray(eccentricity, dtype=np.float64)
+    nu_red = np.remainder(nu + np.pi, 2.0 * np.pi) - np.pi
+    ecc_anom = 2.0 * np.arctan2(np.sqrt(1.0 - e) * np.sin(0.5 * nu_red), np.sqrt(1.0 + e) * np.cos(0.5 * nu_red))
+    return ecc_anom - e * np.sin(ecc_anom) + (nu - nu_red)
+
+
+def stumpff_cs(z: np.ndarray):
+    """
+    Stumpff functions C(z) = (1 - cos sqrt z) / z and S(z) = (sqrt z - sin sqrt z) / sqrt(z)^3.
+
+    Valid for any real z (the hyperbolic branch is used for z < 0).
+    """
+    z = np.asarray(z, dtype=np.float64)
+    c = np.empty_like(z)
+    s = np.empty_like(z)
+    small = np.abs(z) < _STUMPFF_SERIES_Z
+    pos = (z > 0) & ~small
+    neg = (z < 0) & ~small
+    if np.any(small):
+        zs = z[small]
+        c[small] = 1 / 2 - zs / 24 + zs * zs / 720 - zs ** 3 / 40320
+        s[small] = 1 / 6 - zs / 120 + zs * zs / 5040 - zs ** 3 / 362880
+    if np.any(pos):
+        zp = z[pos]
+        sq = np.sqrt(zp)
+        c[pos] = (1 - np.cos(sq)) / zp
+        s[pos] = (sq - np.sin(sq)) / (zp * sq)
+    if np.any(neg):
+        zn = -z[neg]
+        sq = np.sqrt(zn)
+        c[neg] = (np.cosh(sq) - 1) / zn
+        s[neg] = (np.sinh(sq) - sq) / (zn * sq)
+    return c, s
+
+
+def kepler_drift(positions: np.ndarray, velocities: np.ndarray, mu, dt: float):
+    """
+    Propagate K independent two-body orbits by `dt` years.
+
+    Args:
+        positions: (K, D) positions relative to each orbit's focus.
+        velocities: (K, D) velocities relative to the focus.
+        mu: Scalar or (K,) gravitational parameters G * M.
+        dt: Time step in years (may be negative).
+
+    Returns:
+        (positions, velocities) after `dt`, as new arrays. Rows with zero
+        separation or zero `mu` drift in a straight line.
+    """
+    x0 = np.asarray(positions, dtype=np.float64)
+    v0 = np.asarray(velocities, dtype=np.float64)
+    k = x0.shape[0]
+    mu = np.broadcast_to(np.asarray(mu, dtype=np.float64), (k,))
+    if k == 0:
+        return x0.copy(), v0.copy()
+
+    r0 = np.sqrt(np.einsum("ij,ij->i", x0, x0))
+    bound = (r0 > 0) & (mu > 0)
+    x1 = x0 + dt * v0
+    v1 = v0.copy()
+    if not np.any(bound):
+        return x1, v1
+
+    xb, vb, m, r0b = x0[bound], v0[bound], mu[bound], r0[bound]
+    sqrt_mu = np.sqrt(m)
+    v2 = np.einsum("ij,ij->i", vb, vb)
+    sigma0 = np.einsum("ij,ij->i", xb, vb) / sqrt_mu
+    alpha = 2.0 / r0b - v2 / m
+    a1 = 1.0 - alpha * r0b
+    target = sqrt_mu * dt
+
+    # Laguerre–Conway iteration for the universal anomaly chi.
+    chi = target / r0b
+    n = 5.0
+    for _ in range(_MAX_ITERATIONS):
+        z = alpha * chi * chi
+        c, s = stumpff_cs(z)
+        chi2 = chi * chi
+        f = sigma0 * chi2 * c + a1 * chi2 * chi * s + r0b * chi - target
+        df = sigma0 * chi * (1.0 - z * s) + a1 * chi2 * c + r0b
+        ddf = sigma0 * (1.0 - z * c) + a1 * chi * (1.0 - z * s)
+        root = np.sqrt(np.abs((n - 1.0) ** 2 * df * df - n * (n - 1.0) * f * ddf))
+        denom = df + np.copysign(root, df)
+        delta = n * f / np.where(denom == 0.0, 1.0, denom)
+        chi = chi - delta
+        if np.all(np.abs(delta) <= _TOLERANCE * np.maximum(1.0, np.abs(chi))):
+            break
+
+    z = alpha * chi * chi
+    c, s = stumpff_cs(z)
+    chi2 = chi * chi
+    r = sigma0 * chi * (1.0 - z * s) + a1 * chi2 * c + r0b
+    f = 1.0 - chi2 * c / r0b
+    g = dt - chi2 * chi * s / sqrt_mu
+    fdot = sqrt_mu * chi * (z * s - 1.0) / (r * r0b)
+    gdot = 1.0 - chi2 * c / r
+
+    x1[bound] = f[:, None] * xb + g[:, None] * vb
+    v1[bound] = fdot[:, None] * xb + gdot[:, None] * vb
+    return x1, v1
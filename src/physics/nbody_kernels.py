@@ -0,0 +1,270 @@
+"""
+Vectorized gravity kernels for the AIET N-body code paths.
+
+All functions operate on packed NumPy arrays (struct-of-arrays layout) and never
+touch body dicts or `CelestialBody` objects, so they can be shared by the
+interactive engine, the diagnostics tools and headless batch runs.
+
+Units:
+- Positions in AU
+- Velocities in AU/year
+- Masses in Solar masses (convert Earth masses with M_EARTH_PER_M_SUN)
+- G in AU^3 / (M_sun * year^2)
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+import numpy as np
+
+# Gravitational constant in AU^3 / (M_sun * year^2)
+G_AU = 39.478
+
+# Earth masses per Solar mass (same conversion the engine has always used)
+M_EARTH_PER_M_SUN = 333030.0
+
+# Body radii: stars are stored in Solar radii, planets/moons in Earth radii
+R_SUN_AU = 0.00465047
+R_EARTH_AU = 4.26352e-5
+
+# Pairs closer than this are ignored (avoids division by zero / near-collisions)
+MIN_SEPARATION_AU = 1e-5
+
+# Upper bound on (targets x sources x dim) elements materialized per block.
+# Keeps the broadcast temporaries around 32 MB for large N.
+_BLOCK_ELEMENTS = 1 << 22
+
+# With this few sources, loop over sources on (M, D) arrays instead of
+# materializing (M, N, D) temporaries (the common many-particles case).
+_SOURCE_LOOP_MAX = 32
+
+
+def _block_rows(n_sources: int, dim: int) -> int:
+    """Number of target rows processed per block for a given source count."""
+    return max(1, _BLOCK_ELEMENTS // max(1, n_sources * dim))
+
+
+def field_accelerations(
+    targets: np.ndarray,
+    sources: np.ndarray,
+    source_masses: np.ndarray,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+) -> np.ndarray:
+    """
+    Gravitational acceleration at each target point due to all source masses.
+
+    Targets exert no force (test-particle semantics). Source/target pairs closer
+    than `min_separation` are skipped, which also removes self-interaction when
+    a target coincides with a source.
+
+    Args:
+        targets: (M, D) target positions.
+        sources: (N, D) source positions.
+        source_masses: (N,) source masses in Solar masses.
+        G: Gravitational constant.
+        min_separation: Pairs with |r| <= min_separation contribute nothing.
+
+    Returns:
+        (M, D) accelerations.
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    sources = np.asarray(sources, dtype=np.float64)
+    source_masses = np.asarray(source_masses, dtype=np.float64)
+    m_count, dim = targets.shape
+    acc = np.zeros((m_count, dim), dtype=np.float64)
+    if m_count == 0 or sources.shape[0] == 0:
+        return acc
+
+    min_r2 = min_separation * min_separation
+    if sources.shape[0] <= _SOURCE_LOOP_MAX and m_count > sources.shape[0]:
+        # Component-major copies keep every temporary a contiguous (M,) vector.
+        coords = np.ascontiguousarray(targets.T)
+        acc_t = np.zeros_like(coords)
+        for j in range(sources.shape[0]):
+            dx = sources[j][:, np.newaxis] - coords
+            r2 = np.einsum("ij,ij->j", dx, dx)
+            w = r2 * np.sqrt(r2)
+            near = r2 <= min_r2
+            w[near] = 1.0
+            np.divide(source_masses[j], w, out=w)
+            w[near] = 0.0
+            acc_t += w * dx
+        acc[:] = acc_t.T
+        acc *= G
+        return acc
+    step = _block_rows(sources.shape[0], dim)
+    for start in range(0, m_count, step):
+        stop = min(start + step, m_count)
+        # dx[i, j] = r_source_j - r_target_i
+        dx = sources[np.newaxis, :, :] - targets[start:stop, np.newaxis, :]
+        r2 = np.einsum("ijk,ijk->ij", dx, dx)
+        near = r2 <= min_r2
+        r2[near] = 1.0
+        w = r2 ** -1.5
+        w[near] = 0.0
+        w *= source_masses[np.newaxis, :]
+        acc[start:stop] = np.einsum("ij,ijk->ik", w, dx)
+    acc *= G
+    return acc
+
+
+def pairwise_accelerations(
+    positions: np.ndarray,
+    masses: np.ndarray,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+) -> np.ndarray:
+    """
+    Mutual gravitational accelerations of N bodies in one broadcast pass.
+
+    Equivalent to evaluating sum_j G m_j (r_j - r_i) / |r_j - r_i|^3 for every i,
+    with the diagonal (and any pair closer than `min_separation`) excluded.
+
+    Args:
+        positions: (N, D) positions.
+        masses: (N,) masses in Solar masses.
+        G: Gravitational constant.
+        min_separation: Pairs with |r| <= min_separation contribute nothing.
+
+    Returns:
+        (N, D) accelerations.
+    """
+    return field_accelerations(positions, positions, masses, G=G, min_separation=min_separation)
+
+
+def pairwise_accelerations_and_potential(
+    positions: np.ndarray,
+    masses: np.ndarray,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+):
+    """
+    Mutual accelerations plus the total potential energy from the same pass.
+
+    The inverse distances computed for the forces also give
+    U = -G sum_{i<j} m_i m_j / r_ij, so an energy check costs one extra
+    reduction instead of a second O(N^2) distance pass.
+
+    Returns:
+        ((N, D) accelerations, potential energy in M_sun * AU^2 / year^2).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    n, dim = positions.shape
+    acc = np.zeros((n, dim), dtype=np.float64)
+    if n == 0:
+        return acc, 0.0
+    min_r2 = min_separation * min_separation
+    potential = 0.0
+    step = _block_rows(n, dim)
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        dx = positions[np.newaxis, :, :] - positions[start:stop, np.newaxis, :]
+        r2 = np.einsum("ijk,ijk->ij", dx, dx)
+        near = r2 <= min_r2
+        r2[near] = 1.0
+        inv_r = 1.0 / np.sqrt(r2)
+        inv_r[near] = 0.0
+        inv_r *= masses[np.newaxis, :]
+        # inv_r now holds m_j / r_ij; every pair is visited twice over the blocks.
+        potential -= 0.5 * float(masses[start:stop] @ inv_r.sum(axis=1))
+        w = inv_r / r2
+        acc[start:stop] = np.einsum("ij,ijk->ik", w, dx)
+    acc *= G
+    return acc, G * potential
+
+
+def total_energy(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    masses: np.ndarray,
+    G: float = G_AU,
+    min_separation: float = MIN_SEPARATION_AU,
+) -> float:
+    """
+    Total (kinetic + potential) energy in M_sun * AU^2 / year^2.
+
+    Uses the same pair exclusion as the force kernels so energy and forces stay
+    consistent for near-coincident bodies.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    velocities = np.asarray(velocities, dtype=np.float64)
+    masses = np.asarray(masses, dtype=np.float64)
+    kinetic = 0.5 * float(np.dot(masses, np.einsum("ij,ij->i", velocities, velocities)))
+    n = positions.shape[0]
+    if n < 2:
+        return kinetic
+    i, j = np.triu_indices(n, k=1)
+    r = np.linalg.norm(positions[j] - positions[i], axis=1)
+    keep = r > min_separation
+    potential = -G * float(np.sum(masses[i][keep] * masses[j][keep] / r[keep]))
+    return kinetic + potential
+
+
+def leapfrog(
+    positions: np.ndarray,
+    velocities: np.ndarray,
+    masses: np.ndarray,
+    h: float,
+    n_steps: int,
+    G: float = G_AU,
+    acceleration_fn: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+    accelerations: Optional[np.ndarray] = None,
+    tracer_positions: Optional[np.ndarray] = None,
+    tracer_velocities: Optional[np.ndarray] = None,
+    tracer_fn: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]] = None,
+    step_callback: Optional[Callable[[int], None]] = None,
+) -> np.ndarray:
+    """
+    Advance packed state in place with `n_steps` kick-drift-kick leapfrog steps.
+
+    Massless tracers (test particles) can be co-integrated: they are kicked by
+    the massive bodies at the same sub-step positions but exert no force.
+
+    Args:
+        positions: (N, D) positions, updated in place.
+        velocities: (N, D) velocities, updated in place.
+        masses: (N,) masses in Solar masses.
+        h: Step size in years.
+        n_steps: Number of steps.
+        G: Gravitational constant.
+        acceleration_fn: Optional `f(positions, masses) -> accelerations`; defaults
+            to `pairwise_accelerations`.
+        accelerations: Accelerations at the current positions, if already known
+            (saves one force evaluation).
+        tracer_positions: Optional (M, D) tracer positions, updated in place.
+        tracer_velocities: Optional (M, D) tracer velocities, updated in place.
+        tracer_fn: Optional `f(targets, sources, source_masses) -> accelerations`
+            for the tracers; defaults to `field_accelerations`.
+        step_callback: Optional `f(step_index)` called after every step, when
+            positions and velocities are synchronized (e.g. event detection).
+
+    Returns:
+        Accelerations at the final positions (reusable for the next call).
+    """
+    if acceleration_fn is None:
+        def acceleration_fn(pos, m):
+            return pairwise_accelerations(pos, m, G=G)
+    acc = acceleration_fn(positions, masses) if accelerations is None else accelerations
+    tracers = tracer_positions is not None and tracer_positions.shape[0] > 0
+    if tracers:
+        if tracer_fn is None:
+            def tracer_fn(targets, src, m):
+                return field_accelerations(targets, src, m, G=G)
+        tracer_acc = tracer_fn(tracer_positions, positions, masses)
+    half_h = 0.5 * h
+    for step in range(int(n_steps)):
+        velocities += half_h * acc
+        positions += h * velocities
+        acc = acceleration_fn(positions, masses)
+        velocities += half_h * acc
+        if tracers:
+            tracer_velocities += half_h * tracer_acc
+            tracer_positions += h * tracer_velocities
+            tracer_acc = tracer_fn(tracer_positions, positions, masses)
+            tracer_velocities += half_h * tracer_acc
+        if step_callback is not None:
+            step_callback(step)
+    return acc
@@ -0,0 +1,273 @@
+"""
+Fixed-timestep N-body stepping on a worker thread.
+
+The UI feeds simulated time into an accumulator (`advance`) and the worker
+consumes it in steps of exactly `dt` years, so the trajectory depends only on
+the total simulated time and not on the frame rate. On each wake the worker
+runs every step that is due in one `step_nbody` call (k steps of `dt`, still
+`n_sub` sub-steps each) and publishes one immutable `StateSnapshot`, so the
+per-call overhead (packing, event scan, write-back, snapshot copies) is paid
+per wake rather than per step. The last two snapshots are kept as a
+(previous, current) pair that is swapped under a lock, and the renderer draws
+one step behind the accumulator, interpolating between them. A slow N-body
+step therefore delays the published state instead of the frame; `lag` and
+`dropped_time` report how far behind the worker is, and the UI shows them.
+
+The worker integrates private copies of the body dicts, so the UI can keep
+reading and annotating its own dicts while a step is running; `apply` copies
+the published state back on the UI thread. Mass and radius edits on the UI
+dicts are handed to the worker by `advance` and take effect from the next step. The engine's own mutable
+by-products (`event_log`, `chaos_state`, test-particle arrays) are copied into
+the same snapshot by the worker, so while the thread runs the UI reads them
+from `snapshots()` (or `chaos_indicators`) and never from the engine.
+
+Units follow `src.physics.nbody_kernels` (AU, AU/year, years).
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Fixed physics step in years (the inline path's largest leapfrog sub-step).
+DEFAULT_FIXED_DT = 0.001
+# Backlog beyond this many steps is dropped so a slow machine falls behind
+# gracefully instead of spiralling.
+DEFAULT_MAX_LAG_STEPS = 2000
+
+# Keys the worker reads or writes on its private body copies.
+_SHADOW_KEYS = ("name", "type", "mass", "radius", "position_au", "velocity_au", "is_destroyed")
+# Keys the UI may edit while the thread runs; `advance` forwards them.
+_EDITABLE_KEYS = ("mass", "radius")
+
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    """
+    Published state after a fixed step.
+
+    Attributes:
+        sim_time: Simulated time of the state in years (0 at thread start).
+        step: Number of fixed steps taken.
+        positions: (N, 2) read-only positions in AU, in body order.
+        velocities: (N, 2) read-only velocities in AU/year.
+        destroyed: (N,) read-only flags for bodies lost to collisions.
+        test_particles: (M, 2) read-only test-particle positions in AU.
+        events: Copy of the engine's `event_log` after the step.
+        chaos: Per-body (MEGNO, Lyapunov time) in body order, or None while
+            chaos tracking has not run.
+    """
+
+    sim_time: float
+    step: int
+    positions: np.ndarray
+    velocities: np.ndarray
+    destroyed: np.ndarray
+    test_particles: np.ndarray
+    events: Tuple[dict, ...] = ()
+    chaos: Optional[Tuple[Tuple[float, float], ...]] = None
+
+    def chaos_indicators(self, body_index: Optional[int] = None) -> Optional[Tuple[float, float]]:
+        """(MEGNO, Lyapunov time) of one body, or of the most chaotic one."""
+        if not self.chaos:
+            return None
+        if body_index is not None and 0 <= body_index < len(self.chaos):
+            return self.chaos[body_index]
+        return max(self.chaos, key=lambda pair: pair[0])
+
+
+def _frozen(values, dtype=np.float64) -> np.ndarray:
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+def interpolate_positions(previous: StateSnapshot, current: StateSnapshot, sim_time: float) -> np.ndarray:
+    """Positions at `sim_time`, linear between the two snapshots and clamped to them."""
+    span = current.sim_time - previous.sim_time
+    if span <= 0.0:
+        return np.array(current.positions)
+    alpha = min(max((sim_time - previous.sim_time) / span, 0.0), 1.0)
+    return previous.positions + alpha * (current.positions - previous.positions)
+
+
+class NBodyPhysicsThread:
+    """
+    Runs `SimulationEngine.step_nbody` on a daemon thread at a fixed step.
+
+    Args:
+        engine: SimulationEngine whose N-body state (`_initialize_nbody_state`)
+            has been set up for `placed_bodies`. The worker is its only caller
+            of `step_nbody` until `stop`.
+        placed_bodies: UI body dicts; the live ones with `position_au` are
+            integrated.
+        dt: Fixed step in years.
+        n_sub: Leapfrog sub-steps per fixed step.
+        max_lag_steps: Largest backlog kept in the accumulator.
+    """
+
+    def __init__(self, engine, placed_bodies, dt: float = DEFAULT_FIXED_DT, n_sub: int = 1,
+                 max_lag_steps: int = DEFAULT_MAX_LAG_STEPS):
+        if dt <= 0.0:
+            raise ValueError("dt must be positive")
+        self.engine = engine
+        self.dt = float(dt)
+        self.n_sub = max(1, int(n_sub))
+        self.max_lag_steps = max(1, int(max_lag_steps))
+        self.bodies: List[dict] = engine._nbody_active(placed_bodies)
+        self._shadows = [{k: b[k] for k in _SHADOW_KEYS if k in b} for b in self.bodies]
+        # Arrays last written to the UI dicts; anything else there was edited by the UI.
+        self._written: List[Tuple[object, object]] = [(b.get("position_au"), b.get("velocity_au"))
+                                                     for b in self.bodies]
+        self.dropped_time = 0.0
+        self.error: Optional[BaseException] = None
+        self._pending_edits: Optional[List[dict]] = None
+        self._target_time = 0.0
+        self._step = 0
+        initial = self._snapshot(0.0)
+        self._snapshots = (initial, initial)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="nbody-physics", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # UI thread
+    # ------------------------------------------------------------------
+
+    def advance(self, sim_dt: float) -> None:
+        """
+        Add `sim_dt` years to the accumulator and hand the UI's current mass
+        and radius of every body to the worker.
+        """
+        if sim_dt <= 0.0:
+            return
+        edits = [{k: b[k] for k in _EDITABLE_KEYS if k in b} for b in self.bodies]
+        with self._wake:
+            self._pending_edits = edits
+            self._target_time += sim_dt
+            backlog = self._target_time - self._snapshots[1].sim_time
+            limit = self.max_lag_steps * self.dt
+            if backlog > limit:
+                self.dropped_time += backlog - limit
+                self._target_time -= backlog - limit
+            self._wake.notify()
+
+    def snapshots(self) -> Tuple[StateSnapshot, StateSnapshot]:
+        """The (previous, current) snapshot pair."""
+        with self._lock:
+            return self._snapshots
+
+    @property
+    def lag(self) -> float:
+        """Simulated years the worker is behind the accumulator."""
+        with self._lock:
+            return max(self._target_time - self._snapshots[1].sim_time, 0.0)
+
+    @property
+    def render_time(self) -> float:
+        """Simulated time to draw: one fixed step behind the accumulator."""
+        with self._lock:
+            return max(self._target_time - self.dt, 0.0)
+
+    def chaos_indicators(self, body: Optional[dict] = None) -> Optional[Tuple[float, float]]:
+        """Thread-safe stand-in for `engine.chaos_indicators` on a UI body dict."""
+        index = next((i for i, b in enumerate(self.bodies) if b is body), None)
+        return self.snapshots()[1].chaos_indicators(index)
+
+    def tracks(self, placed_bodies) -> bool:
+        """
+        True while the UI's live bodies are the ones being integrated and
+        their AU state has not been replaced since the last `apply`.
+        """
+        live = self.engine._nbody_active(placed_bodies)
+        if len(live) != len(self.bodies) or any(a is not b for a, b in zip(live, self.bodies)):
+            return False
+        return all(b.get("position_au") is p and b.get("velocity_au") is v
+                   for b, (p, v) in zip(self.bodies, self._written))
+
+    def apply(self, scale_px_per_au: float) -> StateSnapshot:
+        """
+        Copy the published state into the UI dicts.
+
+        `position_au` / `velocity_au` get the current snapshot (so a restarted
+        thread resumes from the exact integrated state); `position` in pixels
+        gets the interpolated render position. Returns the current snapshot.
+        """
+        previous, current = self.snapshots()
+        drawn = interpolate_positions(previous, current, self.render_time) * scale_px_per_au
+        written = []
+        for i, b in enumerate(self.bodies):
+            b["position_au"] = current.positions[i].copy()
+            b["velocity_au"] = current.velocities[i].copy()
+            b["position"] = drawn[i].copy()
+            if current.destroyed[i]:
+                b["is_destroyed"] = True
+            written.append((b["position_au"], b["velocity_au"]))
+        self._written = written
+        if self.error is not None:
+            raise RuntimeError("N-body physics thread stopped") from self.error
+        return current
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker after its current step."""
+        with self._wake:
+            self._stopping = True
+            self._wake.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+
+    def _snapshot(self, sim_time: float) -> StateSnapshot:
+        # Called on the worker (or before it starts), the only writer of the
+        # engine state copied here.
+        shadows = self._shadows
+        engine = self.engine
+        return StateSnapshot(
+            sim_time=sim_time,
+            step=self._step,
+            positions=_frozen([np.asarray(b["position_au"], dtype=float)[:2] for b in shadows]).reshape(-1, 2),
+            velocities=_frozen([np.zeros(2) if b.get("velocity_au") is None
+                                else np.asarray(b["velocity_au"], dtype=float)[:2] for b in shadows]).reshape(-1, 2),
+            destroyed=_frozen([bool(b.get("is_destroyed", False)) for b in shadows], dtype=bool),
+            test_particles=_frozen(engine._tp_positions[:, :2]),
+            events=tuple(dict(e) for e in engine.event_log),
+            chaos=self._chaos(shadows),
+        )
+
+    def _chaos(self, shadows: Sequence[dict]) -> Optional[Tuple[Tuple[float, float], ...]]:
+        if not self.engine.track_chaos or self.engine.chaos_state is None:
+            return None
+        pairs = [self.engine.chaos_indicators(b) for b in shadows]
+        return None if any(p is None for p in pairs) else tuple(pairs)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._wake:
+                    while not self._stopping and self._snapshots[1].sim_time + self.dt > self._target_time:
+                        self._wake.wait()
+                    if self._stopping:
+                        return
+                    due = int((self._target_time - self._snapshots[1].sim_time) / self.dt + 1e-9)
+                    due = min(max(due, 1), self.max_lag_steps)
+                    edits, self._pending_edits = self._pending_edits, None
+                if edits is not None:
+                    for shadow, edit in zip(self._shadows, edits):
+                        shadow.update(edit)
+                # All due fixed steps in one call; the clock is the step count
+                # times dt, so it carries no accumulated rounding.
+                self.engine.step_nbody(due * self.dt, self._shadows, n_sub=due * self.n_sub)
+                self._step += due
+                snapshot = self._snapshot(self._step * self.dt)
+                with self._lock:
+                    self._snapshots = (self._snapshots[1], snapshot)
+        except BaseException as exc:  # surfaced to the UI thread by apply()
+            self.error = exc
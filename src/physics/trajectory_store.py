@@ -0,0 +1,228 @@
+"""
+Chunked on-disk trajectory store with memory-mapped playback.
+
+`TrajectoryRecorder` buffers (time, positions, velocities) records in RAM
+and writes them in float32 blocks of `chunk_size` records, one `.npy` file
+per chunk (plus a float64 `.npy` of record times), keeping every
+`decimation`-th record. `index.json` lists the chunks and is replaced
+atomically after each one, so a store is readable while it is still being
+written and survives a crash minus the unflushed buffer.
+
+`TrajectoryPlayback` reads only the index and the record times on open;
+chunks are memory-mapped on first access, so scrubbing through hours of
+simulated history touches only the pages it reads.
+
+A change of body set (a body added or destroyed) starts a new segment; each
+record belongs to one segment and carries that segment's body names.
+
+Layout of a store directory:
+    index.json              version, dim, decimation, segments, chunks
+    chunk_000000.npy        (k, N, 2, dim) float32: [:, :, 0] positions, [:, :, 1] velocities
+    times_000000.npy        (k,) float64 record times
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+STORE_VERSION = 1
+INDEX_FILE = "index.json"
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def _write_index(directory: str, index: Dict) -> None:
+    path = os.path.join(directory, INDEX_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+class TrajectoryRecorder:
+    """
+    Appends decimated float32 states to a chunked store.
+
+    Args:
+        directory: Store directory (created if needed; an existing store there
+            is appended to).
+        dim: Spatial dimension of the recorded states.
+        chunk_size: Records per chunk file.
+        decimation: Keep every `decimation`-th appended record.
+    """
+
+    def __init__(self, directory: str, dim: int = 2, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 decimation: int = 1):
+        self.directory = directory
+        self.chunk_size = max(1, int(chunk_size))
+        self.decimation = max(1, int(decimation))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, INDEX_FILE)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+            if self._index.get("dim") != dim:
+                raise ValueError(f"Store at {directory} has dim {self._index.get('dim')}, not {dim}")
+        else:
+            self._index = {"version": STORE_VERSION, "dim": int(dim), "decimation": self.decimation,
+                           "segments": [], "chunks": []}
+        self.dim = int(dim)
+        self._names: Optional[Tuple[str, ...]] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._times = np.empty(self.chunk_size)
+        self._count = 0
+        self._calls = 0
+
+    @property
+    def n_records(self) -> int:
+        """Records written so far, including the unflushed buffer."""
+        return sum(c["count"] for c in self._index["chunks"]) + self._count
+
+    def append(self, time: float, positions: np.ndarray, velocities: np.ndarray,
+               names: Sequence[str]) -> None:
+        """Record one state; `names` identifies the bodies in row order."""
+        self._calls += 1
+        if (self._calls - 1) % self.decimation:
+            return
+        names = tuple(str(n) for n in names)
+        if names != self._names:
+            self.flush()
+            self._index["segments"].append({"names": list(names)})
+            self._names = names
+            self._buffer = np.empty((self.chunk_size, len(names), 2, self.dim), dtype=np.float32)
+        k = self._count
+        self._buffer[k, :, 0] = positions[:, :self.dim]
+        self._buffer[k, :, 1] = velocities[:, :self.dim]
+        self._times[k] = time
+        self._count = k + 1
+        if self._count == self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records as a chunk and update the index."""
+        if self._count == 0:
+            return
+        number = len(self._index["chunks"])
+        states_file = f"chunk_{number:06d}.npy"
+        times_file = f"times_{number:06d}.npy"
+        np.save(os.path.join(self.directory, states_file), self._buffer[:self._count])
+        np.save(os.path.join(self.directory, times_file), self._times[:self._count])
+        self._index["chunks"].append({
+            "file": states_file,
+            "times": times_file,
+            "segment": len(self._index["segments"]) - 1,
+            "count": self._count,
+            "t0": float(self._times[0]),
+            "t1": float(self._times[self._count - 1]),
+        })
+        _write_index(self.directory, self._index)
+        self._count = 0
+
+    def close(self) -> None:
+        self.flush()
+        if not os.path.isfile(os.path.join(self.directory, INDEX_FILE)):
+            _write_index(self.directory, self._index)
+
+    def __enter__(self) -> "TrajectoryRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TrajectoryPlayback:
+    """
+    Random access to a recorded store.
+
+    Args:
+        directory: Store directory written by `TrajectoryRecorder`.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-read the index (picks up chunks flushed since opening)."""
+        with open(os.path.join(self.directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported trajectory store version {index.get('version')}")
+        self.dim = int(index["dim"])
+        self.decimation = int(index.get("decimation", 1))
+        self.segments: List[Tuple[str, ...]] = [tuple(s["names"]) for s in index["segments"]]
+        self._chunks = index["chunks"]
+        counts = np.array([c["count"] for c in self._chunks], dtype=np.int64)
+        self._starts = np.concatenate(([0], np.cumsum(counts)))
+        times = [np.load(os.path.join(self.directory, c["times"])) for c in self._chunks]
+        self.times = np.concatenate(times) if times else np.zeros(0)
+        self._maps: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def _chunk(self, c: int) -> np.ndarray:
+        if c not in self._maps:
+            self._maps[c] = np.load(os.path.join(self.directory, self._chunks[c]["file"]), mmap_mode="r")
+        return self._maps[c]
+
+    def _locate(self, k: int) -> Tuple[int, int]:
+        if not 0 <= k < len(self):
+            raise IndexError(f"record {k} out of range (0..{len(self) - 1})")
+        c = int(np.searchsorted(self._starts, k, side="right")) - 1
+        return c, k - int(self._starts[c])
+
+    def names(self, k: int) -> Tuple[str, ...]:
+        """Body names of record `k`."""
+        return self.segments[self._chunks[self._locate(k)[0]]["segment"]]
+
+    def frame(self, k: int) -> Tuple[float, np.ndarray, np.ndarray]:
+        """(time, (N, dim) positions, (N, dim) velocities) of record `k`."""
+        c, i = self._locate(k)
+        state = self._chunk(c)[i]
+        return float(self.times[k]), np.asarray(state[:, 0]), np.asarray(state[:, 1])
+
+    def at_time(self, t: float) -> Tuple[Tuple[str, ...], np.ndarray]:
+        """
+        (names, positions) at time `t`, linear between the neighbouring
+        records of the same segment and clamped to the recorded range.
+        """
+        if len(self) == 0:
+            raise IndexError("empty trajectory store")
+        k = int(np.searchsorted(self.times, t, side="right")) - 1
+        k = min(max(k, 0), len(self) - 1)
+        _, x0, _ = self.frame(k)
+        names = self.names(k)
+        if k + 1 < len(self) and self.names(k + 1) == names and self.times[k + 1] > self.times[k]:
+            _, x1, _ = self.frame(k + 1)
+            alpha = min(max((t - self.times[k]) / (self.times[k + 1] - self.times[k]), 0.0), 1.0)
+            return names, x0 + np.float32(alpha) * (x1 - x0)
+        return names, np.array(x0)
+
+    def positions(self, body: str, start: int = 0, stop: Optional[int] = None,
+                  step: int = 1) -> np.ndarray:
+        """
+        (M, dim) positions of `body` over records start:stop:step (e.g. an
+        orbit trail), skipping records of segments it is not part of.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = []
+        for c, chunk in enumerate(self._chunks):
+            lo, hi = int(self._starts[c]), int(self._starts[c + 1])
+            if hi <= start or lo >= stop:
+                continue
+            names = self.segments[chunk["segment"]]
+            if body not in names:
+                continue
+            # First record >= max(start, lo) on the start + j * step grid.
+            first = max(start, lo)
+            first += (-(first - start)) % step
+            if first >= min(stop, hi):
+                continue
+            parts.append(self._chunk(c)[first - lo:min(stop, hi) - lo:step, names.index(body), 0])
+        if not parts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.concatenate(parts)
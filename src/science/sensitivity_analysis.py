@@ -311,8 +311,10 @@ def compute_mc_input_score_correlations(
             sample_count: Number of samples used
     """
     try:
-        from src.ml.ml_uncertainty import sample_inputs, DEFAULT_FALLBACK_UNCERTAINTY, SCHEMA_BOUNDS
-        from src.ml.ml_features import build_features
+        from src.ml.ml_uncertainty import (
+            sample_inputs, predict_raw_scores, DEFAULT_FALLBACK_UNCERTAINTY, SCHEMA_BOUNDS
+        )
+        from src.ml.ml_features import build_features, build_features_batch, rows_to_columns
     except ImportError as e:
         raise ImportError(f"MC correlation requires ml_uncertainty: {e}")
     
@@ -332,19 +334,33 @@ def compute_mc_input_score_correlations(
                 feature_values[feat].append(sample[feat])
             else:
                 feature_values[feat].append(np.nan)
-        
-        try:
-            feat_vec = build_features(sample, return_meta=False)
-            raw_score = calculator._predict_raw(feat_vec)
-            raw_score = np.clip(raw_score, 0.0, 1.0)
-            if earth_raw > 0:
-                display_score = (raw_score / earth_raw) * 100.0
-            else:
-                display_score = raw_score * 100.0
-            display_score = np.clip(display_score, 0.0, 100.0)
-            scores.append(display_score)
-        except Exception:
-            scores.append(np.nan)
+    
+    try:
+        # Whole sample in one pass; per-sample loop below if inputs are not plain numbers
+        X, _ = build_features_batch(rows_to_columns(sampled_list))
+        raw_scores = predict_raw_scores(calculator, X)
+    except (TypeError, ValueError):
+        raw_scores = None
+    
+    if raw_scores is not None:
+        if earth_raw > 0:
+            scores = np.clip((raw_scores / earth_raw) * 100.0, 0.0, 100.0)
+        else:
+            scores = np.clip(raw_scores * 100.0, 0.0, 100.0)
+    else:
+        for sample in sampled_list:
+            try:
+                feat_vec = build_features(sample, return_meta=False)
+                raw_score = calculator._predict_raw(feat_vec)
+                raw_score = np.clip(raw_score, 0.0, 1.0)
+                if earth_raw > 0:
+                    display_score = (raw_score / earth_raw) * 100.0
+                else:
+                    display_score = raw_score * 100.0
+                display_score = np.clip(display_score, 0.0, 100.0)
+                scores.append(display_score)
+            except Exception:
+                scores.append(np.nan)
     
     scores = np.array(scores)
     valid_scores = ~np.isnan(scores)
@@ -409,7 +425,7 @@ def compute_shap_importance(
         return None
     
     try:
-        from src.ml.ml_features import build_features
+        from src.ml.ml_features import build_features, build_features_batch, rows_to_columns
         from src.ml.ml_uncertainty import sample_inputs, DEFAULT_FALLBACK_UNCERTAINTY
     except ImportError:
         return None
@@ -425,13 +441,16 @@ def compute_shap_importance(
     rng = np.random.default_rng(seed)
     sampled_list = sample_inputs(merged, dict(DEFAULT_FALLBACK_UNCERTAINTY), n_background, rng)
     
-    background_features = []
-    for sample in sampled_list:
-        try:
-            feat = build_features(sample, return_meta=False)
-            background_features.append(feat)
-        except Exception:
-            pass
+    try:
+        background_features = list(build_features_batch(rows_to_columns(sampled_list))[0])
+    except (TypeError, ValueError):
+        background_features = []
+        for sample in sampled_list:
+            try:
+                feat = build_features(sample, return_meta=False)
+                background_features.append(feat)
+            except Exception:
+                pass
     
     if len(background_features) < 10:
         return None
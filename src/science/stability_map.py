@@ -0,0 +1,514 @@
+"""
+AIET Orbital Stability Maps
+
+Fills a semi-major-axis x eccentricity grid (optionally x mass) with the
+survival probability of a test planet added to one of the sandbox presets.
+
+Method:
+    1. The preset is converted to a physical state (AU, AU/yr, M_sun). All
+       stars are kept, plus the planets of the chosen host star; moons are
+       merged into their planet. Planets bound to other stars are dropped;
+       they perturb the test orbit only through their host.
+    2. Every grid cell gets `members_per_cell` realisations of the test planet
+       with random orbital phase and periapsis direction, drawn from a
+       deterministic per-cell seed.
+    3. Every cell gets its own leapfrog step (its periapsis-scaled period,
+       capped by the preset's fastest orbit). Cells are sorted by that step
+       and sharded; each shard is integrated as one (K, N, 2) ensemble batch with
+       `src.physics.ensemble.ensemble_accelerations` on a
+       `ProcessPoolExecutor`.
+    4. A member is unstable once the test planet's orbital energy about its
+       host drifts by more than `max_energy_drift` (or turns unbound), it hits
+       a star, or it comes within `hill_fraction` Hill radii of another body.
+    5. The finished grid is cached on disk, keyed by every input.
+
+Usage:
+    from src.science.stability_map import compute_stability_map
+
+    smap = compute_stability_map("alpha_centauri", n_a=200, n_e=200)
+    smap.stable_fraction  # (n_masses, n_e, n_a)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.physics.ensemble import elements_to_state, ensemble_accelerations
+from src.physics.kepler import true_from_mean
+from src.physics.nbody_kernels import G_AU, M_EARTH_PER_M_SUN, R_SUN_AU
+from src.physics.system_presets import (
+    get_alpha_centauri_system,
+    get_earth_moon_sun_system,
+    get_trappist1_system,
+)
+from src.utils.paths import cache_dir
+
+# Bump when the integration or classification changes so old caches are ignored.
+STABILITY_MAP_VERSION = 2
+
+PRESETS: Dict[str, Callable[[], List[Dict[str, Any]]]] = {
+    "earth_moon_sun": get_earth_moon_sun_system,
+    "alpha_centauri": get_alpha_centauri_system,
+    "trappist_1": get_trappist1_system,
+}
+
+# Defaults for preset entries that leave physical values to the UI's `place_object`.
+_DEFAULT_STAR = {"mass": 1.0, "radius": 1.0}
+_DEFAULT_PLANET_MASS = 1.0  # M_earth
+_DEFAULT_MOON_MASS = 0.0123  # M_earth
+
+# Instability reasons (per member; the map stores fractions)
+STABLE = 0
+ENERGY_DRIFT = 1
+STAR_COLLISION = 2
+CLOSE_ENCOUNTER = 3
+
+
+@dataclass
+class StabilityMap:
+    """
+    Stability probability grid for a test planet.
+
+    Attributes:
+        preset: Preset key in PRESETS.
+        host: Name of the star the test planet orbits.
+        semi_major_axes: (n_a,) grid of test semi-major axes in AU.
+        eccentricities: (n_e,) grid of test eccentricities.
+        masses_earth: (n_m,) test planet masses in Earth masses.
+        stable_fraction: (n_m, n_e, n_a) fraction of members that survived.
+        mean_survival_time: (n_m, n_e, n_a) mean years survived (capped at duration).
+        duration: Integrated time per member in years.
+        members_per_cell: Realisations per grid cell.
+        seed: Base seed of the per-cell seeds.
+    """
+
+    preset: str
+    host: str
+    semi_major_axes: np.ndarray
+    eccentricities: np.ndarray
+    masses_earth: np.ndarray
+    stable_fraction: np.ndarray
+    mean_survival_time: np.ndarray
+    duration: float
+    members_per_cell: int
+    seed: int
+
+    def save(self, path: str) -> str:
+        np.savez_compressed(
+            path,
+            preset=self.preset,
+            host=self.host,
+            semi_major_axes=self.semi_major_axes,
+            eccentricities=self.eccentricities,
+            masses_earth=self.masses_earth,
+            stable_fraction=self.stable_fraction,
+            mean_survival_time=self.mean_survival_time,
+            duration=self.duration,
+            members_per_cell=self.members_per_cell,
+            seed=self.seed,
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "StabilityMap":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                preset=str(data["preset"]),
+                host=str(data["host"]),
+                semi_major_axes=data["semi_major_axes"],
+                eccentricities=data["eccentricities"],
+                masses_earth=data["masses_earth"],
+                stable_fraction=data["stable_fraction"],
+                mean_survival_time=data["mean_survival_time"],
+                duration=float(data["duration"]),
+                members_per_cell=int(data["members_per_cell"]),
+                seed=int(data["seed"]),
+            )
+
+
+@dataclass
+class PresetState:
+    """
+    Physical state of a preset's bodies relevant to one host star.
+
+    Attributes:
+        names: Body names (index-aligned with the arrays).
+        is_star: (N,) True for stars.
+        positions: (N, 2) barycentric positions in AU.
+        velocities: (N, 2) barycentric velocities in AU/year.
+        masses: (N,) masses in Solar masses.
+        radii_au: (N,) physical radii in AU (used for star collisions).
+        host_index: Index of the host star.
+    """
+
+    names: List[str]
+    is_star: np.ndarray
+    positions: np.ndarray
+    velocities: np.ndarray
+    masses: np.ndarray
+    radii_au: np.ndarray
+    host_index: int
+
+
+def preset_state(preset: str, host: Optional[str] = None, G: float = G_AU) -> PresetState:
+    """
+    Convert a preset's body specs into a barycentric N-body state.
+
+    Stars use their `position_au` / `velocity_au` (origin / at rest if absent).
+    Planets of `host` (default: the most massive star) are placed on their
+    preset orbits at evenly spread phases; moons are merged into their planet.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}' (expected one of {sorted(PRESETS)})")
+    specs = PRESETS[preset]()
+    stars = [s for s in specs if s.get("type") == "star"]
+    if not stars:
+        raise ValueError(f"Preset '{preset}' has no stars")
+    star_mass = {s["name"]: float(s.get("mass", _DEFAULT_STAR["mass"])) for s in stars}
+    if host is None:
+        host = max(stars, key=lambda s: star_mass[s["name"]])["name"]
+    if host not in star_mass:
+        raise ValueError(f"Host '{host}' is not a star in preset '{preset}'")
+
+    names: List[str] = []
+    pos: List[np.ndarray] = []
+    vel: List[np.ndarray] = []
+    masses: List[float] = []
+    radii: List[float] = []
+    for s in stars:
+        names.append(s["name"])
+        pos.append(np.array(s.get("position_au", [0.0, 0.0])[:2], dtype=float))
+        vel.append(np.array(s.get("velocity_au", [0.0, 0.0])[:2], dtype=float))
+        masses.append(star_mass[s["name"]])
+        radii.append(float(s.get("radius", _DEFAULT_STAR["radius"])) * R_SUN_AU)
+    host_i = names.index(host)
+    n_stars = len(names)
+
+    planets = [p for p in specs if p.get("type") == "planet"
+               and p.get("host_star", host if len(stars) == 1 else None) == host]
+    moons = [m for m in specs if m.get("type") == "moon"]
+    golden = np.pi * (3.0 - np.sqrt(5.0))
+    for k, p in enumerate(planets):
+        m = float(p.get("mass", _DEFAULT_PLANET_MASS))
+        for moon in moons:
+            parent = moon.get("parent", planets[0]["name"] if len(planets) == 1 else None)
+            if parent == p["name"]:
+                m += float(moon.get("mass", _DEFAULT_MOON_MASS))
+        a = float(p.get("semi_major_axis", p.get("semiMajorAxis", 1.0)))
+        e = float(p.get("eccentricity", 0.0) or 0.0)
+        rel_pos, rel_vel, _ = elements_to_state(
+            np.array([masses[host_i]]), np.array([[m / M_EARTH_PER_M_SUN]]),
+            np.array([[a]]), np.array([[e]]), np.array([k * golden]), np.zeros(1), G=G,
+        )
+        names.append(p["name"])
+        pos.append(pos[host_i] + rel_pos[0, 1] - rel_pos[0, 0])
+        vel.append(vel[host_i] + rel_vel[0, 1] - rel_vel[0, 0])
+        masses.append(m / M_EARTH_PER_M_SUN)
+        radii.append(0.0)
+
+    positions = np.array(pos)
+    velocities = np.array(vel)
+    mass_arr = np.array(masses)
+    total = mass_arr.sum()
+    positions -= (mass_arr[:, None] * positions).sum(axis=0) / total
+    velocities -= (mass_arr[:, None] * velocities).sum(axis=0) / total
+    is_star = np.zeros(len(names), dtype=bool)
+    is_star[:n_stars] = True
+    return PresetState(names, is_star, positions, velocities, mass_arr, np.array(radii), host_i)
+
+
+def _cell_seed(seed: int, im: int, ie: int, ia: int) -> np.random.SeedSequence:
+    """Seed depending only on the base seed and the cell's grid indices."""
+    return np.random.SeedSequence([int(seed), int(im), int(ie), int(ia)])
+
+
+def _periapsis_time(a, e, mu):
+    """Orbital period scaled by the periapsis speed-up (1 - e)^1.5."""
+    return 2.0 * np.pi * np.sqrt(np.asarray(a) ** 3 / mu) * (1.0 - np.asarray(e)) ** 1.5
+
+
+def _integrate_shard(task: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Integrate one shard of cells as a single ensemble batch.
+
+    Top-level so ProcessPoolExecutor can pickle it. Returns the flat cell
+    indices, the stable fraction and the mean survival time of each cell.
+    """
+    state: PresetState = task["state"]
+    cells = task["cells"]  # (C, 7): flat index, im, ie, ia, a, e, step
+    m_test_earth = task["masses_earth"]
+    members = task["members"]
+    G = task["G"]
+    duration = task["duration"]
+    hill_fraction = task["hill_fraction"]
+    max_energy_drift = task["max_energy_drift"]
+    check_interval = task["check_interval"]
+
+    c_count = cells.shape[0]
+    k_count = c_count * members
+    host = state.host_index
+    m_host = state.masses[host]
+    n_base = state.masses.shape[0]
+
+    # Test planet elements for every member, from the per-cell seeds.
+    a = np.repeat(cells[:, 4], members)
+    e = np.repeat(cells[:, 5], members)
+    m_test = np.repeat(m_test_earth[cells[:, 1].astype(int)], members) / M_EARTH_PER_M_SUN
+    mean_anom = np.empty(k_count)
+    omega = np.empty(k_count)
+    for c in range(c_count):
+        rng = np.random.default_rng(_cell_seed(task["seed"], *cells[c, 1:4].astype(int)))
+        draws = rng.uniform(0.0, 2.0 * np.pi, size=(2, members))
+        mean_anom[c * members:(c + 1) * members] = draws[0]
+        omega[c * members:(c + 1) * members] = draws[1]
+    nu = true_from_mean(mean_anom, e)
+    pair_pos, pair_vel, _ = elements_to_state(
+        np.full(k_count, m_host), m_test[:, None], a[:, None], e[:, None], nu[:, None], omega[:, None], G=G,
+    )
+    rel_pos = pair_pos[:, 1] - pair_pos[:, 0]
+    rel_vel = pair_vel[:, 1] - pair_vel[:, 0]
+
+    positions = np.empty((k_count, n_base + 1, 2))
+    velocities = np.empty((k_count, n_base + 1, 2))
+    positions[:, :n_base] = state.positions
+    velocities[:, :n_base] = state.velocities
+    positions[:, n_base] = state.positions[host] + rel_pos
+    velocities[:, n_base] = state.velocities[host] + rel_vel
+    masses = np.empty((k_count, n_base + 1))
+    masses[:, :n_base] = state.masses
+    masses[:, n_base] = m_test
+    # Keep the barycentre at rest after adding the test planet.
+    total = masses.sum(axis=1)
+    velocities -= (np.einsum("kn,knd->kd", masses, velocities) / total[:, None])[:, None, :]
+
+    mu_pair = G * (m_host + m_test)
+    others = np.array([i for i in range(n_base) if i != host], dtype=int)
+    stars = np.array([i for i in others if state.is_star[i]] + [host], dtype=int)
+    # Close-approach radius to every non-host body: hill_fraction Hill radii.
+    encounter_r = (hill_fraction * a[:, None]
+                   * ((m_test[:, None] + state.masses[others][None, :]) / (3.0 * m_host)) ** (1.0 / 3.0))
+
+    def orbital_energy():
+        dr = positions[:, n_base] - positions[:, host]
+        dv = velocities[:, n_base] - velocities[:, host]
+        r = np.sqrt(np.einsum("kd,kd->k", dr, dr))
+        return 0.5 * np.einsum("kd,kd->k", dv, dv) - mu_pair / r
+
+    eps0 = orbital_energy()
+    reason = np.zeros(k_count, dtype=np.int8)
+    t_fail = np.full(k_count, duration)
+
+    def check(t, due):
+        eps = orbital_energy()
+        codes = np.zeros(k_count, dtype=np.int8)
+        codes[(eps >= 0.0) | (np.abs(eps - eps0) > max_energy_drift * np.abs(eps0))] = ENERGY_DRIFT
+        if others.size:
+            d = np.linalg.norm(positions[:, others] - positions[:, n_base:n_base + 1], axis=2)
+            codes[np.any(d < encounter_r, axis=1)] = CLOSE_ENCOUNTER
+        d_star = np.linalg.norm(positions[:, stars] - positions[:, n_base:n_base + 1], axis=2)
+        codes[np.any(d_star < state.radii_au[stars][None, :], axis=1)] = STAR_COLLISION
+        new = due & (codes != STABLE) & (reason == STABLE)
+        reason[new] = codes[new]
+        t_fail[new] = t[new]
+
+    # Each member keeps its cell's own step, so a cell's result does not depend
+    # on which cells share its shard; members that finish early sit out.
+    n_steps = np.maximum(1, np.ceil(duration / np.repeat(cells[:, 6], members))).astype(np.int64)
+    h = duration / n_steps
+    acc = ensemble_accelerations(positions, masses, G=G)
+    for step in range(1, int(n_steps.max()) + 1):
+        h_now = np.where(step <= n_steps, h, 0.0)[:, None, None]
+        velocities += 0.5 * h_now * acc
+        positions += h_now * velocities
+        acc = ensemble_accelerations(positions, masses, G=G)
+        velocities += 0.5 * h_now * acc
+        due = (step <= n_steps) & ((step % check_interval == 0) | (step == n_steps))
+        if np.any(due):
+            check(step * h, due)
+            if np.all(reason != STABLE):
+                break
+
+    stable = (reason == STABLE).reshape(c_count, members)
+    survival = t_fail.reshape(c_count, members)
+    return cells[:, 0].astype(int), stable.mean(axis=1), survival.mean(axis=1)
+
+
+def _cache_path(directory: str, preset: str, key: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"stability_{preset}_{digest}.npz")
+
+
+def compute_stability_map(
+    preset: str,
+    a_range: Optional[Tuple[float, float]] = None,
+    e_range: Tuple[float, float] = (0.0, 0.8),
+    n_a: int = 50,
+    n_e: int = 50,
+    masses_earth: Sequence[float] = (1.0,),
+    host: Optional[str] = None,
+    members_per_cell: int = 1,
+    duration_years: Optional[float] = None,
+    steps_per_orbit: int = 40,
+    hill_fraction: float = 1.0,
+    max_energy_drift: float = 0.1,
+    check_interval: int = 10,
+    seed: int = 0,
+    max_workers: Optional[int] = None,
+    shard_size: int = 512,
+    use_cache: bool = True,
+    cache_directory: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    G: float = G_AU,
+) -> StabilityMap:
+    """
+    Stability probability of a test planet over an (a, e[, mass]) grid.
+
+    Args:
+        preset: Key in PRESETS ("earth_moon_sun", "alpha_centauri", "trappist_1").
+        a_range: (min, max) semi-major axis in AU. Defaults to 5-50% of the
+            distance to the nearest companion star, or 0.5-2x the host's
+            planetary system when it has no companion.
+        e_range: (min, max) eccentricity.
+        n_a, n_e: Grid resolution.
+        masses_earth: Test planet masses (Earth masses); one map slice each.
+        host: Star the test planet orbits (default: most massive star).
+        members_per_cell: Random-phase realisations per cell.
+        duration_years: Integration time (default: 10 periods of the nearest
+            companion, or 100 periods of the outermost test orbit if longer).
+        steps_per_orbit: Leapfrog steps per periapsis-scaled orbital period.
+        hill_fraction: Close-approach threshold in Hill radii.
+        max_energy_drift: Allowed relative drift of the test orbit's energy.
+        check_interval: Steps between stability checks.
+        seed: Base seed; cell (im, ie, ia) always uses the same draws.
+        max_workers: Worker processes (None = all cores, 1 = in-process).
+        shard_size: Cells per ensemble batch.
+        use_cache: Load / store the finished map under `cache_directory`.
+        cache_directory: Defaults to <project>/cache/stability_maps.
+        progress: Optional callback(done_shards, total_shards).
+        G: Gravitational constant.
+
+    Returns:
+        StabilityMap with stable_fraction of shape (n_masses, n_e, n_a).
+    """
+    state = preset_state(preset, host, G=G)
+    host_name = state.names[state.host_index]
+    m_host = float(state.masses[state.host_index])
+    companions = [i for i in range(len(state.names)) if state.is_star[i] and i != state.host_index]
+    host_pos = state.positions[state.host_index]
+    planet_a = [float(np.linalg.norm(state.positions[i] - host_pos))
+                for i in range(len(state.names)) if not state.is_star[i]]
+    companion_d = min((float(np.linalg.norm(state.positions[i] - host_pos)) for i in companions), default=None)
+
+    if a_range is None:
+        if companion_d is not None:
+            a_range = (0.05 * companion_d, 0.5 * companion_d)
+        elif planet_a:
+            a_range = (0.5 * min(planet_a), 2.0 * max(planet_a))
+        else:
+            a_range = (0.1, 10.0)
+    a_grid = np.linspace(float(a_range[0]), float(a_range[1]), int(n_a))
+    e_grid = np.linspace(float(e_range[0]), float(e_range[1]), int(n_e))
+    m_grid = np.asarray(masses_earth, dtype=float)
+
+    if duration_years is None:
+        duration_years = 100.0 * float(_periapsis_time(a_grid[-1], 0.0, G * m_host))
+        if companion_d is not None:
+            m_comp = float(state.masses[companions].max())
+            duration_years = max(duration_years, 10.0 * float(_periapsis_time(companion_d, 0.0, G * (m_host + m_comp))))
+    duration_years = float(duration_years)
+
+    key = {
+        "version": STABILITY_MAP_VERSION,
+        "preset": preset,
+        "host": host_name,
+        "a": a_grid.tolist(),
+        "e": e_grid.tolist(),
+        "m": m_grid.tolist(),
+        "members": int(members_per_cell),
+        "duration": duration_years,
+        "steps_per_orbit": int(steps_per_orbit),
+        "hill_fraction": float(hill_fraction),
+        "max_energy_drift": float(max_energy_drift),
+        "check_interval": int(check_interval),
+        "seed": int(seed),
+        "G": float(G),
+        "state": [state.positions.tolist(), state.velocities.tolist(), state.masses.tolist()],
+    }
+    path = None
+    if use_cache:
+        directory = cache_directory or cache_dir("stability_maps")
+        os.makedirs(directory, exist_ok=True)
+        path = _cache_path(directory, preset, key)
+        if os.path.exists(path):
+            return StabilityMap.load(path)
+
+    # Step limit from the preset's own bodies (fastest orbit about the host).
+    h_base = np.inf
+    if planet_a:
+        h_base = float(_periapsis_time(min(planet_a), 0.0, G * m_host)) / steps_per_orbit
+
+    # Every cell's step is its own periapsis-scaled period capped by h_base;
+    # sorting by it keeps cells with similar step counts in the same shard.
+    im, ie, ia = np.meshgrid(np.arange(m_grid.size), np.arange(e_grid.size), np.arange(a_grid.size), indexing="ij")
+    im, ie, ia = im.ravel(), ie.ravel(), ia.ravel()
+    flat = np.arange(im.size)
+    cell_h = np.minimum(h_base, _periapsis_time(a_grid[ia], e_grid[ie], G * m_host) / steps_per_orbit)
+    order = np.argsort(cell_h, kind="stable")
+    cells = np.column_stack((flat, im, ie, ia, a_grid[ia], e_grid[ie], cell_h))[order]
+    tasks = []
+    for start in range(0, cells.shape[0], max(1, int(shard_size))):
+        chunk = cells[start:start + max(1, int(shard_size))]
+        tasks.append({
+            "state": state,
+            "cells": chunk,
+            "masses_earth": m_grid,
+            "members": max(1, int(members_per_cell)),
+            "G": G,
+            "duration": duration_years,
+            "hill_fraction": hill_fraction,
+            "max_energy_drift": max_energy_drift,
+            "check_interval": max(1, int(check_interval)),
+            "seed": int(seed),
+        })
+
+    stable = np.empty(flat.size)
+    survival = np.empty(flat.size)
+
+    def collect(done, result):
+        idx, frac, surv = result
+        stable[idx] = frac
+        survival[idx] = surv
+        if progress is not None:
+            progress(done, len(tasks))
+
+    if max_workers == 1 or len(tasks) == 1:
+        for done, task in enumerate(tasks, start=1):
+            collect(done, _integrate_shard(task))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for done, result in enumerate(pool.map(_integrate_shard, tasks), start=1):
+                collect(done, result)
+
+    shape = (m_grid.size, e_grid.size, a_grid.size)
+    smap = StabilityMap(
+        preset=preset,
+        host=host_name,
+        semi_major_axes=a_grid,
+        eccentricities=e_grid,
+        masses_earth=m_grid,
+        stable_fraction=stable.reshape(shape),
+        mean_survival_time=survival.reshape(shape),
+        duration=duration_years,
+        members_per_cell=max(1, int(members_per_cell)),
+        seed=int(seed),
+    )
+    if path is not None:
+        smap.save(path)
+    return smap
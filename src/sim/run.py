@@ -0,0 +1,431 @@
+"""
+Headless simulation runner for batch experiments.
+
+Loads a system from a preset name (`src.physics.system_presets`), a saved
+system JSON or an `AIET-SEED:v1:` string, integrates it for a simulated
+duration as fast as the CPU allows and writes to an output directory:
+
+    trajectory.npz  times, positions, velocities (AU, AU/yr), names, types, masses
+    summary.json    run settings, wall time, conserved-quantity drift,
+                    detected events and habitability scores
+
+Nothing here imports pygame or matplotlib, so it runs on servers without a
+display. Usage (from the project root):
+
+    python -m src.sim.run alpha_centauri --duration 100 --output runs/acen
+    python -m src.sim.run saved_systems/my_system.json --duration 10 --integrator adaptive
+    python -m src.sim.run "AIET-SEED:v1:..." --duration 5 --no-ml
+
+Units follow `src.physics.nbody_kernels` (AU, AU/year, years); body masses
+follow the UI convention (stars in Solar masses, everything else in Earth
+masses).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.persistence_manager import load_system, load_system_seed
+from src.physics.ensemble import elements_to_state
+from src.physics.integrator_diagnostics import conserved_quantities
+from src.physics.nbody_kernels import G_AU, M_EARTH_PER_M_SUN
+from src.physics.system_presets import (
+    get_alpha_centauri_system,
+    get_blank_system,
+    get_earth_moon_sun_system,
+    get_trappist1_system,
+)
+from src.physics.trajectory_store import TrajectoryRecorder
+from src.simulation_engine import SimulationEngine
+from src.utils.paths import project_root
+
+# Presets whose specs are complete without the UI's planet tables.
+PRESETS = {
+    "blank": get_blank_system,
+    "earth_moon_sun": get_earth_moon_sun_system,
+    "alpha_centauri": get_alpha_centauri_system,
+    "trappist_1": get_trappist1_system,
+}
+INTEGRATORS = ("leapfrog", "adaptive", "wisdom_holman")
+SEED_PREFIX = "AIET-SEED:"
+DEFAULT_DT = 0.001  # years
+DEFAULT_RECORDS = 1000
+
+# Defaults for spec fields `place_object` would otherwise fill in.
+_STAR_DEFAULTS = {"mass": 1.0, "radius": 1.0, "temperature": 5772.0}
+_PLANET_DEFAULTS = {"mass": 1.0, "radius": 1.0, "density": 5.51}
+_MOON_DEFAULTS = {"mass": 0.0123, "radius": 0.273, "density": 3.34}
+_T_SUN = 5772.0
+
+
+@dataclass
+class HeadlessRun:
+    """
+    Recorded trajectory and diagnostics of one headless run.
+
+    Attributes:
+        system_name: Name of the integrated system.
+        integrator: Integrator used ("leapfrog", "adaptive", "wisdom_holman").
+        duration: Integrated time in years.
+        dt: Base step in years.
+        bodies: Body dicts in integration order (final state).
+        times: (R,) record times in years.
+        positions: (R, N, 2) positions in AU.
+        velocities: (R, N, 2) velocities in AU/yr.
+        energy: (R,) total energy.
+        angular_momentum: (R,) total angular momentum (z).
+        events: Events from the engine's event log.
+        wall_time: Seconds spent integrating.
+        steps: Integrator steps actually taken (leapfrog sub-steps, accepted
+            adaptive steps, Wisdom–Holman steps).
+        habitability: Per-planet ML scores (empty when not scored).
+    """
+
+    system_name: str
+    integrator: str
+    duration: float
+    dt: float
+    bodies: List[Dict[str, Any]]
+    times: np.ndarray
+    positions: np.ndarray
+    velocities: np.ndarray
+    energy: np.ndarray
+    angular_momentum: np.ndarray
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    wall_time: float = 0.0
+    steps: int = 0
+    habitability: List[Dict[str, Any]] = field(default_factory=list)
+
+    def drift_metrics(self) -> Dict[str, float]:
+        """Relative energy and angular-momentum drift over the records."""
+        e0 = abs(float(self.energy[0]))
+        l0 = abs(float(self.angular_momentum[0]))
+        e_drift = np.abs(self.energy - self.energy[0]) / (e0 if e0 > 1e-300 else 1.0)
+        l_drift = np.abs(self.angular_momentum - self.angular_momentum[0]) / (l0 if l0 > 1e-300 else 1.0)
+        return {
+            "max_energy_drift": float(e_drift.max()),
+            "final_energy_drift": float(e_drift[-1]),
+            "max_angular_momentum_drift": float(l_drift.max()),
+            "final_angular_momentum_drift": float(l_drift[-1]),
+        }
+
+
+def _with_defaults(spec: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    body = dict(spec)
+    for key, value in defaults.items():
+        if body.get(key) is None:
+            body[key] = value
+    return body
+
+
+def preset_bodies(preset: str, G: float = G_AU) -> List[Dict[str, Any]]:
+    """
+    Body dicts (AU state) for a preset.
+
+    Stars keep their `position_au` / `velocity_au`. Planets go on their preset
+    orbits about `host_star` (the only star when absent) and moons on circular
+    orbits about `parent`, at evenly spread phases.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}' (expected one of {sorted(PRESETS)})")
+    specs = PRESETS[preset]()
+    stars = [_with_defaults(s, _STAR_DEFAULTS) for s in specs if s.get("type") == "star"]
+    if not stars:
+        raise ValueError(f"Preset '{preset}' has no stars")
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for s in stars:
+        s["position_au"] = list(s.get("position_au", [0.0, 0.0])[:2])
+        s["velocity_au"] = list(s.get("velocity_au", [0.0, 0.0])[:2])
+        by_name[s["name"]] = s
+
+    golden = math.pi * (3.0 - math.sqrt(5.0))
+    bodies = list(stars)
+    for kind, defaults in (("planet", _PLANET_DEFAULTS), ("moon", _MOON_DEFAULTS)):
+        for k, spec in enumerate(s for s in specs if s.get("type") == kind):
+            body = _with_defaults(spec, defaults)
+            if kind == "planet":
+                parent_name = body.get("host_star", stars[0]["name"] if len(stars) == 1 else None)
+            else:
+                parent_name = body.get("parent")
+                if parent_name is None:
+                    planets = [b for b in bodies if b.get("type") == "planet"]
+                    parent_name = planets[0]["name"] if len(planets) == 1 else None
+            parent = by_name.get(parent_name)
+            if parent is None:
+                raise ValueError(f"Cannot place '{body.get('name')}': no unique parent in preset '{preset}'")
+            a = float(body.get("semi_major_axis", body.get("semiMajorAxis", 1.0)))
+            e = float(body.get("eccentricity", 0.0) or 0.0) if kind == "planet" else 0.0
+            parent_mass = parent["mass"] if parent["type"] == "star" else parent["mass"] / M_EARTH_PER_M_SUN
+            rel_pos, rel_vel, _ = elements_to_state(
+                np.array([parent_mass]), np.array([[body["mass"] / M_EARTH_PER_M_SUN]]),
+                np.array([[a]]), np.array([[e]]), np.array([k * golden]), np.zeros(1), G=G,
+            )
+            body["position_au"] = list(np.asarray(parent["position_au"]) + rel_pos[0, 1] - rel_pos[0, 0])
+            body["velocity_au"] = list(np.asarray(parent["velocity_au"]) + rel_vel[0, 1] - rel_vel[0, 0])
+            body["semiMajorAxis"] = a
+            body["parent"] = parent["name"]
+            bodies.append(body)
+            by_name[body["name"]] = body
+    return bodies
+
+
+def load_source(source: str) -> Tuple[str, List[Dict[str, Any]], Optional[float]]:
+    """
+    (system name, body dicts, saved dt or None) for a preset name, a saved
+    system JSON path or a seed string.
+    """
+    if source.strip().startswith(SEED_PREFIX):
+        payload, warning = load_system_seed(source)
+    elif source in PRESETS:
+        return source, preset_bodies(source), None
+    elif source.endswith(".json") or os.path.isfile(source):
+        path = source if os.path.isabs(source) or not os.path.isfile(source) else os.path.abspath(source)
+        payload, warning = load_system(path)
+    else:
+        raise ValueError(f"'{source}' is not a preset ({', '.join(sorted(PRESETS))}), "
+                         "a saved system JSON or an AIET seed")
+    if warning:
+        print(f"[sim] {warning}", file=sys.stderr)
+    return str(payload.get("system_name", "system")), payload["bodies"], float(payload["dt"])
+
+
+def run_headless(
+    bodies: Sequence[Dict[str, Any]],
+    duration: float,
+    dt: float = DEFAULT_DT,
+    record_interval: Optional[float] = None,
+    integrator: str = "leapfrog",
+    detect_events: bool = True,
+    system_name: str = "system",
+    G: float = G_AU,
+    progress: bool = False,
+    recorder: Optional[TrajectoryRecorder] = None,
+) -> HeadlessRun:
+    """
+    Integrate `bodies` for `duration` years and record the state.
+
+    The engine's N-body path does the stepping (barycentric handover,
+    `dt`-sized leapfrog sub-steps, event detection); the state is recorded
+    every `record_interval` years (default: duration / DEFAULT_RECORDS),
+    and also appended to `recorder` when one is given.
+    """
+    if integrator not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator '{integrator}' (expected one of {INTEGRATORS})")
+    if duration <= 0 or dt <= 0:
+        raise ValueError("duration and dt must be positive")
+    bodies = [dict(b) for b in bodies if not b.get("is_destroyed", False)]
+    if not bodies:
+        raise ValueError("No bodies to integrate")
+    for b in bodies:
+        # The handover converts pixel positions; 1 px per AU keeps them exact.
+        b["position"] = np.asarray(b["position_au"], dtype=float)[:2].copy()
+
+    engine = SimulationEngine()
+    engine.G = G
+    engine.integrator = integrator
+    engine.detect_events = detect_events
+    engine._initialize_nbody_state(bodies, 1.0)
+    engine.trajectory_recorder = recorder
+
+    if record_interval is None or record_interval <= 0:
+        record_interval = duration / DEFAULT_RECORDS
+    n_records = max(1, int(math.ceil(duration / record_interval - 1e-9)))
+    n = len(bodies)
+    times = np.zeros(n_records + 1)
+    positions = np.zeros((n_records + 1, n, 2))
+    velocities = np.zeros((n_records + 1, n, 2))
+    energy = np.zeros(n_records + 1)
+    ang = np.zeros(n_records + 1)
+
+    def record(r: int, t: float):
+        pos, vel, mass = engine._pack_nbody(bodies)
+        live = mass > 0.0
+        times[r] = t
+        positions[r] = pos
+        velocities[r] = vel
+        energy[r], _, l_vec = conserved_quantities(pos[live], vel[live], mass[live], G=G)
+        ang[r] = l_vec[2]
+
+    events: List[Dict[str, Any]] = []
+    start = time.perf_counter()
+    record(0, 0.0)
+    t = 0.0
+    for r in range(1, n_records + 1):
+        t_next = min(r * record_interval, duration)
+        span = t_next - t
+        engine.step_nbody(span, bodies, n_sub=max(1, int(math.ceil(span / dt - 1e-9))), scale_px_per_au=1.0)
+        t = t_next
+        record(r, t)
+        # The engine's log is bounded; drain it so long runs keep every event.
+        events.extend(engine.event_log)
+        engine.event_log.clear()
+        if progress and r % max(1, n_records // 20) == 0:
+            print(f"[sim] t = {t:.6g} / {duration:.6g} yr", file=sys.stderr)
+    wall = time.perf_counter() - start
+
+    return HeadlessRun(
+        system_name=system_name, integrator=integrator, duration=duration, dt=dt, bodies=bodies,
+        times=times, positions=positions, velocities=velocities, energy=energy, angular_momentum=ang,
+        events=events, wall_time=wall, steps=engine._integrator_steps,
+    )
+
+
+def _luminosity(star: Dict[str, Any]) -> float:
+    lum = star.get("luminosity")
+    if lum is not None:
+        return float(lum)
+    # Stefan-Boltzmann in solar units.
+    return float(star.get("radius", 1.0)) ** 2 * (float(star.get("temperature", _T_SUN)) / _T_SUN) ** 4
+
+
+def score_habitability(run: HeadlessRun, calculator=None) -> List[Dict[str, Any]]:
+    """
+    ML habitability of every surviving planet against its host star.
+
+    Each planet's `stellarFlux` becomes the flux from all stars averaged over
+    the recorded trajectory (as the UI's N-body mode does). The host is the
+    planet's parent star, or the star contributing most of the flux. Returns
+    an empty list when neither the model (hab_xgb.json) nor its compiled
+    hab_xgb.npz artifact is available.
+    """
+    try:
+        from src.ml.ml_habitability import MLHabitabilityCalculator
+        from src.ml.ml_integration import predict_with_simulation_body
+        if calculator is None:
+            calculator = MLHabitabilityCalculator()
+    except (ImportError, FileNotFoundError) as e:
+        print(f"[sim] Habitability scores skipped: {e}", file=sys.stderr)
+        return []
+
+    stars = [i for i, b in enumerate(run.bodies) if b.get("type") == "star" and not b.get("is_destroyed")]
+    if not stars:
+        return []
+    lum = np.array([_luminosity(run.bodies[i]) for i in stars])
+    scores = []
+    for i, planet in enumerate(run.bodies):
+        if planet.get("type") != "planet" or planet.get("is_destroyed"):
+            continue
+        d2 = np.sum((run.positions[:, stars] - run.positions[:, i:i + 1]) ** 2, axis=2)
+        flux = lum / np.maximum(d2, 1e-12)
+        host = next((run.bodies[k] for k in stars
+                     if run.bodies[k].get("name") in (planet.get("parent"), planet.get("host_star"))),
+                    run.bodies[stars[int(np.argmax(flux.mean(axis=0)))]])
+        planet["stellarFlux"] = float(flux.sum(axis=1).mean())
+        score, diagnostics = predict_with_simulation_body(calculator, planet, host, return_diagnostics=True)
+        scores.append({
+            "name": planet.get("name"),
+            "host": host.get("name"),
+            "stellar_flux": planet["stellarFlux"],
+            "score": score,
+            "score_raw": diagnostics.get("score_raw"),
+            "surface_class": diagnostics.get("surface_class"),
+        })
+    run.habitability = scores
+    return scores
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    return value
+
+
+def write_outputs(run: HeadlessRun, directory: str, source: str = "") -> Dict[str, str]:
+    """Write trajectory.npz and summary.json into `directory`; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    names = np.array([str(b.get("name", "")) for b in run.bodies])
+    types = np.array([str(b.get("type", "")) for b in run.bodies])
+    masses = np.array([float(b.get("mass", 0.0) or 0.0) for b in run.bodies])
+    trajectory = os.path.join(directory, "trajectory.npz")
+    np.savez_compressed(trajectory, times=run.times, positions=run.positions, velocities=run.velocities,
+                        names=names, types=types, masses=masses)
+    summary = {
+        "system_name": run.system_name,
+        "source": source if not source.startswith(SEED_PREFIX) else "seed",
+        "integrator": run.integrator,
+        "duration_years": run.duration,
+        "dt_years": run.dt,
+        "records": int(run.times.size),
+        "bodies": [{"name": b.get("name"), "type": b.get("type"), "destroyed": bool(b.get("is_destroyed", False))}
+                   for b in run.bodies],
+        "wall_time_s": run.wall_time,
+        "steps": run.steps,
+        "steps_per_second": run.steps / run.wall_time if run.wall_time > 0 else None,
+        "sim_years_per_second": run.duration / run.wall_time if run.wall_time > 0 else None,
+        "drift": run.drift_metrics(),
+        "events": [{k: _json_value(v) for k, v in e.items()} for e in run.events],
+        "habitability": run.habitability,
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+    summary_path = os.path.join(directory, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return {"trajectory": trajectory, "summary": summary_path}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.sim.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("source", help=f"Preset ({', '.join(sorted(PRESETS))}), saved system JSON or AIET seed")
+    parser.add_argument("--duration", type=float, required=True, help="Simulated time in years")
+    parser.add_argument("--dt", type=float, default=None,
+                        help=f"Step in years (default: the saved system's dt, {DEFAULT_DT} for presets)")
+    parser.add_argument("--record-interval", type=float, default=None,
+                        help=f"Years between trajectory records (default: duration / {DEFAULT_RECORDS})")
+    parser.add_argument("--integrator", choices=INTEGRATORS, default="leapfrog")
+    parser.add_argument("--output", default=None,
+                        help="Output directory (default: exports/headless/<system>_<timestamp>)")
+    parser.add_argument("--store", default=None,
+                        help="Also write the records to a chunked float32 store in this directory")
+    parser.add_argument("--decimation", type=int, default=1, help="Keep every n-th record in --store")
+    parser.add_argument("--no-events", action="store_true", help="Skip event detection")
+    parser.add_argument("--no-ml", action="store_true", help="Skip habitability scoring")
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        name, bodies, saved_dt = load_source(args.source)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"[sim] {e}", file=sys.stderr)
+        return 2
+    dt = args.dt if args.dt is not None else (saved_dt or DEFAULT_DT)
+    recorder = TrajectoryRecorder(args.store, decimation=args.decimation) if args.store else None
+    try:
+        run = run_headless(bodies, args.duration, dt=dt, record_interval=args.record_interval,
+                           integrator=args.integrator, detect_events=not args.no_events,
+                           system_name=name, progress=not args.quiet, recorder=recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    if not args.no_ml:
+        score_habitability(run)
+    output = args.output
+    if output is None:
+        safe = "".join(c if c.isalnum() or c in "_-" else "_" for c in name) or "system"
+        output = os.path.join(project_root(), "exports", "headless",
+                              f"{safe}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    paths = write_outputs(run, output, source=args.source)
+    if not args.quiet:
+        drift = run.drift_metrics()
+        print(f"[sim] {name}: {run.duration:g} yr in {run.wall_time:.2f} s "
+              f"(max |dE/E0| = {drift['max_energy_drift']:.2e}, {len(run.events)} events)")
+        print(f"[sim] Wrote {paths['trajectory']} and {paths['summary']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,44 @@
 import numpy as np
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict, List, Optional
 try:
     from ml_habitability import MLHabitabilityCalculator
 except ImportError:
     MLHabitabilityCalculator = None
 
+from src.physics.nbody_kernels import (
+    G_AU,
+    M_EARTH_PER_M_SUN,
+    R_EARTH_AU,
+    R_SUN_AU,
+    field_accelerations,
+    leapfrog,
+    pairwise_accelerations,
+    pairwise_accelerations_and_potential,
+    total_energy,
+)
+from src.physics.adaptive_integrator import (
+    DEFAULT_ATOL,
+    DEFAULT_RTOL,
+    AdaptiveStepStats,
+    dopri_integrate,
+)
+from src.physics.wisdom_holman import orbital_timescale, wisdom_holman
+from src.physics.variational import VariationalState, variational_leapfrog
+from src.physics.events import EVENT_KINDS, EventDetector
+from src.physics.broad_phase import DEFAULT_HILL_FACTOR, close_encounter_pairs, overlapping_pairs
+from src.physics.trajectory_store import TrajectoryRecorder
+from src.physics.batched_systems import SystemBatch, batched_leapfrog
+from src.physics.secular import SecularSystem
+from src.checkpoint import pack_bodies, read_checkpoint, unpack_bodies, write_checkpoint
+from src.physics.barnes_hut import (
+    DEFAULT_THETA,
+    barnes_hut_accelerations,
+    build_tree,
+    tree_field_accelerations,
+)
+
 @dataclass
 class CelestialBody:
     name: str
@@ -31,11 +64,100 @@ class CelestialBody:
             solar_rad = self.radius / 109.2
             self.lum = (solar_rad**2) * (self.temperature / 5778.0)**4
 
+@dataclass(frozen=True)
+class EnergyDriftSnapshot:
+    """
+    Published N-body energy check. Replaced as a whole on each update, so a
+    reader on another thread always sees a consistent set of values.
+
+    Attributes:
+        drift: |E - E0| / |E0|.
+        energy: Total energy at the check (M_sun AU^2 / yr^2).
+        reference_energy: E0 recorded at the Keplerian -> N-body handover.
+        sim_time: Years since the handover.
+        step: step_nbody call count at the check.
+    """
+
+    drift: float
+    energy: float
+    reference_energy: float
+    sim_time: float
+    step: int
+
+
 class SimulationEngine:
     def __init__(self):
         self.bodies: List[CelestialBody] = []
-        self.G = 39.478  # Gravitational constant in AU^3/(M_sun * year^2)
+        self.G = G_AU  # Gravitational constant in AU^3/(M_sun * year^2)
         self.time_step = 0.01  # in years
+        # Struct-of-arrays state store. Each CelestialBody's position, velocity and
+        # acceleration are row views into these arrays, so the force kernel and the
+        # integrator work on contiguous memory instead of per-body objects.
+        self._positions = np.zeros((0, 3))  # AU
+        self._velocities = np.zeros((0, 3))  # AU/year
+        self._accelerations = np.zeros((0, 3))  # AU/year^2
+        self._masses = np.zeros(0)  # Solar masses
+        # Massless test particles (asteroid belts, rings, debris). They feel the
+        # massive bodies but exert no force, so they live in their own arrays and
+        # cost O(N_massive x N_particles) per force evaluation.
+        self._tp_positions = np.zeros((0, 3))  # AU
+        self._tp_velocities = np.zeros((0, 3))  # AU/year
+        # Gravity solver: "direct" (O(N^2) broadcast), "barnes_hut" (O(N log N) tree),
+        # or "auto" (tree once the body count reaches barnes_hut_threshold, where
+        # it is already ~3x faster than direct; ~1% force error at theta 0.5).
+        self.gravity_solver = "auto"
+        self.barnes_hut_theta = DEFAULT_THETA
+        self.barnes_hut_threshold = 2000
+        # Time integrator: "leapfrog" (fixed sub-steps), "adaptive" (Dormand–Prince
+        # 5(4) with per-step error control) or "wisdom_holman" (below).
+        self.integrator = "leapfrog"
+        self.adaptive_rtol = DEFAULT_RTOL
+        self.adaptive_atol = DEFAULT_ATOL
+        self._adaptive_h: Optional[float] = None  # step suggestion carried between calls
+        self.last_step_stats: Optional[AdaptiveStepStats] = None
+        # Cap on the fixed leapfrog sub-steps that finish an adaptive call whose
+        # step budget ran out (see _advance_adaptive).
+        self.adaptive_fallback_max_substeps = 10000
+        # "wisdom_holman": Jacobi-coordinate mixed-variable symplectic steps of
+        # wh_step_fraction x the shortest orbital time (see orbital_timescale).
+        self.wh_step_fraction = 0.05
+        # Calls in which two small bodies fly within wh_encounter_hill_factor
+        # mutual Hill radii of each other switch to the adaptive integrator
+        # (None disables the switch).
+        self.wh_encounter_hill_factor: Optional[float] = DEFAULT_HILL_FACTOR
+        # Chaos indicators: with track_chaos the leapfrog N-body path also integrates
+        # the variational equations (one tangent vector per body up to
+        # chaos_per_body_max bodies, one for the whole system beyond) and keeps
+        # MEGNO / Lyapunov time in chaos_state.
+        self.track_chaos = False
+        self.chaos_per_body_max = 32
+        self.chaos_state: Optional[VariationalState] = None
+        self._chaos_bodies: List[dict] = []
+        # Random draws (tangent seeding) come from this generator; its state is checkpointed.
+        self._rng = np.random.default_rng()
+        # N-body (multi-star) mode state for the UI's placed_bodies dicts
+        self._nbody_E0: Optional[float] = None
+        self._nbody_time = 0.0  # years since the last N-body handover
+        self._nbody_steps = 0  # step_nbody calls
+        self._integrator_steps = 0  # integrator steps actually taken by those calls
+        # Energy-drift meter: every energy_meter_interval step_nbody calls the
+        # force kernel also returns the potential, and the result is published
+        # in energy_snapshot (read by the diagnostics panel).
+        self.energy_meter_interval = 10
+        self.energy_snapshot: Optional[EnergyDriftSnapshot] = None
+        self._last_potential: Optional[float] = None
+        # Event detection: event functions are checked at every leapfrog
+        # sub-step (once per call for the other integrators) and crossings are
+        # localized inside the step. event_line_of_sight points at the observer
+        # for transits. Recent events are kept in event_log.
+        self.detect_events = True
+        self.event_kinds = EVENT_KINDS
+        self.event_line_of_sight = (0.0, 1.0)
+        self.event_log: Deque[dict] = deque(maxlen=256)
+        self._event_detector_cache = None
+        # Trajectory recording: with a TrajectoryRecorder attached, every
+        # step_nbody call appends the live bodies' state to its on-disk store.
+        self.trajectory_recorder: Optional[TrajectoryRecorder] = None
         try:
             self.ml_calculator = MLHabitabilityCalculator() if MLHabitabilityCalculator else None
         except Exception as e:
@@ -43,16 +165,612 @@ class SimulationEngine:
             self.ml_calculator = None
         
     def add_body(self, body: CelestialBody):
+        n = len(self.bodies)
+        if n >= self._positions.shape[0]:
+            self._grow_store(max(8, 2 * self._positions.shape[0]))
+        self._positions[n] = np.asarray(body.position, dtype=float)[:3]
+        self._velocities[n] = np.asarray(body.velocity, dtype=float)[:3]
+        self._accelerations[n] = np.asarray(body.acceleration, dtype=float)[:3]
+        self._masses[n] = self._body_mass_solar(body)
         self.bodies.append(body)
+        self._bind_views(n)
+
+    def _grow_store(self, capacity: int):
+        """Reallocate the state arrays and re-point every body at the new rows."""
+        n = len(self.bodies)
+        for attr in ("_positions", "_velocities", "_accelerations"):
+            new = np.zeros((capacity, 3))
+            new[:n] = getattr(self, attr)[:n]
+            setattr(self, attr, new)
+        masses = np.zeros(capacity)
+        masses[:n] = self._masses[:n]
+        self._masses = masses
+        for i in range(n):
+            self._bind_views(i)
+
+    def _bind_views(self, i: int):
+        body = self.bodies[i]
+        body.position = self._positions[i]
+        body.velocity = self._velocities[i]
+        body.acceleration = self._accelerations[i]
+
+    def _sync_store(self):
+        """
+        Re-adopt any body whose position/velocity was replaced by a new array
+        (e.g. `body.position = np.array(...)`) so the store stays authoritative,
+        and re-read masses so edits to `body.mass` take effect immediately.
+        """
+        for i, body in enumerate(self.bodies):
+            self._masses[i] = self._body_mass_solar(body)
+            if getattr(body.position, "base", None) is not self._positions:
+                self._positions[i] = np.asarray(body.position, dtype=float)[:3]
+                body.position = self._positions[i]
+            if getattr(body.velocity, "base", None) is not self._velocities:
+                self._velocities[i] = np.asarray(body.velocity, dtype=float)[:3]
+                body.velocity = self._velocities[i]
+
+    @property
+    def test_particle_count(self) -> int:
+        return int(self._tp_positions.shape[0])
+
+    @property
+    def test_particle_positions(self) -> np.ndarray:
+        """(M, 3) test-particle positions in AU (read-only view)."""
+        view = self._tp_positions.view()
+        view.flags.writeable = False
+        return view
+
+    def add_test_particles(self, positions, velocities=None) -> int:
+        """
+        Append massless test particles.
+
+        Args:
+            positions: (M, 2) or (M, 3) positions in AU.
+            velocities: Matching velocities in AU/year (zero if omitted).
+
+        Returns:
+            Index of the first added particle.
+        """
+        pos = np.atleast_2d(np.asarray(positions, dtype=float))
+        vel = np.zeros_like(pos) if velocities is None else np.atleast_2d(np.asarray(velocities, dtype=float))
+        if pos.shape != vel.shape or pos.shape[1] not in (2, 3):
+            raise ValueError("positions and velocities must both be (M, 2) or (M, 3)")
+        new_pos = np.zeros((pos.shape[0], 3))
+        new_vel = np.zeros((pos.shape[0], 3))
+        new_pos[:, :pos.shape[1]] = pos
+        new_vel[:, :vel.shape[1]] = vel
+        first = self.test_particle_count
+        self._tp_positions = np.vstack((self._tp_positions, new_pos))
+        self._tp_velocities = np.vstack((self._tp_velocities, new_vel))
+        return first
+
+    def clear_test_particles(self):
+        self._tp_positions = np.zeros((0, 3))
+        self._tp_velocities = np.zeros((0, 3))
+
+    def seed_test_particle_belt(self, center_au, center_velocity_au, central_mass_solar: float,
+                                r_inner: float, r_outer: float, count: int,
+                                seed: Optional[int] = None) -> int:
+        """
+        Scatter `count` particles on circular prograde orbits in an annulus.
+
+        Radii are drawn uniformly in area between `r_inner` and `r_outer` (AU)
+        around `center_au`; velocities are Keplerian about `central_mass_solar`
+        plus the centre's own velocity.
+
+        Returns:
+            Index of the first added particle.
+        """
+        rng = np.random.default_rng(seed)
+        count = int(count)
+        r = np.sqrt(rng.uniform(r_inner * r_inner, r_outer * r_outer, count))
+        phi = rng.uniform(0.0, 2.0 * np.pi, count)
+        cos_p, sin_p = np.cos(phi), np.sin(phi)
+        v_circ = np.sqrt(self.G * central_mass_solar / r)
+        center = np.asarray(center_au, dtype=float)[:2]
+        center_vel = np.asarray(center_velocity_au, dtype=float)[:2]
+        pos = center + np.column_stack((r * cos_p, r * sin_p))
+        vel = center_vel + np.column_stack((-v_circ * sin_p, v_circ * cos_p))
+        return self.add_test_particles(pos, vel)
+
+    def step_test_particles(self, dt: float, source_positions: np.ndarray, source_masses: np.ndarray,
+                            n_sub: int = 1):
+        """
+        Advance the test particles by `dt` years in a fixed massive-body field.
+
+        Used when the massive bodies are moved kinematically (Keplerian mode)
+        rather than integrated; in N-body mode `step_nbody` co-integrates the
+        particles instead.
+        """
+        if self.test_particle_count == 0 or dt <= 0:
+            return
+        src = np.asarray(source_positions, dtype=float)
+        dim = src.shape[1]
+        pos = np.ascontiguousarray(self._tp_positions[:, :dim])
+        vel = np.ascontiguousarray(self._tp_velocities[:, :dim])
+        n_sub = max(1, int(n_sub))
+        h = dt / n_sub
+        mass = np.asarray(source_masses, dtype=float)
+        tree = build_tree(src, mass) if self._uses_barnes_hut(src.shape[0]) else None
+        acc = self._tracer_field(pos, src, mass, tree)
+        for _ in range(n_sub):
+            vel += 0.5 * h * acc
+            pos += h * vel
+            acc = self._tracer_field(pos, src, mass, tree)
+            vel += 0.5 * h * acc
+        self._tp_positions[:, :dim] = pos
+        self._tp_velocities[:, :dim] = vel
+
+    def refresh_masses(self):
+        """Re-read body masses into the store (also done by every `_sync_store`)."""
+        for i, body in enumerate(self.bodies):
+            self._masses[i] = self._body_mass_solar(body)
+
+    @staticmethod
+    def _body_mass_solar(body: CelestialBody) -> float:
+        # Stars are stored in Solar masses, everything else in Earth masses.
+        return body.mass if body.type == 'star' else body.mass / M_EARTH_PER_M_SUN
 
     @staticmethod
     def physics_mode(placed_bodies) -> str:
         """
-        Compatibility shim for newer UI code paths.
-        This engine snapshot supports the legacy keplerian flow only.
+        Select the physics mode for the UI's placed bodies.
+
+        Single-star systems use the kinematic Keplerian flow; two or more live
+        stars switch to the barycentric N-body integrator (`step_nbody`).
         """
-        return "keplerian"
-        
+        stars = [
+            b for b in placed_bodies
+            if b.get("type") == "star" and not b.get("is_destroyed", False)
+        ]
+        return "nbody" if len(stars) >= 2 else "keplerian"
+
+    # ------------------------------------------------------------------
+    # N-body mode (operates on the UI's placed_bodies dicts)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _mass_solar(body: dict) -> float:
+        """Mass of a UI body dict in Solar masses (0 for destroyed bodies)."""
+        if body.get("is_destroyed", False):
+            return 0.0
+        mass = float(body.get("mass", 0.0) or 0.0)
+        return mass if body.get("type") == "star" else mass / M_EARTH_PER_M_SUN
+
+    @staticmethod
+    def _radius_au(body: dict) -> float:
+        """Physical radius of a UI body dict in AU (stars in R_sun, others in R_earth)."""
+        radius = float(body.get("radius", 0.0) or 0.0)
+        return radius * (R_SUN_AU if body.get("type") == "star" else R_EARTH_AU)
+
+    @staticmethod
+    def _nbody_active(placed_bodies) -> List[dict]:
+        return [
+            b for b in placed_bodies
+            if not b.get("is_destroyed", False) and b.get("position_au") is not None
+        ]
+
+    def _pack_nbody(self, bodies: List[dict]):
+        """Extract (positions, velocities, masses) arrays from body dicts in one pass."""
+        n = len(bodies)
+        pos = np.empty((n, 2))
+        vel = np.zeros((n, 2))
+        mass = np.empty(n)
+        for i, b in enumerate(bodies):
+            pos[i] = np.asarray(b["position_au"], dtype=float)[:2]
+            v = b.get("velocity_au")
+            if v is not None:
+                vel[i] = np.asarray(v, dtype=float)[:2]
+            mass[i] = self._mass_solar(b)
+        return pos, vel, mass
+
+    def _initialize_nbody_state(self, placed_bodies, scale_px_per_au: float):
+        """
+        Keplerian -> N-body handover.
+
+        Converts each live body's pixel position to AU, assigns velocities
+        (preset `velocity_au` when present, otherwise a circular orbit about
+        the parent), then moves everything into the barycentric frame and
+        records the reference energy E0.
+        """
+        live = [b for b in placed_bodies if not b.get("is_destroyed", False) and b.get("position") is not None]
+        if not live:
+            return
+        order = {"star": 0, "planet": 1, "moon": 2}
+        live.sort(key=lambda b: order.get(b.get("type"), 3))
+        by_name = {b.get("name"): b for b in live}
+
+        for b in live:
+            pos = b["position"]
+            b["position_au"] = np.array([float(pos[0]), float(pos[1])]) / scale_px_per_au
+
+        for b in live:
+            vel = b.get("velocity_au")
+            if b.get("type") == "star" and vel is not None:
+                b["velocity_au"] = np.array(vel[:2], dtype=float)
+                continue
+            parent = b.get("parent_obj") or by_name.get(b.get("parent"))
+            if b.get("type") == "star" or parent is None or parent.get("position_au") is None:
+                b["velocity_au"] = np.zeros(2) if vel is None else np.array(vel[:2], dtype=float)
+                continue
+            rel = b["position_au"] - parent["position_au"]
+            r = float(np.hypot(rel[0], rel[1]))
+            parent_vel = parent.get("velocity_au")
+            parent_vel = np.zeros(2) if parent_vel is None else np.asarray(parent_vel, dtype=float)[:2]
+            if r <= 0.0:
+                b["velocity_au"] = parent_vel.copy()
+                continue
+            mu = self.G * (self._mass_solar(parent) + self._mass_solar(b))
+            v_circ = np.sqrt(mu / r)
+            b["velocity_au"] = parent_vel + v_circ * np.array([-rel[1], rel[0]]) / r
+
+        bodies = self._nbody_active(live)
+        pos, vel, mass = self._pack_nbody(bodies)
+        total_mass = mass.sum()
+        if total_mass > 0:
+            com = (mass[:, None] * pos).sum(axis=0) / total_mass
+            vcom = (mass[:, None] * vel).sum(axis=0) / total_mass
+            pos -= com
+            vel -= vcom
+            # Carry test particles into the same barycentric frame.
+            self._tp_positions[:, :2] -= com
+            self._tp_velocities[:, :2] -= vcom
+        self._write_back_nbody(bodies, pos, vel, scale_px_per_au)
+        self._nbody_E0 = total_energy(pos, vel, mass, G=self.G)
+        self._nbody_time = 0.0
+        self._nbody_steps = 0
+        self._integrator_steps = 0
+        self._adaptive_h = None
+        self.chaos_state = None
+        self.energy_snapshot = None
+        self.event_log.clear()
+
+    @staticmethod
+    def _write_back_nbody(bodies: List[dict], pos: np.ndarray, vel: np.ndarray, scale_px_per_au: float):
+        pos_px = pos * scale_px_per_au
+        for i, b in enumerate(bodies):
+            b["position_au"] = pos[i].copy()
+            b["velocity_au"] = vel[i].copy()
+            b["position"] = pos_px[i].copy()
+
+    def _detect_nbody_collisions(self, bodies: List[dict], pos: np.ndarray, mass: np.ndarray):
+        """Flag the lighter body of any pair whose separation is below the sum of radii."""
+        n = len(bodies)
+        if n < 2:
+            return
+        radii = np.array([self._radius_au(b) for b in bodies])
+        i, j = overlapping_pairs(pos, radii)
+        for a, c in zip(i, j):
+            loser = bodies[a] if mass[a] < mass[c] else bodies[c]
+            loser["is_destroyed"] = True
+
+    def step_nbody(self, dt: float, placed_bodies, n_sub: int = 20, scale_px_per_au: float = 400.0):
+        """
+        Advance the multi-star system by `dt` years with kick-drift-kick leapfrog.
+
+        State is packed into arrays once, all `n_sub` sub-steps run on those
+        arrays, and positions/velocities are written back in a single pass.
+        Bodies whose separation falls below the sum of radii are flagged
+        `is_destroyed` (stellar engulfment / collision). Test particles are
+        advanced in lock-step with the massive bodies.
+
+        With `integrator == "adaptive"` the step sizes come from the error
+        controller and `n_sub` is ignored; with "wisdom_holman" they come from
+        the system's shortest orbital time. With `track_chaos` (leapfrog only)
+        tangent vectors are advanced alongside and `chaos_state` is updated.
+        Every `energy_meter_interval` calls the relative energy drift is
+        published in `energy_snapshot`. With `detect_events`, collisions,
+        engulfments, periapsis passages and transits are localized inside each
+        integrator step (leapfrog sub-step, accepted adaptive step or
+        Wisdom–Holman step) and appended to `event_log`; a collision or engulfment flags
+        the lighter body `is_destroyed` straight away. With a
+        `trajectory_recorder` attached the new state is recorded.
+        """
+        bodies = self._nbody_active(placed_bodies)
+        if not bodies or dt <= 0:
+            return
+        n_sub = max(1, int(n_sub))
+        pos, vel, mass = self._pack_nbody(bodies)
+        self._nbody_steps += 1
+        meter_due = self._nbody_E0 is not None and self._nbody_steps % max(1, int(self.energy_meter_interval)) == 0
+        self._last_potential = None
+        # Contiguous 2-D copies of the particle state for the sub-step loop.
+        tp_pos = np.ascontiguousarray(self._tp_positions[:, :2])
+        tp_vel = np.ascontiguousarray(self._tp_velocities[:, :2])
+        h = dt / n_sub
+        detector = self._event_detector(bodies, mass)
+        # With event detection the state after every integrator step (and its
+        # length) is buffered and scanned in one pass after the call.
+        traj_pos, traj_vel, traj_h = [pos.copy()], [vel.copy()], []
+
+        def record_step(k, step_h=h):
+            traj_pos.append(pos.copy())
+            traj_vel.append(vel.copy())
+            traj_h.append(step_h)
+
+        on_step = record_step if detector is not None else None
+        if self.integrator == "adaptive":
+            self._advance_adaptive(pos, vel, mass, dt, tp_pos, tp_vel, step_callback=on_step)
+        elif self.integrator == "wisdom_holman":
+            self._advance_wisdom_holman(pos, vel, mass, dt, tp_pos, tp_vel, fallback_steps=n_sub,
+                                        step_callback=on_step)
+        elif self.track_chaos:
+            self._integrator_steps += n_sub
+            variational_leapfrog(pos, vel, mass, self._chaos_state_for(bodies), h, n_sub, G=self.G,
+                                 tracer_positions=tp_pos, tracer_velocities=tp_vel,
+                                 tracer_fn=self._tracer_field, step_callback=on_step)
+        else:
+            # Leapfrog's last force evaluation is at the final positions, so on
+            # meter steps its potential completes the energy for free.
+            gravity = self._gravity_with_potential if meter_due else self._gravity
+            self._integrator_steps += n_sub
+            leapfrog(pos, vel, mass, h, n_sub, G=self.G, acceleration_fn=gravity,
+                     tracer_positions=tp_pos, tracer_velocities=tp_vel, tracer_fn=self._tracer_field,
+                     step_callback=on_step)
+        if detector is not None:
+            events = detector.scan(np.array(traj_pos), np.array(traj_vel), np.array(traj_h), self._nbody_time)
+            self._record_events(bodies, mass, events)
+        self._tp_positions[:, :2] = tp_pos
+        self._tp_velocities[:, :2] = tp_vel
+        self._nbody_time += dt
+        if meter_due:
+            self._publish_energy_drift(pos, vel, mass)
+        self._write_back_nbody(bodies, pos, vel, scale_px_per_au)
+        if self.trajectory_recorder is not None:
+            self.trajectory_recorder.append(self._nbody_time, pos, vel, [b.get("name") for b in bodies])
+        self._detect_nbody_collisions(bodies, pos, mass)
+
+    def step_batch(self, batch: SystemBatch, dt, n_sub: int = 20) -> SystemBatch:
+        """
+        Advance every system of a padded `SystemBatch` by `dt` years (scalar
+        or one per system) with `n_sub` leapfrog sub-steps, all systems in one
+        vectorized step. The engine's own `placed_bodies` state is untouched.
+        """
+        n_sub = max(1, int(n_sub))
+        batched_leapfrog(batch, np.asarray(dt, dtype=np.float64) / n_sub, n_sub, G=self.G)
+        return batch
+
+    def secular_system(self, placed_bodies, host: Optional[dict] = None) -> SecularSystem:
+        """
+        Laplace–Lagrange modes of the planets orbiting `host` (default: the
+        heaviest star), fitted to their current osculating elements at the
+        current N-body time, for closed-form eccentricity evolution over Myr.
+        """
+        return SecularSystem.from_bodies(self._nbody_active(placed_bodies), host=host,
+                                         epoch=self._nbody_time, G=self.G)
+
+    def _event_detector(self, bodies: List[dict], mass: np.ndarray) -> Optional[EventDetector]:
+        """Event detector for `bodies`, rebuilt only when the bodies or settings change."""
+        if not self.detect_events or len(bodies) < 2:
+            return None
+        key = (tuple(id(b) for b in bodies), tuple(self.event_kinds), tuple(self.event_line_of_sight))
+        cached = self._event_detector_cache
+        if cached is not None and cached[0] == key and np.array_equal(cached[1].masses, mass):
+            return cached[1]
+        radii = np.array([self._radius_au(b) for b in bodies])
+        is_star = np.array([b.get("type") == "star" for b in bodies])
+        detector = EventDetector(mass, radii, is_star, kinds=self.event_kinds,
+                                 line_of_sight=self.event_line_of_sight)
+        self._event_detector_cache = (key, detector)
+        return detector
+
+    def _record_events(self, bodies: List[dict], mass: np.ndarray, events):
+        for event in events:
+            first, second = bodies[event.i], bodies[event.j]
+            self.event_log.append({
+                "kind": event.kind,
+                "time": event.time,
+                "bodies": (first.get("name"), second.get("name")),
+                "separation_au": event.separation,
+            })
+            if event.kind in ("collision", "engulfment"):
+                loser = first if mass[event.i] < mass[event.j] else second
+                loser["is_destroyed"] = True
+
+    def _publish_energy_drift(self, pos: np.ndarray, vel: np.ndarray, mass: np.ndarray):
+        """Publish |E - E0| / |E0|, reusing the potential from the last force pass when available."""
+        if self._last_potential is not None:
+            kinetic = 0.5 * float(np.dot(mass, np.einsum("ij,ij->i", vel, vel)))
+            energy = kinetic + self._last_potential
+        else:
+            energy = total_energy(pos, vel, mass, G=self.G)
+        e0 = self._nbody_E0
+        drift = abs(energy - e0) / abs(e0) if abs(e0) > 0.0 else abs(energy - e0)
+        self.energy_snapshot = EnergyDriftSnapshot(
+            drift=float(drift), energy=float(energy), reference_energy=float(e0),
+            sim_time=self._nbody_time, step=self._nbody_steps,
+        )
+
+    @property
+    def _last_energy_drift(self) -> Optional[float]:
+        """Latest published relative energy drift (None before the first check)."""
+        snapshot = self.energy_snapshot
+        return snapshot.drift if snapshot is not None else None
+
+    def _chaos_state_for(self, bodies: List[dict]) -> VariationalState:
+        """Tangent-vector state for `bodies`, reseeded when the body set changes."""
+        same = len(bodies) == len(self._chaos_bodies) and all(
+            a is b for a, b in zip(bodies, self._chaos_bodies))
+        if self.chaos_state is None or not same:
+            self.chaos_state = VariationalState.seeded(
+                len(bodies), 2, per_body=len(bodies) <= self.chaos_per_body_max, seed=self._rng)
+            self._chaos_bodies = list(bodies)
+        return self.chaos_state
+
+    def chaos_indicators(self, body: Optional[dict] = None):
+        """
+        (MEGNO, Lyapunov time in years) from the tracked tangent vectors.
+
+        For `body` this is its own tangent vector when tracked per body;
+        otherwise (or with no body) the most chaotic tangent vector. Returns
+        None until chaos tracking has run.
+        """
+        state = self.chaos_state
+        if state is None or state.time <= 0.0:
+            return None
+        megno = state.megno
+        t_lyap = state.lyapunov_time
+        idx = int(np.argmax(megno))
+        if body is not None and state.n_tangents > 1:
+            idx = next((i for i, b in enumerate(self._chaos_bodies) if b is body), idx)
+        return float(megno[idx]), float(t_lyap[idx])
+
+    def compute_nbody_flux_metrics(self, placed_bodies, body: dict, period_yr: float, n_samples: int = 32):
+        """
+        Time-averaged stellar flux for `body` over one orbital period.
+
+        Integrates a copy of the current N-body state forward by `period_yr`
+        and samples the summed flux from all stars (L / d^2 in Earth flux
+        units) `n_samples` times.
+
+        Returns:
+            (s_avg, s_max, thermal_instability) where thermal_instability is
+            the peak-to-peak flux swing relative to the mean.
+        """
+        bodies = self._nbody_active(placed_bodies)
+        target = next((i for i, b in enumerate(bodies) if b is body), None)
+        if target is None:
+            raise ValueError("body is not part of the active N-body state")
+        star_idx = np.array([i for i, b in enumerate(bodies) if b.get("type") == "star"], dtype=int)
+        if star_idx.size == 0:
+            raise ValueError("no stars in N-body state")
+        lum = np.array([float(bodies[i].get("luminosity", 1.0) or 0.0) for i in star_idx])
+
+        pos, vel, mass = self._pack_nbody(bodies)
+        n_samples = max(1, int(n_samples))
+        # Resolve the orbit with >= 8 steps per sample; cap total work per call.
+        total_steps = int(min(max(n_samples * 8, np.ceil(period_yr / 0.002)), 1024))
+        steps_per_sample = max(1, total_steps // n_samples)
+        h = period_yr / (steps_per_sample * n_samples)
+
+        flux = np.empty(n_samples)
+        acc = None
+        for k in range(n_samples):
+            acc = leapfrog(pos, vel, mass, h, steps_per_sample, G=self.G,
+                           acceleration_fn=self._gravity, accelerations=acc)
+            d2 = np.sum((pos[star_idx] - pos[target]) ** 2, axis=1)
+            flux[k] = float(np.sum(lum / np.maximum(d2, 1e-12)))
+        s_avg = float(flux.mean())
+        s_max = float(flux.max())
+        thermal_instability = float((s_max - flux.min()) / s_avg) if s_avg > 0 else 0.0
+        return s_avg, s_max, thermal_instability
+
+    # ------------------------------------------------------------------
+    # Checkpoint / restart
+    # ------------------------------------------------------------------
+
+    # Settings and integrator state restored verbatim by load_checkpoint.
+    _CHECKPOINT_ATTRS = (
+        "G", "time_step", "gravity_solver", "barnes_hut_theta", "barnes_hut_threshold",
+        "integrator", "adaptive_rtol", "adaptive_atol", "_adaptive_h",
+        "adaptive_fallback_max_substeps", "wh_step_fraction", "wh_encounter_hill_factor",
+        "track_chaos", "chaos_per_body_max", "_nbody_E0", "_nbody_time", "_nbody_steps",
+        "_integrator_steps", "energy_meter_interval", "detect_events",
+    )
+
+    def save_checkpoint(self, path: str, placed_bodies=()) -> str:
+        """
+        Write the engine and `placed_bodies` to a binary checkpoint (see
+        `src.checkpoint`).
+
+        Stores the raw state arrays (CelestialBody store, test particles,
+        tangent vectors, every array in the body dicts) and the integrator
+        state (adaptive step suggestion, E0, N-body clock and step count,
+        event log, RNG state), so `load_checkpoint` followed by the same calls
+        reproduces an uninterrupted run bit for bit.
+        """
+        placed_bodies = list(placed_bodies)
+        records, arrays = pack_bodies(placed_bodies)
+        n = len(self.bodies)
+        arrays.update({
+            "engine/positions": self._positions[:n],
+            "engine/velocities": self._velocities[:n],
+            "engine/accelerations": self._accelerations[:n],
+            "engine/masses": self._masses[:n],
+            "engine/tp_positions": self._tp_positions,
+            "engine/tp_velocities": self._tp_velocities,
+        })
+        celestial = [{
+            "name": b.name, "mass": b.mass, "radius": b.radius, "temperature": b.temperature,
+            "atmosphere": dict(b.atmosphere), "type": b.type, "orbper": b.orbper, "orbeccen": b.orbeccen,
+            "habitability_score": float(b.habitability_score), "lum": float(b.lum),
+        } for b in self.bodies]
+        chaos = None
+        if self.chaos_state is not None:
+            index_of = {id(b): i for i, b in enumerate(placed_bodies)}
+            chaos = {"time": self.chaos_state.time,
+                     "bodies": [index_of.get(id(b)) for b in self._chaos_bodies]}
+            for key in ("tangent_positions", "tangent_velocities", "ys", "yss", "log_growth"):
+                arrays[f"chaos/{key}"] = getattr(self.chaos_state, key)
+        meta = {
+            "engine": {attr: getattr(self, attr) for attr in self._CHECKPOINT_ATTRS},
+            "event_kinds": list(self.event_kinds),
+            "event_line_of_sight": list(self.event_line_of_sight),
+            "event_log": [dict(e, bodies=list(e["bodies"])) for e in self.event_log],
+            "energy_snapshot": asdict(self.energy_snapshot) if self.energy_snapshot is not None else None,
+            "rng_state": self._rng.bit_generator.state,
+            "celestial_bodies": celestial,
+            "placed_bodies": records,
+            "chaos": chaos,
+        }
+        return write_checkpoint(path, meta, arrays)
+
+    def load_checkpoint(self, path: str) -> List[dict]:
+        """
+        Restore the engine from `save_checkpoint` and return the saved
+        placed bodies (whose arrays are copy-on-write views on the file).
+        """
+        meta, arrays = read_checkpoint(path)
+        for attr, value in meta["engine"].items():
+            setattr(self, attr, value)
+        self.event_kinds = tuple(meta["event_kinds"])
+        self.event_line_of_sight = tuple(meta["event_line_of_sight"])
+        self.event_log.clear()
+        self.event_log.extend(dict(e, bodies=tuple(e["bodies"])) for e in meta["event_log"])
+        snapshot = meta["energy_snapshot"]
+        self.energy_snapshot = EnergyDriftSnapshot(**snapshot) if snapshot is not None else None
+        self._event_detector_cache = None
+        self._last_potential = None
+        self._rng = np.random.default_rng()
+        self._rng.bit_generator.state = meta["rng_state"]
+
+        self.bodies = []
+        self._positions = np.zeros((0, 3))
+        self._velocities = np.zeros((0, 3))
+        self._accelerations = np.zeros((0, 3))
+        self._masses = np.zeros(0)
+        for i, rec in enumerate(meta["celestial_bodies"]):
+            body = CelestialBody(
+                name=rec["name"], mass=rec["mass"], radius=rec["radius"],
+                position=arrays["engine/positions"][i], velocity=arrays["engine/velocities"][i],
+                temperature=rec["temperature"], atmosphere=rec["atmosphere"], type=rec["type"],
+                orbper=rec["orbper"], orbeccen=rec["orbeccen"],
+            )
+            body.habitability_score = rec["habitability_score"]
+            body.lum = rec["lum"]
+            self.add_body(body)
+        n = len(self.bodies)
+        self._accelerations[:n] = arrays["engine/accelerations"]
+        self._masses[:n] = arrays["engine/masses"]
+        self._tp_positions = arrays["engine/tp_positions"]
+        self._tp_velocities = arrays["engine/tp_velocities"]
+
+        placed_bodies = unpack_bodies(meta["placed_bodies"], arrays)
+        chaos = meta["chaos"]
+        self.chaos_state = None
+        self._chaos_bodies = []
+        if chaos is not None:
+            tangent_x, tangent_v = arrays["chaos/tangent_positions"], arrays["chaos/tangent_velocities"]
+            self.chaos_state = VariationalState(
+                tangent_x.copy(), tangent_v.copy(), time=chaos["time"],
+                ys=arrays["chaos/ys"], yss=arrays["chaos/yss"], log_growth=arrays["chaos/log_growth"],
+            )
+            # The constructor renormalises; the saved vectors already are, to the last bit.
+            self.chaos_state.tangent_positions = tangent_x
+            self.chaos_state.tangent_velocities = tangent_v
+            self._chaos_bodies = [placed_bodies[i] for i in chaos["bodies"] if i is not None]
+        return placed_bodies
+
     def find_host_star(self, body: CelestialBody) -> Optional[CelestialBody]:
         """Find the most massive star that this body might be orbiting"""
         stars = [b for b in self.bodies if b.type == 'star']
@@ -61,30 +779,125 @@ class SimulationEngine:
         # Return the most massive star for now
         return max(stars, key=lambda s: s.mass)
 
+    def _uses_barnes_hut(self, n: int) -> bool:
+        if self.gravity_solver == "barnes_hut":
+            return True
+        if self.gravity_solver == "direct":
+            return False
+        return n >= self.barnes_hut_threshold
+
+    def _gravity(self, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """Mutual accelerations using the configured solver (direct or Barnes–Hut)."""
+        if self._uses_barnes_hut(positions.shape[0]):
+            return barnes_hut_accelerations(positions, masses, theta=self.barnes_hut_theta, G=self.G)
+        return pairwise_accelerations(positions, masses, G=self.G)
+
+    def _gravity_with_potential(self, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """`_gravity` that also stores the potential energy in `_last_potential` (direct sum only)."""
+        if self._uses_barnes_hut(positions.shape[0]):
+            return self._gravity(positions, masses)
+        acc, self._last_potential = pairwise_accelerations_and_potential(positions, masses, G=self.G)
+        return acc
+
+    def _tracer_field(self, targets: np.ndarray, sources: np.ndarray, masses: np.ndarray,
+                      tree=None) -> np.ndarray:
+        """Accelerations at massless `targets` from the massive `sources`."""
+        if tree is None and self._uses_barnes_hut(sources.shape[0]):
+            tree = build_tree(sources, masses)
+        if tree is not None:
+            return tree_field_accelerations(tree, sources, masses, targets,
+                                            theta=self.barnes_hut_theta, G=self.G)
+        return field_accelerations(targets, sources, masses, G=self.G)
+
+    def _advance_adaptive(self, pos, vel, mass, dt, tp_pos=None, tp_vel=None, step_callback=None):
+        """
+        Advance packed arrays by `dt` years with the adaptive integrator.
+
+        If the controller runs out of steps first (a deep close encounter), the
+        rest of `dt` is finished with fixed leapfrog sub-steps of about the last
+        suggested size, so the state never lags the clock; `fallback_substeps`
+        on the returned stats records how many were needed. `step_callback(k, h)`
+        is called after every step of either kind.
+        """
+        stats = dopri_integrate(
+            pos, vel, mass, dt, h=self._adaptive_h,
+            rtol=self.adaptive_rtol, atol=self.adaptive_atol, G=self.G,
+            acceleration_fn=self._gravity,
+            tracer_positions=tp_pos, tracer_velocities=tp_vel, tracer_fn=self._tracer_field,
+            step_callback=step_callback,
+        )
+        remaining = stats.shortfall(dt)
+        if remaining > 0.0:
+            n_fallback = int(min(self.adaptive_fallback_max_substeps,
+                                 max(1, np.ceil(remaining / stats.h_next))))
+            h_fallback = remaining / n_fallback
+            leapfrog(pos, vel, mass, h_fallback, n_fallback, G=self.G,
+                     acceleration_fn=self._gravity, tracer_positions=tp_pos,
+                     tracer_velocities=tp_vel, tracer_fn=self._tracer_field,
+                     step_callback=None if step_callback is None
+                     else lambda k: step_callback(stats.accepted + k, h_fallback))
+            stats.fallback_substeps = n_fallback
+            stats.time_reached = float(dt)
+        self._integrator_steps += stats.accepted + stats.fallback_substeps
+        self._adaptive_h = stats.h_next
+        self.last_step_stats = stats
+        return stats
+
+    def _advance_wisdom_holman(self, pos, vel, mass, dt, tp_pos=None, tp_vel=None, fallback_steps=1,
+                               step_callback=None):
+        """
+        Advance packed arrays by `dt` years with Wisdom–Holman steps, or with the
+        adaptive integrator while a close encounter is in progress.
+        `step_callback(k, h)` is called after every step.
+        """
+        if self.wh_encounter_hill_factor is not None:
+            i, _ = close_encounter_pairs(pos, mass, vel, hill_factor=self.wh_encounter_hill_factor, G=self.G)
+            if i.size:
+                self._advance_adaptive(pos, vel, mass, dt, tp_pos, tp_vel, step_callback=step_callback)
+                return
+        timescale = orbital_timescale(pos, vel, mass, G=self.G)
+        if np.isfinite(timescale) and timescale > 0:
+            n_steps = max(1, int(np.ceil(dt / (self.wh_step_fraction * timescale))))
+        else:
+            n_steps = max(1, int(fallback_steps))
+        self._integrator_steps += n_steps
+        h = dt / n_steps
+        wisdom_holman(pos, vel, mass, h, n_steps, G=self.G, acceleration_fn=self._gravity,
+                      tracer_positions=tp_pos, tracer_velocities=tp_vel, tracer_fn=self._tracer_field,
+                      step_callback=None if step_callback is None else lambda k: step_callback(k, h))
+
+    def _compute_accelerations(self) -> np.ndarray:
+        """Accelerations of all bodies from one vectorized pass."""
+        n = len(self.bodies)
+        return self._gravity(self._positions[:n], self._masses[:n])
+
     def calculate_acceleration(self, body: CelestialBody) -> np.ndarray:
         """Calculate gravitational acceleration on a body due to all other bodies"""
-        acceleration = np.zeros(3)
-        for other in self.bodies:
-            if other != body:
-                # Convert mass from Earth masses to Solar masses for the calculation
-                # if the other body is a star, mass might already be in solar masses?
-                # Looking at main.py, sun mass is 1.0 (Solar mass), planets are in Earth masses.
-                # This is inconsistent. Let's assume stars are in Solar masses and planets in Earth masses.
-                # M_sun = 333,030 M_earth
-                other_mass_solar = other.mass if other.type == 'star' else other.mass / 333030.0
-                
-                r = other.position - body.position
-                r_mag = np.linalg.norm(r)
-                if r_mag > 1e-5:  # Avoid division by zero and near-collisions
-                    acceleration += self.G * other_mass_solar * r / (r_mag ** 3)
-        return acceleration
+        self._sync_store()
+        n = len(self.bodies)
+        target = np.asarray(body.position, dtype=float)[np.newaxis, :3]
+        return field_accelerations(target, self._positions[:n], self._masses[:n], G=self.G)[0]
     
     def update_positions(self):
-        """Update positions and velocities using Verlet integration"""
-        for body in self.bodies:
-            body.acceleration = self.calculate_acceleration(body)
-            body.velocity += body.acceleration * self.time_step
-            body.position += body.velocity * self.time_step
+        """Update positions and velocities (kick-drift) on the packed state arrays"""
+        n = len(self.bodies)
+        if n == 0:
+            return
+        self._sync_store()
+        if self.integrator in ("adaptive", "wisdom_holman"):
+            advance = self._advance_adaptive if self.integrator == "adaptive" else self._advance_wisdom_holman
+            advance(self._positions[:n], self._velocities[:n], self._masses[:n],
+                    self.time_step, self._tp_positions, self._tp_velocities)
+            self._accelerations[:n] = self._compute_accelerations()
+            return
+        if self.test_particle_count:
+            # Particles see the massive bodies at the start of the step, like the bodies themselves.
+            tp_acc = self._tracer_field(self._tp_positions, self._positions[:n], self._masses[:n])
+            self._tp_velocities += tp_acc * self.time_step
+            self._tp_positions += self._tp_velocities * self.time_step
+        self._accelerations[:n] = self._compute_accelerations()
+        self._velocities[:n] += self._accelerations[:n] * self.time_step
+        self._positions[:n] += self._velocities[:n] * self.time_step
             
     def calculate_habitability(self, body: CelestialBody) -> float:
         """Calculate habitability score using ML model if available, otherwise use basic physics"""
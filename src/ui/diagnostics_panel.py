@@ -116,6 +116,9 @@ THRESHOLDS = {
 NBODY_DRIFT_GOOD = 1e-5   # Research Grade (green)
 NBODY_DRIFT_WARNING = 1e-3  # Numerical noise (yellow); suggest lowering time_scale
 # > NBODY_DRIFT_WARNING = Unstable / integrator failure (red)
+# N-Body chaos indicator (MEGNO <Y> from SimulationEngine.chaos_indicators)
+MEGNO_QUASI_PERIODIC = 2.5  # <Y> -> 2 for regular orbits (green)
+MEGNO_WEAKLY_CHAOTIC = 5.0  # Slow divergence (yellow); above = chaotic (red)
 
 
 class ScientificDiagnosticsPanel:
@@ -150,6 +153,7 @@ class ScientificDiagnosticsPanel:
         self.close_button_rect = None
         self.compute_uncertainty_btn = None
         self.run_integrator_btn = None
+        self.track_chaos_btn = None
         self.compute_sensitivity_btn = None
         self.export_integrity_btn = None
         self.export_sensitivity_btn = None
@@ -282,6 +286,7 @@ class ScientificDiagnosticsPanel:
         
         self.compute_uncertainty_btn = None
         self.run_integrator_btn = None
+        self.track_chaos_btn = None
         self.compute_sensitivity_btn = None
         
         content_height = self._measure_total_content_height()
@@ -512,6 +517,7 @@ class ScientificDiagnosticsPanel:
                 y = self._render_stat_row(surface, y, "  |dE/E0|:", f"{drift:.2e}")
             else:
                 y = self._render_stat_row(surface, y, "Numerical Integrity:", "N-Body (Leapfrog)")
+            y = self._render_physics_thread_rows(surface, y, engine)
             # N-Body: Time-averaged flux and peak flux (replace static Stellar Flux when in N-body)
             sel = getattr(self.viz, "selected_body", None)
             if sel and sel.get("type") == "planet":
@@ -533,6 +539,7 @@ class ScientificDiagnosticsPanel:
                         if s_max is not None:
                             y = self._render_stat_row(surface, y, "S_max (EFU):", f"{s_max:.4f}")
                         break
+            y = self._render_chaos_rows(surface, y, engine, sel)
             y += 3
         
         if self.state.integrator_computing:
@@ -577,6 +584,50 @@ class ScientificDiagnosticsPanel:
         y += cfg["section_spacing"]
         return y
     
+    def _render_physics_thread_rows(self, surface: 'pygame.Surface', y: int, engine: Any) -> int:
+        """How far the threaded N-body worker trails the clock, and any time it dropped."""
+        cfg = PANEL_CONFIG
+        physics_thread = getattr(self.viz, "_nbody_physics_thread", None)
+        if physics_thread is None or physics_thread.engine is not engine:
+            return y
+        lag = physics_thread.lag
+        lag_status = cfg["status_green"] if lag <= 10.0 * physics_thread.dt else cfg["status_yellow"]
+        y = self._render_stat_row(surface, y, "Physics lag:", f"{lag:.3g} yr", status_color=lag_status)
+        if physics_thread.dropped_time > 0.0:
+            y = self._render_stat_row(surface, y, "  Dropped time:", f"{physics_thread.dropped_time:.3g} yr",
+                                      status_color=cfg["status_red"])
+        return y
+    
+    def _render_chaos_rows(self, surface: 'pygame.Surface', y: int, engine: Any, sel: Optional[dict]) -> int:
+        """MEGNO / Lyapunov time rows for the N-body state (or the button enabling them)."""
+        cfg = PANEL_CONFIG
+        if engine is None:
+            return y
+        if not getattr(engine, "track_chaos", False):
+            y += 3
+            y, self.track_chaos_btn = self._render_button(surface, y, "Track Chaos (MEGNO)")
+            return y
+        # While the physics thread steps the engine, read its published copy.
+        physics_thread = getattr(self.viz, "_nbody_physics_thread", None)
+        source = physics_thread if physics_thread is not None and physics_thread.engine is engine else engine
+        indicators = source.chaos_indicators(sel)
+        if indicators is None:
+            return self._render_stat_row(surface, y, "Chaos (MEGNO):", "Collecting...")
+        megno, t_lyap = indicators
+        if megno < MEGNO_QUASI_PERIODIC:
+            chaos_text = "Quasi-periodic"
+            chaos_status = cfg["status_green"]
+        elif megno < MEGNO_WEAKLY_CHAOTIC:
+            chaos_text = "Weakly chaotic"
+            chaos_status = cfg["status_yellow"]
+        else:
+            chaos_text = "Chaotic"
+            chaos_status = cfg["status_red"]
+        y = self._render_stat_row(surface, y, "Chaos (MEGNO):", chaos_text, status_color=chaos_status)
+        y = self._render_stat_row(surface, y, "  <Y>:", f"{megno:.2f}")
+        t_text = f"{t_lyap:.3g} yr" if math.isfinite(t_lyap) else "n/a"
+        return self._render_stat_row(surface, y, "  Lyapunov time:", t_text)
+
     def _render_sensitivity_section(self, surface: 'pygame.Surface', y: int) -> int:
         """Render the Feature Influence section."""
         cfg = PANEL_CONFIG
@@ -719,6 +770,12 @@ class ScientificDiagnosticsPanel:
                     self._start_integrator_validation()
                     return True
                 
+                if self._check_button_click(self.track_chaos_btn, rel_x, rel_y):
+                    engine = getattr(self.viz, "_simulation_engine", None)
+                    if engine is not None:
+                        engine.track_chaos = True
+                    return True
+                
                 if self._check_button_click(self.compute_sensitivity_btn, rel_x, rel_y):
                     self._start_sensitivity_computation()
                     return True
@@ -775,17 +832,53 @@ class ScientificDiagnosticsPanel:
         return data
     
     def _get_simulation_bodies(self) -> List[Dict[str, Any]]:
-        """Get list of bodies for integrator validation."""
+        """
+        Get list of bodies for integrator validation, in physical units (AU, AU/yr).
+
+        N-body states are used as-is; Keplerian bodies are rebuilt from their
+        full elements (semi-major axis, eccentricity, true anomaly
+        `orbit_angle`, periapsis along +x as drawn) about their parent, since
+        their pixel positions are visually compressed.
+        """
+        from src.physics.ensemble import elements_to_state
+        from src.physics.nbody_kernels import M_EARTH_PER_M_SUN
+
+        def mass_solar(b):
+            m = float(b.get("mass", 1.0) or 0.0)
+            return m if b.get("type") == "star" else m / M_EARTH_PER_M_SUN
+
         bodies = []
-        for body in self.viz.placed_bodies:
-            if "position" in body and "velocity" in body:
-                bodies.append({
-                    "name": body.get("name", "unknown"),
-                    "type": body.get("type", "planet"),
-                    "mass": body.get("mass", 1.0),
-                    "position": np.array(body["position"], dtype=np.float64),
-                    "velocity": np.array(body["velocity"], dtype=np.float64),
-                })
+        state: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        au_to_px = float(getattr(self.viz, "AU_TO_PX", 400.0) or 400.0)
+        order = {"star": 0, "planet": 1, "moon": 2}
+        live = [b for b in self.viz.placed_bodies
+                if not b.get("is_destroyed", False) and b.get("position") is not None]
+        for body in sorted(live, key=lambda b: order.get(b.get("type"), 3)):
+            if body.get("position_au") is not None and body.get("velocity_au") is not None:
+                pos = np.array(body["position_au"], dtype=np.float64)[:2]
+                vel = np.array(body["velocity_au"], dtype=np.float64)[:2]
+            else:
+                parent = state.get(id(body.get("parent_obj")))
+                a = body.get("semiMajorAxis")
+                if body.get("type") == "star" or parent is None or not a:
+                    pos = np.array(body["position"], dtype=np.float64)[:2] / au_to_px
+                    vel = np.zeros(2)
+                else:
+                    pair_pos, pair_vel, _ = elements_to_state(
+                        np.array([mass_solar(body["parent_obj"])]), np.array([[mass_solar(body)]]),
+                        np.array([[float(a)]]), np.array([[float(body.get("eccentricity", 0.0) or 0.0)]]),
+                        np.array([[float(body.get("orbit_angle", 0.0) or 0.0)]]), np.zeros((1, 1)),
+                    )
+                    pos = parent[0] + pair_pos[0, 1] - pair_pos[0, 0]
+                    vel = parent[1] + pair_vel[0, 1] - pair_vel[0, 0]
+            state[id(body)] = (pos, vel)
+            bodies.append({
+                "name": body.get("name", "unknown"),
+                "type": body.get("type", "planet"),
+                "mass": body.get("mass", 1.0),
+                "position": pos,
+                "velocity": vel,
+            })
         return bodies
     
     def _start_uncertainty_computation(self):
@@ -902,7 +995,7 @@ class ScientificDiagnosticsPanel:
         """
         try:
             energies = getattr(metrics, "energy_history", None)
-            if not energies or len(energies) < 2:
+            if energies is None or len(energies) < 2:
                 return None
             E0 = float(energies[0])
             if abs(E0) > 1e-15:
@@ -26,6 +26,8 @@ from src.physics.system_presets import (
     get_trappist1_system,
     TRAPPIST_ORBIT_VISUAL_SPREAD,
 )
+from src.physics.kepler import mean_from_true, true_from_mean
+from src.physics.physics_thread import NBodyPhysicsThread
 try:
     import matplotlib
     matplotlib.use("Agg")
@@ -36,10 +38,11 @@ except ImportError:
     MATPLOTLIB_AVAILABLE = False
 try:
     from src.ml.ml_habitability import MLHabitabilityCalculator
-    from src.ml.ml_integration import predict_with_simulation_body
+    from src.ml.ml_integration import predict_with_simulation_body, score_simulation_body
 except ImportError:
     MLHabitabilityCalculator = None
     predict_with_simulation_body = None
+    score_simulation_body = None
 
 try:
     from src.ui.diagnostics_panel import ScientificDiagnosticsPanel
@@ -80,6 +83,8 @@ DEBUG = False
 DEBUG_ORBIT = False
 # Set True to log when update_physics() runs (verify timer never runs on home screen); then set False
 DEBUG_TIMER_PATH = False
+# N-body mode steps on a worker thread at a fixed dt (False: inline sub-stepping in update_physics)
+THREADED_NBODY = True
 frame_trace = []  # Per-frame trace collector
 
 def debug_log(*args, **kwargs):
@@ -553,6 +558,7 @@ class SolarSystemVisualizer:
         # Chosen darker than UI_PANEL_MUTED_TEXT to avoid "bright" looking outlines.
         self.UI_PANEL_BORDER = (70, 80, 95)
         self.GRID_COLOR = (30, 30, 50)
+        self.TEST_PARTICLE_COLOR = (170, 160, 140)  # Asteroid/debris points
         self.ACTIVE_TAB_COLOR = (255, 100, 100)  # Bright red for active tab
         
         # Home screen state
@@ -14655,6 +14661,131 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
         # Draw the orbit line
         pygame.draw.lines(self.screen, color, False, pts, max(1, int(2 * self.camera.zoom)))
     
+    def _keplerian_gravity_sources(self, engine):
+        """
+        Physical (AU) positions and Solar masses of stars and planets in Keplerian mode.
+
+        Planet positions are recomputed from their orbital elements rather than
+        taken from `position`, which carries the perceptual distance scaling.
+        """
+        positions = []
+        masses = []
+        for body in self.placed_bodies:
+            if body.get("is_destroyed", False) or body.get("position") is None:
+                continue
+            if body["type"] == "star":
+                positions.append(np.asarray(body["position"], dtype=float)[:2] / AU_TO_PX)
+            elif body["type"] == "planet" and body.get("parent_obj") is not None:
+                star_au = np.asarray(body["parent_obj"]["position"], dtype=float)[:2] / AU_TO_PX
+                a = float(body.get("semiMajorAxis", 1.0))
+                e = min(max(float(body.get("eccentricity", 0.0)), 0.0), 0.999)
+                theta = float(body.get("orbit_angle", 0.0))
+                r = a * (1 - e**2) / (1 + e * math.cos(theta))
+                positions.append(star_au + r * np.array([math.cos(theta), math.sin(theta)]))
+            else:
+                continue
+            masses.append(engine._mass_solar(body))
+        if not positions:
+            return np.zeros((0, 2)), np.zeros(0)
+        return np.array(positions), np.array(masses)
+
+    def _draw_test_particles(self, engine):
+        """
+        Draw the engine's test particles as single pixels in one array write.
+
+        In N-body mode particle AU positions map linearly to world pixels. In
+        Keplerian mode they are radially compressed about the primary star with
+        the same power law as planet orbits so belts line up with the rings.
+        """
+        if engine is None:
+            return
+        # While the physics thread steps the engine, draw its published copy.
+        physics_thread = getattr(self, "_nbody_physics_thread", None)
+        if physics_thread is not None and physics_thread.engine is engine:
+            pos_au = physics_thread.snapshots()[1].test_particles
+        else:
+            pos_au = engine.test_particle_positions[:, :2]
+        if pos_au.shape[0] == 0:
+            return
+        if self.physics_mode == "nbody":
+            world = pos_au * AU_TO_PX
+        else:
+            stars = [b for b in self.placed_bodies if b["type"] == "star" and not b.get("is_destroyed", False)]
+            if not stars:
+                return
+            primary = max(stars, key=lambda b: float(b.get("mass", 1.0)))
+            center_px = np.asarray(primary["position"], dtype=float)[:2]
+            rel = pos_au - center_px / AU_TO_PX
+            r = np.hypot(rel[:, 0], rel[:, 1])
+            r_scaled = r * 3.0 if getattr(self, "_current_preset", None) == "trappist_1" else r
+            r_px = AU_TO_PX * np.power(r_scaled, PLANET_DISTANCE_SCALE_POWER)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                factor = np.where(r > 0, r_px / r, 0.0)
+            world = center_px + rel * factor[:, None]
+        screen = world * self.camera.zoom + np.asarray(self.camera.offset, dtype=float)[:2]
+        width, height = self.screen.get_size()
+        xs = screen[:, 0].astype(np.int64)
+        ys = screen[:, 1].astype(np.int64)
+        visible = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        if not np.any(visible):
+            return
+        pixels = pygame.surfarray.pixels2d(self.screen)
+        try:
+            pixels[xs[visible], ys[visible]] = self.screen.map_rgb(self.TEST_PARTICLE_COLOR)
+        finally:
+            del pixels  # releases the surface lock
+
+    def _propagate_orbit_angles(self, bodies, anchor_seconds: float):
+        """
+        Set `orbit_angle` (true anomaly) from Kepler's equation at `simulation_time_seconds`.
+
+        Each body carries an epoch (anchor time, mean motion, eccentricity, mean
+        anomaly). The epoch is re-anchored at `anchor_seconds` whenever the angle,
+        `orbit_speed` or eccentricity was changed outside this method, so edits
+        and orbital corrections take effect from the current angle. The result
+        does not depend on frame size: time warp and scrubbing are exact.
+        """
+        t_now = float(self.simulation_time_seconds)
+        ready = []
+        for body in bodies:
+            if body.get("is_destroyed", False) or body.get("_kepler_synced_at") == t_now:
+                continue
+            n = float(body.get("orbit_speed", 0.0) or 0.0)
+            if n == 0.0 or not math.isfinite(n):
+                continue
+            ready.append(body)
+        if not ready:
+            return
+
+        n = np.array([float(b["orbit_speed"]) for b in ready])
+        # Limit e to 0.999 to avoid extreme speeds at periapsis
+        e = np.clip(np.array([float(b.get("eccentricity", 0.0) or 0.0) for b in ready]), 0.0, 0.999)
+        theta = np.array([float(b.get("orbit_angle", 0.0)) for b in ready])
+        t0 = np.empty(len(ready))
+        m0 = np.empty(len(ready))
+        stale = []
+        for i, b in enumerate(ready):
+            epoch = b.get("_kepler_epoch")
+            if (epoch is None or epoch[1] != n[i] or epoch[2] != e[i]
+                    or b.get("_kepler_angle") != b.get("orbit_angle")):
+                stale.append(i)
+            else:
+                t0[i], m0[i] = epoch[0], epoch[3]
+        if stale:
+            stale = np.array(stale)
+            t0[stale] = anchor_seconds
+            m0[stale] = mean_from_true(theta[stale], e[stale])
+
+        years = (t_now - t0) / self.SECONDS_PER_YEAR
+        mean_anomaly = np.remainder(m0 + n * years, 2.0 * np.pi)
+        angles = np.remainder(true_from_mean(mean_anomaly, e), 2.0 * np.pi)
+        for i, b in enumerate(ready):
+            angle = float(angles[i])
+            b["orbit_angle"] = angle
+            b["_kepler_angle"] = angle
+            b["_kepler_epoch"] = (float(t0[i]), float(n[i]), float(e[i]), float(m0[i]))
+            b["_kepler_synced_at"] = t_now
+
     def compute_planet_position(self, planet, parent_star):
         """
         MANDATORY: Centralized function to compute planet position from semiMajorAxis and eccentricity.
@@ -15329,6 +15460,14 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
         prev_mode = getattr(self, "_physics_mode_prev", "keplerian")
         self.physics_mode = SimulationEngine.physics_mode(self.placed_bodies)
         engine = getattr(self, "_simulation_engine", None)
+        # The physics thread only keeps running while it integrates exactly the live bodies.
+        physics_thread = getattr(self, "_nbody_physics_thread", None)
+        if physics_thread is not None and (
+            self.physics_mode != "nbody" or prev_mode != "nbody" or engine is not physics_thread.engine
+            or not physics_thread.tracks(self.placed_bodies)
+        ):
+            physics_thread.stop()
+            physics_thread = self._nbody_physics_thread = None
         
         if self.physics_mode == "nbody" and engine is not None:
             # ---------- Mode B: N-body (Leapfrog), barycentric, sub-stepping ----------
@@ -15361,7 +15500,7 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                     # positions, shift the camera offset by +com_shift_px * zoom.
                     self.camera.offset[0] += float(com_shift_px[0] * self.camera.zoom)
                     self.camera.offset[1] += float(com_shift_px[1] * self.camera.zoom)
-            else:
+            elif physics_thread is None:
                 for body in self.placed_bodies:
                     pos = body.get("position")
                     if pos is not None and len(pos) >= 2:
@@ -15380,11 +15519,16 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                             body["velocity_au"] = np.array([-v * math.sin(theta), v * math.cos(theta)], dtype=float)
                     else:
                         body["velocity_au"] = np.array(body["velocity_au"][:2], dtype=float)
-            # Adaptive sub-stepping: dt_physics <= 0.001 yr
-            n_sub = 20
-            if effective_dt > 0:
+            if THREADED_NBODY:
+                # Fixed 0.001 yr steps on the physics thread; bodies are drawn at the
+                # interpolated position one step behind the simulated clock.
+                if physics_thread is None:
+                    physics_thread = self._nbody_physics_thread = NBodyPhysicsThread(engine, self.placed_bodies)
+                physics_thread.advance(effective_dt)
+                physics_thread.apply(scale_px)
+            # Leapfrog sub-stepping: dt_physics <= 0.001 yr (adaptive and Wisdom–Holman pick their own steps)
+            elif effective_dt > 0:
                 n_sub = max(20, int(math.ceil(effective_dt / 0.001)))
-            if effective_dt > 0:
                 engine.step_nbody(effective_dt, self.placed_bodies, n_sub=n_sub, scale_px_per_au=scale_px)
             else:
                 for b in self.placed_bodies:
@@ -15449,6 +15593,11 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
             # ---------- Mode A: Keplerian (single-star) ----------
             # Create ordered list for deterministic processing
             ordered_bodies = stars + planets + moons
+            frame_start_seconds = self.simulation_time_seconds - dt_sim
+            # Closed-form orbit angles for every ready planet and moon in one array pass;
+            # the per-body calls below only pick up bodies initialized this frame.
+            if effective_dt > 0.0:
+                self._propagate_orbit_angles(planets + moons, frame_start_seconds)
             
             # Process planets first (they orbit stars)
             for body in planets:
@@ -15513,28 +15662,12 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                         body["parent_obj"] = p
                     
                     # PURE KINEMATIC KEPLERIAN ORBIT - follows Kepler's 2nd law
-                    # Update orbit angle (true anomaly) using variable angular speed
+                    # Orbit angle (true anomaly) comes from the closed-form Kepler solution
+                    # at the current simulation time (see _propagate_orbit_angles)
                     if effective_dt > 0.0 and orbit_speed != 0.0 and not np.isnan(orbit_speed):
                         old_angle = body["orbit_angle"]
-                        e = float(body.get("eccentricity", 0.0))
-                        
-                        # Kepler's 2nd law: dθ/dt = n * (1 + e*cosθ)² / (1 - e²)^(3/2)
-                        # where n is the mean motion (orbit_speed)
-                        if e > 0:
-                            # Limit e to 0.999 to avoid division by zero/extreme speeds
-                            e_safe = min(e, 0.999)
-                            speed_factor = ((1 + e_safe * math.cos(old_angle))**2) / ((1 - e_safe**2)**1.5)
-                            angular_delta = orbit_speed * speed_factor * effective_dt
-                        else:
-                            angular_delta = orbit_speed * effective_dt
-                            
-                        body["orbit_angle"] += angular_delta
+                        self._propagate_orbit_angles([body], frame_start_seconds)
                         trace(f"ORBIT_ANGLE_UPDATE {body['name']} old={old_angle:.6f} new={body['orbit_angle']:.6f} source=update_physics_planet")
-                        # Keep orbit angle in [0, 2π) range for clean circular orbits
-                        while body["orbit_angle"] >= 2 * np.pi:
-                            body["orbit_angle"] -= 2 * np.pi
-                        while body["orbit_angle"] < 0:
-                            body["orbit_angle"] += 2 * np.pi
                         
                         # Verification print: show per-body physics parameters including orbit_angle
                         if DEBUG_ORBIT:
@@ -15645,23 +15778,8 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                     # Step 1: Update orbit angle (true anomaly) using variable angular speed
                     if effective_dt > 0.0 and orbit_speed != 0.0 and not np.isnan(orbit_speed):
                         old_angle = body["orbit_angle"]
-                        e = float(body.get("eccentricity", 0.0))
-                        
-                        # Kepler's 2nd law: dθ/dt = n * (1 + e*cosθ)² / (1 - e²)^(3/2)
-                        if e > 0:
-                            e_safe = min(e, 0.999)
-                            speed_factor = ((1 + e_safe * math.cos(old_angle))**2) / ((1 - e_safe**2)**1.5)
-                            angular_delta = orbit_speed * speed_factor * effective_dt
-                        else:
-                            angular_delta = orbit_speed * effective_dt
-                            
-                        body["orbit_angle"] += angular_delta
+                        self._propagate_orbit_angles([body], frame_start_seconds)
                         trace(f"ORBIT_ANGLE_UPDATE {body['name']} old={old_angle:.6f} new={body['orbit_angle']:.6f} source=update_physics_moon")
-                        # Keep orbit angle in [0, 2π) range for clean circular orbits
-                        while body["orbit_angle"] >= 2 * np.pi:
-                            body["orbit_angle"] -= 2 * np.pi
-                        while body["orbit_angle"] < 0:
-                            body["orbit_angle"] += 2 * np.pi
                         
                         # Verification print: show per-body physics parameters including orbit_angle
                         if DEBUG_ORBIT:
@@ -15753,6 +15871,15 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                         # Trim to max_orbit_points if exceeded
                         if len(body["orbit_points"]) > body["max_orbit_points"]:
                             body["orbit_points"].pop(0)
+
+            # Test particles: integrate in the field of the kinematically placed stars/planets
+            if engine is not None and engine.test_particle_count and effective_dt > 0.0:
+                src_pos, src_mass = self._keplerian_gravity_sources(engine)
+                if src_mass.size:
+                    engine.step_test_particles(
+                        effective_dt, src_pos, src_mass,
+                        n_sub=max(1, int(math.ceil(effective_dt / 0.002))),
+                    )
         
         # Automated assertions at end of frame
         trace("END_FRAME_ASSERTIONS")
@@ -17452,6 +17579,9 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                         
                     pygame.draw.lines(self.screen, color, True, screen_points, max(1, int(2 * self.camera.zoom)))
         
+        # Test particles (belts, rings, debris) as one pixel batch behind the bodies
+        self._draw_test_particles(engine)
+
         # Draw habitable zones for all stars (before drawing bodies, after orbit grids)
         # DISABLED: Habitable zone visualization removed per user request
         # for body in self.placed_bodies:
@@ -20459,10 +20589,9 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
             # Find host star (simplified: take the first star found)
             star = next((b for b in self.placed_bodies if b.get("type") == "star"), None)
             if star:
-                # ML path - use canonical adapter with validation
-                ml_score, diagnostics = predict_with_simulation_body(
-                    self.ml_calculator, body, star, return_diagnostics=True
-                )
+                # ML path - use canonical adapter with validation (one feature build + prediction)
+                result = score_simulation_body(self.ml_calculator, body, star)
+                ml_score, diagnostics = result.score, result.diagnostics
                 
                 if ml_score is not None:
                     # Success: Store scores
@@ -20471,7 +20600,7 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                     
                     # Store both raw and display scores (SINGLE SOURCE OF TRUTH)
                     self.selected_body['habit_score'] = ml_score  # Display score (0-100, Earth=100)
-                    self.selected_body['habit_score_raw'] = diagnostics.get('score_raw', ml_score / 100.0)  # Raw score (0-1)
+                    self.selected_body['habit_score_raw'] = result.score_raw  # Raw score (0-1)
                     self.selected_body['H'] = ml_score / 100.0  # Legacy field for backward compatibility
                     
                     # Store surface classification meta (for UI)
@@ -20481,9 +20610,9 @@ Total stellar power output relative to the Sun. In AIET this value drives stella
                     self.selected_body['should_display_score'] = diagnostics.get('should_display_score', True)
                     self.selected_body['surface_reason'] = diagnostics.get('surface_reason', '')
                     
-                    if diagnostics.get("imputed_fields"):
-                        print(f"  Imputed: {diagnostics['imputed_fields']}")
-                        debug_log(f"  Imputed: {diagnostics['imputed_fields']}")
+                    if result.imputed_fields:
+                        print(f"  Imputed: {result.imputed_fields}")
+                        debug_log(f"  Imputed: {result.imputed_fields}")
                 else:
                     # Failed to compute - set to None (NOT 0.0)
                     print(f"[ML ERROR] Cannot compute for {body.get('name')}")
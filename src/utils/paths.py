@@ -25,3 +25,9 @@ def feature_schema_path(filename: str = "features.json") -> str:
     calib = os.path.join(root, "ml_calibration")
     return os.path.join(calib, filename)
 
+
+def cache_dir(*parts: str) -> str:
+    """Directory for regenerable results (created on demand)."""
+    path = os.path.join(project_root(), "cache", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path